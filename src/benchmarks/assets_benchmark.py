@@ -0,0 +1,97 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Compares the serialization of the assets of the faces and labels of
+# vi-output.json with json.dumps per instance (baseline) and with
+# InsightSpec.encode_assets, which serializes the static assets of an item once.
+# Also compares the memory of the intervals of intervals-with-faces.json and
+# intervals-with-labels.json, where every interval has its own copy of the
+# objects, with the intervals of Parser which share them.
+# Run from the src directory: python -m benchmarks.assets_benchmark
+
+import gc
+import json
+import os
+import tracemalloc
+
+from benchmarks.benchutil import RESOURCES_DIRECTORY, measure, read_vi_output, report
+from parser.parser import Parser
+
+
+def baseline_encode(entries):
+    return [
+        json.dumps(spec.project_assets(static_assets, instance))
+        for spec, static_assets, instances in entries
+        for instance in instances
+    ]
+
+
+def current_encode(entries):
+    encoded = []
+    for spec, static_assets, instances in entries:
+        prefix = spec.assets_prefix(static_assets)
+        for instance in instances:
+            encoded.append(
+                spec.encode_assets(
+                    prefix,
+                    static_assets,
+                    [asset.read(instance) for asset in spec.instance_assets],
+                    instance["start"],
+                    instance["end"],
+                )
+            )
+    return encoded
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    representation = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del representation
+    return size
+
+
+def main():
+    parser = Parser()
+    video = read_vi_output()["videos"][0]
+    for insight, resource in [
+        ("faces", "intervals-with-faces.json"),
+        ("labels", "intervals-with-labels.json"),
+    ]:
+        entries = [
+            (spec, static_assets, instances)
+            for spec in parser.specs_by_insight[insight]
+            for _, static_assets, instances in spec.entries(video["insights"][insight])
+        ]
+        assert baseline_encode(entries) == current_encode(entries)
+        report(
+            "{} assets ({} instances)".format(insight, sum(len(e[2]) for e in entries)),
+            measure(lambda: baseline_encode(entries), 20),
+            measure(lambda: current_encode(entries), 20),
+        )
+
+        path = os.path.join(RESOURCES_DIRECTORY, resource)
+        with open(path) as f:
+            content = f.read()
+        copied = retained_bytes(lambda: json.loads(content))
+        shared = retained_bytes(
+            lambda: parser.parse_insight(
+                insight,
+                video["insights"][insight],
+                parser.create_intervals(video, "FOO"),
+            )
+        )
+        print(
+            "{}: intervals with copied objects {:.0f} KB, shared {:.0f} KB".format(
+                resource, copied / 1024, shared / 1024
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+import os
+import time
+
+# the parser reads its interval from config or the environment,
+# so benchmarks fall back to the default interval when neither is set
+os.environ.setdefault("MILLISECONDS_INTERVAL", "10000")
+
+RESOURCES_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "tests", "resources"
+)
+
+
+def read_vi_output(filename="vi-output.json"):
+    """
+    reads a VI JSON file from the test resources directory
+    :param filename:
+    :return: parsed VI JSON
+    """
+    with open(os.path.join(RESOURCES_DIRECTORY, filename)) as f:
+        return json.load(f)
+
+
+def iterate_instances(vi_json):
+    """
+    yields every instance (having start and end) of every insight
+    of every video in the VI JSON
+    :param vi_json:
+    :return:
+    """
+    for video in vi_json["videos"]:
+        for insight in video["insights"].values():
+            if not isinstance(insight, list):
+                continue
+            for item in insight:
+                if isinstance(item, dict):
+                    for instance in item.get("instances", []):
+                        if "start" in instance and "end" in instance:
+                            yield instance
+
+
+def measure(function, repeat=5):
+    """
+    runs the function several times and returns the best wall time in seconds
+    :param function: function without arguments
+    :param repeat:
+    :return: best duration in seconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def report(name, baseline_seconds, candidate_seconds):
+    print(
+        "{}: baseline {:.4f}s, current {:.4f}s, speedup x{:.1f}".format(
+            name,
+            baseline_seconds,
+            candidate_seconds,
+            baseline_seconds / candidate_seconds if candidate_seconds else float("inf"),
+        )
+    )
@@ -0,0 +1,74 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Compares the bucketing engines of Parser.materialize, which distribute the
+# instances of a CompactVideo to the intervals they occurred in:
+# - baseline: python, one instance at a time
+# - current: numpy, all the instances at once (needs the numpy package)
+# on the video of vi-output.json with its insights repeated up to tens of
+# thousands of instances, with one and with several interval sizes.
+# Run from the src directory: python -m benchmarks.bucketing_benchmark
+
+from benchmarks.benchutil import measure, read_vi_output, report
+from parser.bucketing import bucket_instances, numpy
+from parser.parser import Parser
+from parser.timeparser import TimeParser
+
+
+def repeated_compact_video(parser, video, repeat):
+    """
+    returns the CompactVideo of the video with the items of every insight
+    added `repeat` times
+    """
+    compact = parser.compact_video(video, "FOO")
+    insights = video["insights"]
+    for _ in range(repeat - 1):
+        for spec in parser.insight_specs:
+            if spec.insight in insights:
+                compact.add(spec, insights[spec.insight])
+    return compact
+
+
+def main():
+    if numpy is None:
+        print("numpy is not installed, only the python engine is available")
+        return
+    video = read_vi_output()["videos"][0]
+    for intervals in [[10000], [10000, 60000, 300000]]:
+        time_parser = TimeParser(intervals)
+        parsers = [
+            Parser(time_parser=time_parser, bucketing=engine)
+            for engine in ("python", "numpy")
+        ]
+        for repeat in [1, 10]:
+            compact = repeated_compact_video(parsers[0], video, repeat)
+            skeleton = parsers[0].create_intervals(video, "FOO")
+            python, vectorized = [
+                bucket_instances(engine, compact, skeleton, time_parser)
+                for engine in ("python", "numpy")
+            ]
+            assert python[1] == vectorized[1]
+            assert python[0] == vectorized[0]
+            name = "{} instances, intervals {}".format(len(compact), intervals)
+            report(
+                "bucketing " + name,
+                *[
+                    measure(
+                        lambda: bucket_instances(engine, compact, skeleton, time_parser)
+                    )
+                    for engine in ("python", "numpy")
+                ]
+            )
+            report(
+                "materialize " + name,
+                *[
+                    measure(lambda: list(parser.materialize(compact)), 3)
+                    for parser in parsers
+                ]
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Compares the documents of the video of vi-output.json without and with the
+# instances of the same item in an interval coalesced into one object,
+# insight by insight: number of objects, size of the JSON uploaded and time of
+# Parser.materialize.
+# Run from the src directory: python -m benchmarks.coalesce_benchmark
+
+import json
+
+from benchmarks.benchutil import measure, read_vi_output, report
+from parser.parser import Parser
+
+
+def documents(parser, video):
+    return list(parser.materialize(parser.compact_video(video, "FOO")))
+
+
+def count_objects(documents, groups):
+    return sum(
+        len(document.get(group, ())) for document in documents for group in groups
+    )
+
+
+def main():
+    video = read_vi_output()["videos"][0]
+    baseline = Parser(coalesced_insights=[])
+    baseline_documents = documents(baseline, video)
+    baseline_bytes = len(json.dumps(baseline_documents))
+    for insights in [["faces"], ["labels"], ["faces", "labels", "ocr", "keywords"]]:
+        groups = {
+            spec.group
+            for insight in insights
+            for spec in baseline.specs_by_insight[insight]
+        }
+        parser = Parser(coalesced_insights=insights)
+        coalesced_documents = documents(parser, video)
+        coalesced_bytes = len(json.dumps(coalesced_documents))
+        print(
+            "{}: {} objects -> {}, documents {:.0f} KB -> {:.0f} KB ({:.0%} less)".format(
+                "+".join(insights),
+                count_objects(baseline_documents, groups),
+                count_objects(coalesced_documents, groups),
+                baseline_bytes / 1024,
+                coalesced_bytes / 1024,
+                1 - coalesced_bytes / baseline_bytes,
+            )
+        )
+        report(
+            "materialize coalescing " + "+".join(insights),
+            measure(lambda: documents(baseline, video)),
+            measure(lambda: documents(parser, video)),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Measures the wall time and the peak memory of downloading a large VI file
+# and decoding its JSON, from a local fake blob endpoint serving every GET
+# with a latency and a per connection bandwidth (like a remote storage account):
+# - baseline: one download, readall(), decoded to str and encoded back to bytes
+# - current: StorageClient.get_blob_bytes, parallel ranged GETs written in
+#   place, raw bytes given to json.loads
+# Run from the src directory:
+# python -m benchmarks.download_benchmark --megabytes 64 --max-concurrency 4
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from azure.storage.blob import BlobServiceClient
+
+from benchmarks.benchutil import read_vi_output, report
+
+
+def serve_blob(content, latency, bandwidth, ports):
+    """
+    serves one blob from another process (so that its memory is not traced),
+    sending each response at `bandwidth` bytes per second after `latency` seconds
+    :param ports: queue receiving the port of the server
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("x-ms-range"))
+            start = int(match.group(1))
+            end = min(len(content) - 1, int(match.group(2) or len(content)))
+            time.sleep(latency + (end - start + 1) / bandwidth)
+            self.send_response(206)
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header(
+                "Content-Range", "bytes {}-{}/{}".format(start, end, len(content))
+            )
+            self.send_header("ETag", '"0x8D9"')
+            self.send_header("x-ms-blob-type", "BlockBlob")
+            self.end_headers()
+            self.wfile.write(content[start : end + 1])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def large_vi_file(megabytes):
+    """
+    returns vi-output.json as UTF-8 bytes with a BOM, its transcript
+    repeated until the file has about `megabytes` MB
+    """
+    vi_json = read_vi_output()
+    transcript = vi_json["videos"][0]["insights"]["transcript"]
+    transcript_size = len(json.dumps(transcript).encode())
+    repeat = max(1, int(megabytes * 1024 * 1024 / transcript_size))
+    vi_json["videos"][0]["insights"]["transcript"] = transcript * repeat
+    return b"\xef\xbb\xbf" + json.dumps(vi_json).encode()
+
+
+def profile(function):
+    """
+    returns the wall time in seconds and the peak of traced memory in MB
+    (the memory still referenced by the result included)
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument("--megabytes", type=int, default=64)
+    arguments.add_argument("--max-concurrency", type=int, default=4)
+    arguments.add_argument("--latency", type=float, default=0.02)
+    arguments.add_argument("--bandwidth-mbps", type=float, default=400)
+    options = arguments.parse_args()
+    content = large_vi_file(options.megabytes)
+    size = len(content)
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve_blob,
+        args=(
+            content,
+            options.latency,
+            options.bandwidth_mbps * 1024 * 1024 / 8,
+            ports,
+        ),
+        daemon=True,
+    )
+    server.start()
+    del content
+    connection_string = (
+        "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+        "AccountKey=a2V5;BlobEndpoint=http://127.0.0.1:{}/devstoreaccount1"
+    ).format(ports.get())
+    os.environ["STORAGE_CONNECTION_STRING"] = connection_string
+    os.environ["INSIGHTS_CONTAINER_NAME"] = "insights"
+    os.environ["STORAGE_MAX_CONCURRENCY"] = str(options.max_concurrency)
+    # imported once the environment is set, the client reads it
+    from client.storageClient import StorageClient
+
+    client = StorageClient()
+    # the download settings of the SDK: 32 MB first GET, then 4 MB GETs
+    default_client = BlobServiceClient.from_connection_string(connection_string)
+
+    def baseline():
+        text = (
+            default_client.get_blob_client("insights", "video.json")
+            .download_blob()
+            .readall()
+            .decode("utf-8")
+        )
+        return text.encode()
+
+    def current():
+        return client.get_blob_bytes("insights", "video.json")
+
+    # the content given to json.loads, which then costs the same for both
+    baseline_seconds, baseline_peak = profile(baseline)
+    current_seconds, current_peak = profile(current)
+    decode_seconds, decode_peak = profile(lambda: json.loads(current()))
+    print(
+        "{:.1f} MB blob, peak memory of the download: baseline {:.0f} MB, "
+        "current {:.0f} MB (with json.loads {:.0f} MB)".format(
+            size / 1024 / 1024, baseline_peak, current_peak, decode_peak
+        )
+    )
+    report("download to the JSON decoder", baseline_seconds, current_seconds)
+    print("download and json.loads: {:.2f}s".format(decode_seconds))
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
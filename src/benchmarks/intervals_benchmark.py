@@ -0,0 +1,65 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Shows how Parser.create_intervals scales with the video duration compared
+# with the previous implementation, which visited every millisecond.
+# Run from the src directory: python -m benchmarks.intervals_benchmark
+
+import time
+
+from benchmarks.benchutil import read_vi_output, measure, report
+from parser.parser import Parser
+
+
+def scanning_create_intervals(parser, video, show_name):
+    """
+    the previous implementation of Parser.create_intervals
+    """
+    time_parser = parser.time_parser
+    interval = time_parser.interval_in_milliseconds
+
+    def to_time_string(seconds):
+        return str(time.strftime("%H:%M:%S", time.gmtime(seconds)))
+
+    dictionary_of_intervals = dict()
+    duration_in_milliseconds = int(
+        time_parser.string_time_to_milliseconds(video["insights"]["duration"])
+    )
+    for i in range(0, duration_in_milliseconds):
+        if i % interval == 0:
+            end_time = (
+                to_time_string(duration_in_milliseconds)
+                if i + interval >= duration_in_milliseconds
+                else to_time_string((i + interval) / 1000)
+            )
+            dictionary_of_intervals[i] = {
+                "id": video.get("id", "") + "-" + str(int(i / interval)),
+                "accountId": video.get("accountId", ""),
+                "externalId": video.get("externalId", ""),
+                "name": show_name,
+                "metaData": video.get("metadata", ""),
+                "startTime": to_time_string(i / 1000),
+                "endTime": end_time,
+            }
+    return dictionary_of_intervals
+
+
+def main():
+    parser = Parser()
+    video = read_vi_output()["videos"][0]
+    assert parser.create_intervals(video, "FOO") == scanning_create_intervals(
+        parser, video, "FOO"
+    )
+    for duration in ["0:10:00", "0:25:53.387", "1:00:00", "2:00:00"]:
+        synthetic_video = dict(video, insights={"duration": duration})
+        baseline = measure(
+            lambda: scanning_create_intervals(parser, synthetic_video, "FOO"), 1
+        )
+        current = measure(lambda: parser.create_intervals(synthetic_video, "FOO"))
+        report("create_intervals duration " + duration, baseline, current)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Measures the throughput of parsing a local directory of VI files with a
+# pool of 1..N processes returning serialized request bodies (uploads are
+# not sent). The directory holds vi-output.json replicated --files times.
+# Run from the src directory:
+# python -m benchmarks.local_ingest_benchmark --files 1000
+
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.benchutil import RESOURCES_DIRECTORY, read_vi_output, measure
+from client.batcher import MAX_BYTES_PER_REQUEST, MAX_DOCUMENTS_PER_REQUEST
+from client.pipeline import parse_vi_file_to_batches
+from parser.parser import Parser
+
+
+def parse_directory(paths, workers):
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(
+                parse_vi_file_to_batches,
+                path,
+                MAX_DOCUMENTS_PER_REQUEST,
+                MAX_BYTES_PER_REQUEST,
+            )
+            for path in paths
+        ]
+        return sum(len(body) for future in futures for body in future.result())
+
+
+def parent_cost():
+    """
+    returns the time the parent process spends per file to receive the
+    result of a worker and get it ready to post, when the worker returns
+    pickled intervals and when it returns request bodies
+    """
+    path = os.path.join(RESOURCES_DIRECTORY, "vi-output.json")
+    pickled_intervals = pickle.dumps(Parser().parse_vi_json(read_vi_output()))
+    pickled_bodies = pickle.dumps(
+        parse_vi_file_to_batches(path, MAX_DOCUMENTS_PER_REQUEST, MAX_BYTES_PER_REQUEST)
+    )
+    intervals_cost = measure(
+        lambda: json.dumps({"value": pickle.loads(pickled_intervals)}).encode()
+    )
+    bodies_cost = measure(lambda: pickle.loads(pickled_bodies))
+    return intervals_cost, bodies_cost
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument("--files", type=int, default=1000)
+    arguments.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = arguments.parse_args()
+
+    print(
+        "parent process cost per file: pickled intervals {:.2f} ms, "
+        "request bodies {:.2f} ms".format(*[1000 * s for s in parent_cost()])
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.abspath(os.path.join(RESOURCES_DIRECTORY, "vi-output.json"))
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(directory, "vi-output-{}.json".format(i))
+            os.symlink(source, path)
+            paths.append(path)
+        workers = 1
+        single = None
+        while workers <= args.max_workers:
+            started = time.perf_counter()
+            parse_directory(paths, workers)
+            seconds = time.perf_counter() - started
+            single = single or seconds
+            print(
+                "{} workers: {:.1f} files/s, scaling x{:.2f}".format(
+                    workers, args.files / seconds, single / seconds
+                )
+            )
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
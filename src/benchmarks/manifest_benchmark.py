@@ -0,0 +1,49 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Shows the cost of skipping the unchanged blobs of an already ingested
+# container with IngestManifest: opening the manifest and checking the ETag
+# of every listed blob, before anything is downloaded.
+# Run from the src directory: python -m benchmarks.manifest_benchmark --blobs 50000
+
+import argparse
+import os
+import tempfile
+import time
+
+from client.manifest import IngestManifest
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument("--blobs", type=int, default=50000)
+    blobs = arguments.parse_args().blobs
+    listing = [
+        ("video-{}.json".format(i), '"0x8D9{:08X}"'.format(i)) for i in range(blobs)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "manifest.sqlite")
+        manifest = IngestManifest(path)
+        started = time.perf_counter()
+        for name, etag in listing:
+            manifest.record(name, etag)
+        record_seconds = time.perf_counter() - started
+        manifest.close()
+
+        started = time.perf_counter()
+        manifest = IngestManifest(path)
+        skipped = sum(manifest.is_unchanged(name, etag) for name, etag in listing)
+        skip_seconds = time.perf_counter() - started
+        manifest.close()
+    print(
+        "{} blobs: recording {:.2f}s ({:.0f}us per ingested blob), "
+        "opening and skipping {} unchanged {:.3f}s".format(
+            blobs, record_seconds, record_seconds / blobs * 1e6, skipped, skip_seconds
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
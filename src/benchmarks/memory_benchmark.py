@@ -0,0 +1,81 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Compares the memory held by the parsed insights of the video of
+# vi-output.json before they are uploaded: the intervals dictionary of
+# Parser.parse_video and the CompactVideo of Parser.compact_video.
+# Each representation is measured
+# - next to the loaded VI JSON (json.load + iter_documents), which it shares
+#   strings with
+# - on its own, the VI JSON being released once parsed (VIJsonReader +
+#   iter_stream_documents), so it keeps alive every string it references
+# Run from the src directory: python -m benchmarks.memory_benchmark
+
+import gc
+import json
+import os
+import tracemalloc
+
+from benchmarks.benchutil import RESOURCES_DIRECTORY
+from parser.parser import Parser
+
+
+def retained_bytes(build):
+    """
+    returns the memory still allocated after build(), which returns the
+    representation, while it is referenced
+    """
+    gc.collect()
+    tracemalloc.start()
+    representation = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del representation
+    return size
+
+
+def main():
+    parser = Parser()
+    with open(os.path.join(RESOURCES_DIRECTORY, "vi-output.json"), "rb") as f:
+        content = f.read()
+    vi_json = json.loads(content)
+    video = vi_json["videos"][0]
+    # warms the caches of TimeParser, which do not belong to a video
+    parser.parse_video(video, "FOO")
+
+    def parse_alone(parse):
+        def build():
+            alone = json.loads(content)["videos"][0]
+            return parse(alone, "FOO")
+
+        return build
+
+    results = {
+        "with the VI JSON": (
+            retained_bytes(lambda: parser.parse_video(video, "FOO")),
+            retained_bytes(lambda: parser.compact_video(video, "FOO")),
+        ),
+        "on its own": (
+            retained_bytes(parse_alone(parser.parse_video)),
+            retained_bytes(parse_alone(parser.compact_video)),
+        ),
+    }
+    compact = parser.compact_video(video, "FOO")
+    print(
+        "vi-output.json: {} instances, {} intervals".format(
+            len(compact), len(parser.create_intervals(video, "FOO"))
+        )
+    )
+    for name, (intervals, compact) in results.items():
+        print(
+            "{}: intervals {:.0f} KB, compact {:.0f} KB, x{:.1f} less".format(
+                name, intervals / 1024, compact / 1024, intervals / compact
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Compares peak memory and wall time of parsing a large synthetic VI file
+# with json.load + Parser.iter_documents and with VIJsonReader +
+# Parser.iter_stream_documents. Each mode runs in its own process.
+# Run from the src directory:
+# python -m benchmarks.reader_benchmark --size-mb 500
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.benchutil import read_vi_output
+from parser.parser import Parser
+from parser.vijsonreader import VIJsonReader
+
+
+def write_synthetic_vi_file(path, size_in_mb):
+    """
+    writes a VI file of about size_in_mb by repeating the video of
+    vi-output.json with different ids, without holding the file in memory
+    """
+    vi_output = read_vi_output()
+    video = vi_output.pop("videos")[0]
+    header = json.dumps(vi_output)[:-1]
+    with open(path, "w") as f:
+        f.write(header + ', "videos": [')
+        i = 0
+        while f.tell() < size_in_mb * 1024 * 1024:
+            f.write((", " if i else "") + json.dumps(dict(video, id="video-" + str(i))))
+            i += 1
+        f.write("]}")
+    return i
+
+
+def parse(path, mode):
+    parser = Parser()
+    count = 0
+    with open(path, "rb") as f:
+        if mode == "load":
+            documents = parser.iter_documents(json.load(f))
+        else:
+            reader = VIJsonReader(f)
+            header = reader.read_header()
+            documents = parser.iter_stream_documents(
+                header["name"], reader.videos(parser.specs_by_insight)
+            )
+        for _ in documents:
+            count += 1
+    return count
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    arguments.add_argument("--size-mb", type=int, default=500)
+    arguments.add_argument("--mode", choices=["load", "stream"])
+    arguments.add_argument("--path")
+    args = arguments.parse_args()
+
+    if args.mode:
+        started = time.perf_counter()
+        count = parse(args.path, args.mode)
+        print(
+            json.dumps(
+                {
+                    "documents": count,
+                    "seconds": time.perf_counter() - started,
+                    # ru_maxrss is in kilobytes on Linux
+                    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                    / 1024,
+                }
+            )
+        )
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic-vi-output.json")
+        videos = write_synthetic_vi_file(path, args.size_mb)
+        print(
+            "{} MB file with {} videos".format(
+                os.path.getsize(path) // (1024 * 1024), videos
+            )
+        )
+        for mode in ["stream", "load"]:
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.reader_benchmark"]
+                + ["--mode", mode, "--path", path],
+                capture_output=True,
+                text=True,
+            )
+            print(mode, result.stdout.strip() or result.stderr.strip()[-300:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Times the stages of the ingestion on a synthetic VI file (see synthetic.py)
+# and writes the results as JSON, so that a regression shows up when
+# comparing the results of two commits:
+# - load_vi_json: json.loads of the file
+# - create_intervals, and every parse_* method of Parser on new intervals
+# - parse_vi_json: the whole file
+# - serialization: DocumentBatcher packing the documents in request bodies
+# - upload_stub: DocumentBatcher posting them with SearchSession and
+#   post_with_retry to a local stand-in of the docs/index endpoint
+# Run from the src directory:
+# python -m benchmarks.suite --duration 3600 --density labels=500 --output after.json --compare before.json
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks import synthetic
+from client.batcher import DocumentBatcher
+from client.httpsession import SearchSession
+from client.throttling import AdaptiveRateController, post_with_retry
+from parser.parser import Parser
+
+# the parse_* methods of Parser and their insight
+PARSE_METHODS = (
+    ("parse_transcript", "transcript"),
+    ("parse_ocr", "ocr"),
+    ("parse_keywords", "keywords"),
+    ("parse_topics", "topics"),
+    ("parse_faces", "faces"),
+    ("parse_labels", "labels"),
+    ("parse_named_locations", "namedLocations"),
+    ("parse_named_people", "namedPeople"),
+    ("parse_audio_effects", "audioEffects"),
+    ("parse_sentiments", "sentiments"),
+    ("parse_emotions", "emotions"),
+    ("parse_visual_content_moderation", "visualContentModeration"),
+    ("parse_frame_patterns", "framePatterns"),
+    ("parse_brands", "brands"),
+)
+
+
+def serve_search(ports):
+    """
+    answers every POST (from another process, so that it does not share the
+    interpreter with the client) with a 200 status for every document
+    :param ports: queue receiving the port of the server
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            documents = body.count(b'"@search.action"')
+            content = json.dumps(
+                {"value": [{"status": True, "statusCode": 200}] * documents}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def time_scenario(run, setup=None, repeat=5):
+    """
+    runs a scenario several times
+    :param run: function of the result of setup
+    :param setup: function preparing the input of every run, not timed
+    :param repeat:
+    :return: durations in seconds
+    """
+    durations = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        started = time.perf_counter()
+        run(argument)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def summary(durations, **counts):
+    """
+    :param counts: sizes of the input of the scenario (e.g. documents),
+    reported per second of the best run
+    """
+    best = min(durations)
+    result = {
+        "best": best,
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+        "repeat": len(durations),
+    }
+    for name, count in counts.items():
+        result[name] = count
+        result[name + "PerSecond"] = count / best if best else None
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenarios(vi_json, repeat, server_url):
+    parser = Parser()
+    content = json.dumps(vi_json)
+    videos = vi_json["videos"]
+    instances = sum(
+        len(item.get("instances", ()))
+        for video in videos
+        for insight in video["insights"].values()
+        if isinstance(insight, list)
+        for item in insight
+    )
+    documents = parser.parse_vi_json(vi_json)
+    for document in documents:
+        document["@search.action"] = "upload"
+    serialized_bytes = sum(
+        len(json.dumps(d, separators=(",", ":")).encode()) for d in documents
+    )
+    scenarios = dict()
+    scenarios["load_vi_json"] = summary(
+        time_scenario(lambda _: json.loads(content), repeat=repeat),
+        bytes=len(content),
+    )
+    scenarios["create_intervals"] = summary(
+        time_scenario(
+            lambda _: [parser.create_intervals(v, vi_json["name"]) for v in videos],
+            repeat=repeat,
+        ),
+        documents=len(documents),
+    )
+    for method, insight in PARSE_METHODS:
+        items = [v["insights"].get(insight, []) for v in videos]
+
+        def parse_insight(intervals, method=method, items=items):
+            for video_items, video_intervals in zip(items, intervals):
+                getattr(parser, method)(video_items, video_intervals)
+
+        scenarios[method] = summary(
+            time_scenario(
+                parse_insight,
+                lambda: [parser.create_intervals(v, vi_json["name"]) for v in videos],
+                repeat,
+            ),
+            instances=sum(len(i.get("instances", ())) for v in items for i in v),
+        )
+    scenarios["parse_vi_json"] = summary(
+        time_scenario(lambda _: parser.parse_vi_json(vi_json), repeat=repeat),
+        instances=instances,
+        documents=len(documents),
+    )
+
+    def batch(send):
+        def run(_):
+            batcher = DocumentBatcher(send)
+            for document in documents:
+                batcher.add(document)
+            batcher.flush()
+
+        return run
+
+    scenarios["serialization"] = summary(
+        time_scenario(batch(lambda body: None), repeat=repeat),
+        documents=len(documents),
+        bytes=serialized_bytes,
+    )
+    session = SearchSession({"Content-Type": "application/json"})
+    controller = AdaptiveRateController()
+    scenarios["upload_stub"] = summary(
+        time_scenario(
+            batch(lambda body: post_with_retry(session, server_url, body, controller)),
+            repeat=repeat,
+        ),
+        documents=len(documents),
+        bytes=serialized_bytes,
+    )
+    return {
+        "bytes": len(content),
+        "videos": len(videos),
+        "instances": instances,
+        "documents": len(documents),
+    }, scenarios
+
+
+def compare(results, previous, threshold):
+    """
+    prints the best time of every scenario against the previous results
+    :return: names of the scenarios slower than the previous ones by more
+    than threshold (e.g. 0.1 for 10%)
+    """
+    if previous["input"] != results["input"]:
+        print("the previous results were measured on another input")
+    regressions = []
+    for name, scenario in results["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if not before:
+            continue
+        ratio = scenario["best"] / before["best"] if before["best"] else 1
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            "{:<34} {:>9.4f}s -> {:>9.4f}s  x{:.2f}{}".format(
+                name, before["best"], scenario["best"], ratio, flag
+            )
+        )
+    return regressions
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    synthetic.add_arguments(arguments)
+    arguments.add_argument("--repeat", type=int, default=5)
+    arguments.add_argument("--output", default="benchmark-results.json")
+    arguments.add_argument("--compare", help="results of a previous run")
+    arguments.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown of the best time reported as a regression",
+    )
+    options = arguments.parse_args()
+
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_search, args=(ports,), daemon=True)
+    server.start()
+    server_url = "http://127.0.0.1:{}/indexes/benchmark/docs/index".format(ports.get())
+    try:
+        vi_input, scenarios = run_scenarios(
+            synthetic.from_arguments(options), options.repeat, server_url
+        )
+    finally:
+        server.terminate()
+    results = {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(options),
+        "input": vi_input,
+        "scenarios": scenarios,
+    }
+    with open(options.output, "w") as f:
+        json.dump(results, f, indent=2)
+    for name, scenario in scenarios.items():
+        print("{:<34} {:>9.4f}s".format(name, scenario["best"]))
+    if options.compare:
+        with open(options.compare) as f:
+            previous = json.load(f)
+        if compare(results, previous, options.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
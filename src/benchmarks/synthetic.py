@@ -0,0 +1,272 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Generates Video Indexer JSON files of any size, with the fields read by the
+# InsightSpecs of the parser, to benchmark it beyond vi-output.json.
+# Run from the src directory:
+# python -m benchmarks.synthetic --duration 3600 --videos 2 --density labels=500 --output vi.json
+
+import argparse
+import json
+import random
+
+from parser.insightspec import INSIGHT_SPECS
+
+# instances per minute of video of every insight, as in vi-output.json
+# (brands has none there)
+DEFAULT_DENSITY = {
+    "ocr": 6.3,
+    "keywords": 5,
+    "topics": 1.3,
+    "faces": 17,
+    "labels": 108,
+    "namedLocations": 0.3,
+    "namedPeople": 0.5,
+    "audioEffects": 0.35,
+    "sentiments": 1.2,
+    "emotions": 0.6,
+    "visualContentModeration": 0.6,
+    "framePatterns": 0.5,
+    "brands": 0.5,
+}
+# lines of transcript per minute of video, as in vi-output.json
+DEFAULT_TRANSCRIPT_LINES_PER_MINUTE = 12
+
+
+def time_string(milliseconds):
+    """
+    formats milliseconds as VI does, e.g. 0:02:04.708
+    """
+    seconds, fraction = divmod(int(milliseconds), 1000)
+    text = "{}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+    return text + ".{:03d}".format(fraction) if fraction else text
+
+
+def field_value(key, index, rng, numeric_keys):
+    """
+    returns a plausible value of a field of an item, child or instance
+    """
+    if key == "id":
+        return index
+    if key in numeric_keys:
+        return round(rng.uniform(0.55, 1), 4)
+    if key == "thumbnailsIds":
+        return ["thumbnail-{}".format(index)]
+    return "{}-{}".format(key, index)
+
+
+class SyntheticVideoIndexer:
+    """
+    This class generates the VI JSON of videos with the given duration,
+    number of instances per minute of every insight and transcript length,
+    filling every field read by the insight specs. The output only depends
+    on the seed.
+    """
+
+    def __init__(
+        self,
+        duration_seconds=1553,
+        density=None,
+        transcript_lines=None,
+        words_per_line=12,
+        instances_per_item=6,
+        max_instance_seconds=10,
+        insight_specs=INSIGHT_SPECS,
+        seed=0,
+    ):
+        """
+        :param duration_seconds: duration of every video
+        :param density: instances per minute of every insight, updating
+        DEFAULT_DENSITY (e.g. {"labels": 500})
+        :param transcript_lines: lines of transcript of every video,
+        DEFAULT_TRANSCRIPT_LINES_PER_MINUTE by default
+        :param words_per_line: words of every line of transcript
+        :param instances_per_item: average number of instances of an item
+        (e.g. of a face)
+        :param max_instance_seconds: instances last up to this duration
+        :param insight_specs: specs whose fields are generated
+        :param seed:
+        """
+        self.duration_milliseconds = int(duration_seconds * 1000)
+        self.density = dict(DEFAULT_DENSITY, **(density or {}))
+        self.transcript_lines = (
+            transcript_lines
+            if transcript_lines is not None
+            else int(duration_seconds / 60 * DEFAULT_TRANSCRIPT_LINES_PER_MINUTE)
+        )
+        self.words_per_line = words_per_line
+        self.instances_per_item = instances_per_item
+        self.max_instance_milliseconds = int(max_instance_seconds * 1000)
+        self.specs_by_insight = dict()
+        for spec in insight_specs:
+            self.specs_by_insight.setdefault(spec.insight, []).append(spec)
+        self.rng = random.Random(seed)
+
+    def instance(self, start, end):
+        return {
+            "adjustedStart": time_string(start),
+            "adjustedEnd": time_string(end),
+            "start": time_string(start),
+            "end": time_string(end),
+        }
+
+    def random_instances(self, count):
+        """
+        returns count instances at random times, sorted by start
+        """
+        instances = []
+        for start in sorted(
+            self.rng.randrange(self.duration_milliseconds) for _ in range(count)
+        ):
+            length = self.rng.randrange(100, self.max_instance_milliseconds)
+            end = min(start + length, self.duration_milliseconds)
+            instances.append(self.instance(start, end))
+        return instances
+
+    def transcript(self):
+        words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur"]
+        length = self.duration_milliseconds / max(self.transcript_lines, 1)
+        return [
+            {
+                "id": i + 1,
+                "text": " ".join(
+                    self.rng.choice(words) for _ in range(self.words_per_line)
+                ),
+                "confidence": round(self.rng.uniform(0.55, 1), 4),
+                "speakerId": self.rng.randrange(1, 5),
+                "language": "en-US",
+                "instances": [self.instance(i * length, (i + 1) * length)],
+            }
+            for i in range(self.transcript_lines)
+        ]
+
+    def insight(self, insight):
+        """
+        generates the items of an insight, their fields are the fields read
+        by its specs and their instances are spread over the video
+        """
+        specs = self.specs_by_insight[insight]
+        minutes = self.duration_milliseconds / 60000
+        remaining = round(self.density.get(insight, 0) * minutes)
+        # numeric fields, the others are strings
+        numeric_keys = {"confidence"}
+        for spec in specs:
+            numeric_keys.add(spec.confidence)
+            if spec.value_format is not None:
+                numeric_keys.add(spec.value)
+        items = []
+        while remaining > 0:
+            index = len(items) + 1
+            instances = self.random_instances(min(self.instances_per_item, remaining))
+            remaining -= len(instances)
+            item = {"id": index}
+            for spec in specs:
+                keys = [spec.non_empty, spec.confidence]
+                keys.extend(a.key for a in spec.item_assets)
+                if spec.children is None:
+                    keys.append(spec.value)
+                for key in keys:
+                    if key is not None and key not in item:
+                        item[key] = field_value(key, index, self.rng, numeric_keys)
+                if spec.children is not None:
+                    # one child (e.g. a thumbnail of a face) per instance
+                    item[spec.children] = [
+                        self.child(spec, index, i, instance, numeric_keys)
+                        for i, instance in enumerate(instances)
+                    ]
+            for instance in instances:
+                for spec in specs:
+                    for asset in spec.instance_assets:
+                        instance[asset.key] = field_value(
+                            asset.key, index, self.rng, numeric_keys
+                        )
+            item["instances"] = instances
+            items.append(item)
+        return items
+
+    def child(self, spec, index, child_index, instance, numeric_keys):
+        child = {
+            a.key: field_value(a.key, child_index, self.rng, numeric_keys)
+            for a in spec.child_assets
+        }
+        child[spec.value] = "{}-{}-{}".format(spec.value, index, child_index)
+        child["instances"] = [dict(instance)]
+        return child
+
+    def video(self, index):
+        insights = {
+            "version": "1.0.0.0",
+            "duration": time_string(self.duration_milliseconds),
+        }
+        for insight in self.specs_by_insight:
+            if insight == "transcript":
+                insights[insight] = self.transcript()
+            else:
+                insights[insight] = self.insight(insight)
+        return {
+            "accountId": "synthetic-account",
+            "id": "synthetic-{}".format(index),
+            "externalId": "external-{}".format(index),
+            "metadata": "synthetic video {}".format(index),
+            "insights": insights,
+        }
+
+    def vi_json(self, videos=1):
+        """
+        :param videos: number of videos of the file
+        :return: VI JSON
+        """
+        return {
+            "accountId": "synthetic-account",
+            "id": "synthetic",
+            "name": "synthetic",
+            "durationInSeconds": self.duration_milliseconds // 1000 * videos,
+            "videos": [self.video(i) for i in range(videos)],
+        }
+
+
+def parse_density(values):
+    """
+    parses ["labels=500", "faces=40"] to {"labels": 500.0, "faces": 40.0}
+    """
+    density = dict()
+    for value in values or []:
+        insight, _, per_minute = value.partition("=")
+        density[insight] = float(per_minute)
+    return density
+
+
+def add_arguments(arguments):
+    arguments.add_argument("--duration", type=float, default=1553, help="seconds")
+    arguments.add_argument("--videos", type=int, default=1)
+    arguments.add_argument(
+        "--density",
+        action="append",
+        help="instances per minute of an insight, e.g. labels=500",
+    )
+    arguments.add_argument("--transcript-lines", type=int, default=None)
+    arguments.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(options):
+    return SyntheticVideoIndexer(
+        duration_seconds=options.duration,
+        density=parse_density(options.density),
+        transcript_lines=options.transcript_lines,
+        seed=options.seed,
+    ).vi_json(options.videos)
+
+
+def main():
+    arguments = argparse.ArgumentParser()
+    add_arguments(arguments)
+    arguments.add_argument("--output", required=True)
+    options = arguments.parse_args()
+    with open(options.output, "w") as f:
+        json.dump(from_arguments(options), f)
+
+
+if __name__ == "__main__":
+    main()
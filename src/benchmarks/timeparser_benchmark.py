@@ -0,0 +1,53 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Compares TimeParser.get_related_intervals with the previous per-millisecond
+# implementation over every instance in tests/resources/vi-output.json.
+# Run from the src directory: python -m benchmarks.timeparser_benchmark
+
+from benchmarks.benchutil import read_vi_output, iterate_instances, measure, report
+from parser.timeparser import TimeParser
+
+
+def scanning_related_intervals(start, end, interval_in_milliseconds):
+    """
+    the previous implementation, visiting every millisecond between start and end
+    """
+    intervals = []
+    if end - start < interval_in_milliseconds:
+        intervals.append(int(start) - int(start) % interval_in_milliseconds)
+    for i in range(int(start), int(end)):
+        if i % interval_in_milliseconds == 0:
+            intervals.append(i)
+    return intervals
+
+
+def main():
+    time_parser = TimeParser()
+    interval = time_parser.interval_in_milliseconds
+    spans = [
+        (
+            time_parser.string_time_to_milliseconds(instance["start"]),
+            time_parser.string_time_to_milliseconds(instance["end"]),
+        )
+        for instance in iterate_instances(read_vi_output())
+    ]
+    for start, end in spans:
+        assert time_parser.get_related_intervals(
+            start, end
+        ) == scanning_related_intervals(start, end, interval)
+
+    baseline = measure(
+        lambda: [scanning_related_intervals(s, e, interval) for s, e in spans], 3
+    )
+    current = measure(
+        lambda: [time_parser.get_related_intervals(s, e) for s, e in spans]
+    )
+    print("{} instances, {} ms interval".format(len(spans), interval))
+    report("get_related_intervals", baseline, current)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Compares TimeParser.string_time_to_milliseconds with the previous
+# regex + strptime implementation over every start/end timestamp
+# in tests/resources/vi-output.json, with a cold and a warm cache.
+# Run from the src directory: python -m benchmarks.timestamp_benchmark
+
+import re
+from datetime import datetime
+
+from benchmarks.benchutil import read_vi_output, iterate_instances, measure, report
+from parser.timeparser import TimeParser
+
+
+def regex_string_time_to_milliseconds(string_time):
+    """
+    the previous implementation of TimeParser.string_time_to_milliseconds
+    """
+    if re.search("^([0-1]?[0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]$", string_time):
+        date_time = datetime.strptime(string_time, "%H:%M:%S")
+    elif re.search(r"^([0-1]?[0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]\.\d", string_time):
+        date_time = datetime.strptime(string_time, "%H:%M:%S.%f")
+    else:
+        raise ValueError("time format  error")
+    date_time = date_time - datetime(1900, 1, 1)
+    return date_time.total_seconds() * 1000
+
+
+def main():
+    timestamps = []
+    for instance in iterate_instances(read_vi_output()):
+        timestamps.append(instance["start"])
+        timestamps.append(instance["end"])
+    parse = TimeParser.string_time_to_milliseconds
+    for timestamp in timestamps:
+        assert (
+            abs(parse(timestamp) - regex_string_time_to_milliseconds(timestamp)) < 1e-6
+        )
+
+    def parse_cold():
+        parse.cache_clear()
+        for timestamp in timestamps:
+            parse(timestamp)
+
+    def parse_warm():
+        for timestamp in timestamps:
+            parse(timestamp)
+
+    baseline = measure(
+        lambda: [regex_string_time_to_milliseconds(t) for t in timestamps]
+    )
+    print("{} timestamps, {} distinct".format(len(timestamps), len(set(timestamps))))
+    report("string_time_to_milliseconds (cold cache)", baseline, measure(parse_cold))
+    report("string_time_to_milliseconds (warm cache)", baseline, measure(parse_warm))
+
+
+if __name__ == "__main__":
+    main()
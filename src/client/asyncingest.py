@@ -0,0 +1,291 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob.aio import BlobServiceClient
+
+from client.batcher import MAX_BYTES_PER_REQUEST, MAX_DOCUMENTS_PER_REQUEST
+from client.clientabstract import ClientAbstract
+from client.metrics import DISABLED
+from client.pipeline import parse_vi_content_to_batches
+from client.storageClient import DEFAULT_CHUNK_SIZE, BlobBuffer
+from client.throttling import AdaptiveRateController, BatchRetry
+
+
+class AsyncStorageClient(ClientAbstract):
+    """
+    This class lists and downloads the blobs of the insights container with
+    the async storage SDK, sharing one aiohttp session limited to
+    connections_per_host connections. Use it as an async context manager.
+    The blobs are read through the BlobCache of the StorageClient when given.
+    """
+
+    def __init__(self, connections_per_host=32, cache=None):
+        """
+        :param connections_per_host:
+        :param cache: BlobCache, None to always download the blobs
+        """
+        self.connection_string = (
+            self.config["storage"]["connection-string"]
+            if self.config
+            else os.getenv("STORAGE_CONNECTION_STRING")
+        )
+        self.container_name = (
+            self.config["storage"]["container"]
+            if self.config
+            else os.getenv("INSIGHTS_CONTAINER_NAME")
+        )
+        self.max_concurrency = int(
+            self.config["storage"].get("max-concurrency", 4)
+            if self.config
+            else os.getenv("STORAGE_MAX_CONCURRENCY", "4")
+        )
+        self.chunk_size = int(
+            self.config["storage"].get("chunk-size", DEFAULT_CHUNK_SIZE)
+            if self.config
+            else os.getenv("STORAGE_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE))
+        )
+        self.connections_per_host = connections_per_host
+        self.cache = cache
+        # ETags of the listed blobs, the key of a blob in the cache
+        self.etags = dict()
+        self.http_session = None
+        self.blob_service_client = None
+        self.container_client = None
+
+    async def __aenter__(self):
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=self.connections_per_host)
+        )
+        self.blob_service_client = BlobServiceClient.from_connection_string(
+            self.connection_string,
+            transport=AioHttpTransport(session=self.http_session, session_owner=False),
+            max_single_get_size=self.chunk_size,
+            max_chunk_get_size=self.chunk_size,
+        )
+        self.container_client = self.blob_service_client.get_container_client(
+            self.container_name
+        )
+        return self
+
+    async def __aexit__(self, *args):
+        await self.blob_service_client.close()
+        await self.http_session.close()
+
+    async def list_files_in_container(self, name_starts_with=None):
+        """
+        yields the blobs of the container
+        :param name_starts_with:
+        :return: async generator of BlobProperties (name, etag...)
+        """
+        async for blob in self.container_client.list_blobs(
+            name_starts_with=name_starts_with
+        ):
+            if self.cache is not None:
+                self.etags[blob.name] = blob.etag
+            yield blob
+
+    async def get_blob_bytes(self, blob):
+        """
+        returns the content of a blob from the cache, or downloads and caches
+        it (see StorageClient.get_blob_bytes), the files of the cache being
+        read and written in a thread
+        :param blob: name of the blob
+        :return: bytes-like content of the blob
+        """
+        if self.cache is None:
+            return await self.download_blob_bytes(blob)
+        etag = self.etags.pop(blob, None)
+        if etag is None:
+            properties = await self.container_client.get_blob_client(
+                blob
+            ).get_blob_properties()
+            etag = properties.etag
+        name = self.container_name + "/" + blob
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(None, self.cache.get, name, etag)
+        if content is None:
+            content = await self.download_blob_bytes(blob)
+            await loop.run_in_executor(None, self.cache.put, name, etag, content)
+        return content
+
+    async def download_blob_bytes(self, blob):
+        """
+        downloads a blob with parallel ranged GETs
+        :param blob: name of the blob
+        :return: bytearray of the content of the blob
+        """
+        downloader = await self.container_client.download_blob(
+            blob, max_concurrency=self.max_concurrency
+        )
+        stream = BlobBuffer(downloader.size)
+        await downloader.readinto(stream)
+        return stream.buffer
+
+
+class AsyncSearchUploader:
+    """
+    This class posts request bodies to the docs/index endpoint of the
+    search index with aiohttp, limited to connections_per_host connections,
+    sending the failed documents again (see BatchRetry).
+    Use it as an async context manager.
+    """
+
+    def __init__(
+        self,
+        url,
+        headers,
+        connections_per_host=32,
+        controller=None,
+        max_attempts=8,
+        metrics=DISABLED,
+    ):
+        """
+        :param url: docs/index endpoint
+        :param headers: headers sent with every request (e.g. api-key)
+        :param connections_per_host: maximum number of connections
+        :param controller: AdaptiveRateController limiting the concurrent requests
+        :param max_attempts: attempts to index a request body
+        :param metrics: IngestMetrics recording the uploads
+        """
+        self.url = url
+        self.headers = headers
+        self.connections_per_host = connections_per_host
+        self.controller = controller or AdaptiveRateController(connections_per_host)
+        self.max_attempts = max_attempts
+        self.metrics = metrics
+        self.session = None
+        self.request_count = 0
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit_per_host=self.connections_per_host),
+        )
+        return self
+
+    async def __aexit__(self, *args):
+        await self.session.close()
+
+    async def post_documents(self, body):
+        started = time.perf_counter()
+        retry = BatchRetry(body, self.controller, self.max_attempts)
+        index_content = None
+        while retry.body is not None:
+            async with self.controller.async_slot():
+                try:
+                    async with self.session.post(self.url, data=retry.body) as response:
+                        status, headers = response.status, response.headers
+                        try:
+                            index_content = await response.json(content_type=None)
+                        except ValueError:
+                            index_content = None
+                except aiohttp.ClientError:
+                    status, headers, index_content = None, None, None
+            self.request_count += 1
+            delay = retry.record(status, headers, index_content)
+            if delay:
+                await asyncio.sleep(delay)
+        self.metrics.observe("upload", time.perf_counter() - started, size=len(body))
+        print(index_content)
+        return index_content
+
+
+class AsyncIngest:
+    """
+    This class ingests blobs with asyncio, keeping up to `concurrency` blobs
+    downloading, parsing or uploading at the same time. Parsing is CPU bound
+    so it runs in a pool of processes, the event loop only waits on I/O.
+    """
+
+    def __init__(
+        self,
+        storage,
+        uploader,
+        on_ingested,
+        on_failed,
+        delta=lambda name: None,
+        concurrency=200,
+        parse_workers=None,
+        max_documents=MAX_DOCUMENTS_PER_REQUEST,
+        max_bytes=MAX_BYTES_PER_REQUEST,
+        metrics=DISABLED,
+    ):
+        """
+        :param storage: object with an async get_blob_bytes(name) e.g. AsyncStorageClient
+        :param uploader: object with an async post_documents(body) e.g. AsyncSearchUploader
+        :param on_ingested: function(name, fingerprints) called when a blob is
+        uploaded, with the fingerprints of its documents
+        :param on_failed: function(name, exception) called when a blob failed
+        :param delta: function(name) returning the DocumentDelta of a blob,
+        by default every document is uploaded
+        :param concurrency: maximum number of blobs in flight
+        :param parse_workers: number of parsing processes, defaults to the CPUs
+        :param max_documents: maximum number of documents per request
+        :param max_bytes: maximum size of a request body
+        :param metrics: IngestMetrics recording the download and parse times
+        and the number of blobs in flight
+        """
+        self.storage = storage
+        self.uploader = uploader
+        self.on_ingested = on_ingested
+        self.on_failed = on_failed
+        self.delta = delta
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+
+    async def run(self, names):
+        """
+        ingests every blob, returns when all of them are uploaded or failed
+        :param names: async iterable of blob names
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        with ProcessPoolExecutor(self.parse_workers) as pool:
+            async for name in names:
+                await semaphore.acquire()
+                task = asyncio.create_task(self.ingest(name, pool, semaphore))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                self.metrics.gauge_queue("inFlight", len(tasks))
+            if tasks:
+                await asyncio.gather(*list(tasks))
+
+    async def ingest(self, name, pool, semaphore):
+        try:
+            started = time.perf_counter()
+            content = await self.storage.get_blob_bytes(name)
+            downloaded = time.perf_counter()
+            self.metrics.observe("download", downloaded - started, size=len(content))
+            batches = await asyncio.get_running_loop().run_in_executor(
+                pool,
+                parse_vi_content_to_batches,
+                content,
+                self.max_documents,
+                self.max_bytes,
+                self.delta(name),
+            )
+            # the time until the result of the pool, waiting for a process included
+            self.metrics.observe("parse", time.perf_counter() - downloaded)
+            if batches is not None:
+                bodies, fingerprints = batches
+                print(f"uploading {name} to search index")
+                await asyncio.gather(
+                    *[self.uploader.post_documents(body) for body in bodies]
+                )
+                self.on_ingested(name, fingerprints)
+        except Exception as ex:
+            self.on_failed(name, ex)
+        finally:
+            semaphore.release()
@@ -0,0 +1,129 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+
+from client.metrics import DISABLED
+
+# Azure Search accepts at most 1000 documents and 16 MB per indexing request
+MAX_DOCUMENTS_PER_REQUEST = 1000
+MAX_BYTES_PER_REQUEST = 16 * 1024 * 1024
+
+_BODY_START = b'{"value":['
+_BODY_END = b"]}"
+
+
+class DocumentBatcher:
+    """
+    This class packs documents (of one or many videos) into request bodies
+    for the docs/index endpoint of Azure Search, sending a request whenever
+    the next document would exceed the document count or byte budget.
+    Each document is serialized once when it is added, the size of the
+    request is the running sum of the serialized documents.
+    """
+
+    def __init__(
+        self,
+        send,
+        max_documents=MAX_DOCUMENTS_PER_REQUEST,
+        max_bytes=MAX_BYTES_PER_REQUEST,
+        on_sent=None,
+        on_failed=None,
+        metrics=DISABLED,
+    ):
+        """
+        :param send: function posting a serialized request body (bytes)
+        :param max_documents: maximum number of documents per request
+        :param max_bytes: maximum size of a request body in bytes
+        :param on_sent: function(tags) called after each request with the tags
+        given to add() for its documents, e.g. to checkpoint them
+        :param on_failed: function(tags, exception) called instead of raising
+        when a request fails with a ValueError (e.g. SearchUploadError), with
+        the tags of its documents, so that the files they belong to are
+        failed and not the file being added
+        :param metrics: IngestMetrics timing the serialization of the documents
+        """
+        self.send = send
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.metrics = metrics
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.sent_requests = 0
+        self.sent_documents = 0
+        self.sent_bytes = 0
+        self._documents = []
+        self._tags = []
+        self._size = len(_BODY_START) + len(_BODY_END)
+        self._callbacks = []
+
+    def add(self, document, tag=None):
+        """
+        adds a document to the current batch, sending the batch first
+        when the document does not fit in it
+        :param document: dictionary of the document (including "@search.action")
+        :param tag: passed to on_sent once the document is sent
+        """
+        with self.metrics.stage("serialize", documents=1) as stage:
+            serialized = json.dumps(document, separators=(",", ":")).encode("utf-8")
+            stage.add(size=len(serialized))
+        # documents are separated by a comma
+        size = len(serialized) + 1 if self._documents else len(serialized)
+        if self._documents and (
+            len(self._documents) >= self.max_documents
+            or self._size + size > self.max_bytes
+        ):
+            self.flush()
+            size = len(serialized)
+        self._documents.append(serialized)
+        if tag is not None:
+            self._tags.append(tag)
+        self._size += size
+
+    def flush(self):
+        """
+        sends the current batch, then calls the callbacks waiting for it
+        """
+        if self._documents:
+            body = _BODY_START + b",".join(self._documents) + _BODY_END
+            count = len(self._documents)
+            tags = self._tags
+            self._documents = []
+            self._tags = []
+            self._size = len(_BODY_START) + len(_BODY_END)
+            try:
+                self.send(body)
+            except ValueError as ex:
+                if self.on_failed is None:
+                    # the files waiting for this batch are not uploaded
+                    self._callbacks = []
+                    raise
+                self.on_failed(tags, ex)
+            except Exception:
+                self._callbacks = []
+                raise
+            else:
+                self.sent_requests += 1
+                self.sent_documents += count
+                self.sent_bytes += len(body)
+                if tags and self.on_sent is not None:
+                    self.on_sent(tags)
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_flushed(self, callback):
+        """
+        calls the callback once every document added so far has been sent
+        e.g. to log a file as ingested
+        :param callback: function without arguments
+        """
+        if self._documents:
+            self._callbacks.append(callback)
+        else:
+            callback()
+
+    def __len__(self):
+        return len(self._documents)
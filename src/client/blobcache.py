@@ -0,0 +1,221 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import collections
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024 * 1024
+COMPRESSIONS = (None, "gzip", "zstd")
+SUFFIXES = {None: ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+
+
+def open_compressed(path, mode, compression):
+    """
+    opens a cache file as a binary stream of the uncompressed content
+    :param path:
+    :param mode: "rb" or "wb"
+    :param compression: None, "gzip" or "zstd" (needs the zstandard package)
+    """
+    if compression is None:
+        return open(path, mode)
+    if compression == "gzip":
+        # VI JSON shrinks about 10 times already at the fastest level
+        return gzip.open(path, mode, compresslevel=1)
+    f = open(path, mode)
+    if mode == "rb":
+        return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+    return zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=True)
+
+
+class BlobCache:
+    """
+    This class is a size bounded cache of downloaded blobs on the local disk,
+    so that running the ingestion again (e.g. with another interval) reads the
+    blobs from the disk instead of the storage account.
+    A blob is cached under a hash of its name and ETag, so a modified blob is
+    downloaded again; its stale version is evicted in time. When the cached
+    files exceed max_bytes, the least recently used ones are deleted.
+    The files can be compressed with gzip or zstd (zstandard package).
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, compression=None):
+        """
+        :param directory: directory of the cached files, created when missing
+        :param max_bytes: maximum size of the cached files on disk
+        :param compression: None, "gzip" or "zstd"
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                "unknown blob cache compression '{}', expected gzip or zstd".format(
+                    compression
+                )
+            )
+        if compression == "zstd" and zstandard is None:
+            raise ValueError(
+                "blob cache compression 'zstd' needs the zstandard package"
+            )
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.suffix = SUFFIXES[compression]
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        # file name to size, from the least to the most recently used
+        self.entries = collections.OrderedDict()
+        files = [
+            entry
+            for entry in os.scandir(directory)
+            if entry.is_file() and entry.name.endswith(self.suffix)
+        ]
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            self.entries[entry.name] = entry.stat().st_size
+        self.size = sum(self.entries.values())
+
+    def file_name(self, name, etag):
+        key = hashlib.sha256("{}\0{}".format(name, etag).encode("utf-8"))
+        return key.hexdigest() + self.suffix
+
+    def open(self, name, etag):
+        """
+        returns the cached content of a blob as a binary stream, None when
+        it is not cached
+        """
+        file_name = self.file_name(name, etag)
+        path = os.path.join(self.directory, file_name)
+        with self.lock:
+            if file_name not in self.entries:
+                self.misses += 1
+                return None
+            try:
+                stream = open_compressed(path, "rb", self.compression)
+                os.utime(path)
+            except FileNotFoundError:
+                # evicted by another process sharing the directory
+                self.size -= self.entries.pop(file_name)
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(file_name)
+        return stream
+
+    def get(self, name, etag):
+        """
+        returns the cached content of a blob, None when it is not cached
+        """
+        stream = self.open(name, etag)
+        if stream is None:
+            return None
+        with stream:
+            return stream.read()
+
+    def put(self, name, etag, content):
+        """
+        caches the content of a blob
+        :param content: bytes-like
+        """
+        with self.writer(name, etag) as stream:
+            stream.write(content)
+
+    def writer(self, name, etag):
+        """
+        returns a binary stream caching the content written to it once closed,
+        the content is not cached when the stream is closed by an exception
+        """
+        return CacheWriter(self, self.file_name(name, etag))
+
+    def add(self, file_name, temporary_path):
+        size = os.path.getsize(temporary_path)
+        os.replace(temporary_path, os.path.join(self.directory, file_name))
+        with self.lock:
+            self.size += size - self.entries.pop(file_name, 0)
+            self.entries[file_name] = size
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                evicted, evicted_size = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.directory, evicted))
+                except FileNotFoundError:
+                    pass
+
+    def read_through(self, name, etag, download):
+        """
+        returns the content of a blob from the cache, or downloads and caches it
+        :param download: function returning the content of the blob
+        """
+        content = self.get(name, etag)
+        if content is None:
+            content = download()
+            self.put(name, etag, content)
+        return content
+
+    def stream_through(self, name, etag, download_chunks, chunk_size=1024 * 1024):
+        """
+        yields the content of a blob in chunks from the cache, or from the
+        download, caching the chunks as they are yielded
+        :param download_chunks: function returning an iterator of the chunks
+        of the blob
+        :param chunk_size: size of the chunks read from the cache
+        """
+        stream = self.open(name, etag)
+        if stream is not None:
+            with stream:
+                yield from iter(lambda: stream.read(chunk_size), b"")
+            return
+        with self.writer(name, etag) as writer:
+            for chunk in download_chunks():
+                writer.write(chunk)
+                yield chunk
+
+    def stats(self):
+        return {
+            "cacheHits": self.hits,
+            "cacheMisses": self.misses,
+            "cacheEvictions": self.evictions,
+            "cachedBlobs": len(self.entries),
+            "cachedBytes": self.size,
+        }
+
+
+class CacheWriter(io.RawIOBase):
+    """
+    writes a blob to a temporary file of the cache directory, which is
+    added to the cache when closed without exception
+    """
+
+    def __init__(self, cache, file_name):
+        self.cache = cache
+        self.file_name = file_name
+        descriptor, self.path = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+        os.close(descriptor)
+        self.stream = open_compressed(self.path, "wb", cache.compression)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.stream.write(data)
+        return len(data)
+
+    def __exit__(self, exception_type, *args):
+        self.stream.close()
+        super().close()
+        if exception_type is None:
+            self.cache.add(self.file_name, self.path)
+        else:
+            os.remove(self.path)
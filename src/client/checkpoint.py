@@ -0,0 +1,119 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import sqlite3
+import threading
+
+STARTED = "started"
+UPLOADED = "uploaded"
+FAILED = "failed"
+
+
+class IngestCheckpoint:
+    """
+    This class keeps the progress of an ingest run in a SQLite database so
+    that an interrupted run can be resumed where it stopped:
+    - the continuation token of the next page of the blob listing, saved once
+      every blob of the current page is uploaded
+    - the state of every blob of the run (started, uploaded or failed)
+    The documents of a started blob which were already uploaded are known
+    from the fingerprints acknowledged in the manifest (see IngestManifest).
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the SQLite database, created when missing
+        (it can be the database of the manifest)
+        """
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS run (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS blob_progress ("
+            "name TEXT PRIMARY KEY, state TEXT NOT NULL)"
+        )
+        self.connection.commit()
+        self.states = dict()
+        self.interrupted = set()
+        self.lock = threading.Lock()
+
+    def start(self, resume=False):
+        """
+        starts a run, continuing the previous one when it did not finish
+        and resume is True
+        :param resume:
+        :return: continuation token of the listing, None to list from the start
+        """
+        with self.lock:
+            run = dict(self.connection.execute("SELECT key, value FROM run"))
+            if resume and run.get("state") == "running":
+                self.states = dict(
+                    self.connection.execute("SELECT name, state FROM blob_progress")
+                )
+                self.interrupted = {
+                    name for name, state in self.states.items() if state == STARTED
+                }
+                print(
+                    "resuming the previous run, {} blobs already done".format(
+                        sum(state != STARTED for state in self.states.values())
+                    )
+                )
+                return run.get("continuation-token")
+            self.states = dict()
+            self.interrupted = set()
+            self.connection.execute("DELETE FROM blob_progress")
+            self.connection.execute("DELETE FROM run")
+            self.connection.execute(
+                "INSERT INTO run (key, value) VALUES ('state', 'running')"
+            )
+            self.connection.commit()
+            return None
+
+    def is_done(self, name):
+        """
+        returns True when the blob was uploaded (or failed) in the run
+        """
+        return self.states.get(name) in (UPLOADED, FAILED)
+
+    def was_interrupted(self, name):
+        """
+        returns True when the resumed run stopped while the blob was being ingested
+        """
+        return name in self.interrupted
+
+    def set_state(self, name, state):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO blob_progress (name, state) VALUES (?, ?)",
+                (name, state),
+            )
+            self.connection.commit()
+            self.states[name] = state
+
+    def save_continuation_token(self, continuation_token):
+        """
+        saves where the listing continues, once the blobs listed before are done
+        :param continuation_token: token of the next page, None after the last one
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO run (key, value) "
+                "VALUES ('continuation-token', ?)",
+                (continuation_token,),
+            )
+            self.connection.commit()
+
+    def finish(self):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO run (key, value) VALUES ('state', 'finished')"
+            )
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
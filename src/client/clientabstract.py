@@ -27,10 +27,12 @@ class ClientAbstract(object):
         except ValueError:
             print("could not read from the json file")
 
-    def write_status_file(self, file, path):
+    def status_file_path(self, path):
         if self.config:
-            out_path = join(self.config["files"]["processed-directory"], path)
-        else:
-            out_path = join(getenv("FILE_PROCESSING_LOGS_DIR"), path)
+            return join(self.config["files"]["processed-directory"], path)
+        return join(getenv("FILE_PROCESSING_LOGS_DIR"), path)
+
+    def write_status_file(self, file, path):
+        out_path = self.status_file_path(path)
         with open(out_path, "a") as f:
             f.write(file + "\n")
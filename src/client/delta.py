@@ -0,0 +1,96 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import hashlib
+import json
+
+KEY_FIELD = "id"
+ACTION_FIELD = "@search.action"
+
+
+def fingerprint(document):
+    """
+    returns the fingerprint of an interval document: a short hash of the
+    value of each of its fields, so the changed fields can be told apart
+    :param document: interval document created by the parser
+    :return: dictionary of field name to hash
+    """
+    return {
+        field: hashlib.blake2b(
+            json.dumps(value, separators=(",", ":")).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        for field, value in document.items()
+        if field != KEY_FIELD and field != ACTION_FIELD
+    }
+
+
+class DocumentDelta:
+    """
+    This class turns the interval documents of a re-processed file into the
+    indexing actions that bring the search index up to date with them,
+    given the fingerprints of the documents uploaded the previous time:
+    - new documents are uploaded
+    - changed documents are merged, sending only the changed fields
+      (and null for the fields which are not there anymore)
+    - unchanged documents are not sent
+    - documents which are not there anymore (e.g. the duration shrank)
+      are deleted
+    """
+
+    def __init__(self, previous=None, resend_unchanged=False, name=None):
+        """
+        :param previous: fingerprints of the documents uploaded the previous
+        time, by document id (empty for a new file)
+        :param resend_unchanged: upload every document, e.g. when the index
+        has to be rebuilt
+        :param name: name of the file, see tag()
+        """
+        self.name = name
+        self.previous = previous or dict()
+        self.resend_unchanged = resend_unchanged
+        self.fingerprints = dict()
+        self.counts = {"upload": 0, "mergeOrUpload": 0, "delete": 0, "unchanged": 0}
+
+    def documents(self, documents):
+        """
+        yields the documents to send, each one with its indexing action
+        :param documents: iterable of interval documents of the file
+        :return: generator of documents
+        """
+        for document in documents:
+            key = document[KEY_FIELD]
+            current = fingerprint(document)
+            self.fingerprints[key] = current
+            previous = self.previous.get(key)
+            if previous is None or self.resend_unchanged:
+                document[ACTION_FIELD] = "upload"
+            elif previous == current:
+                self.counts["unchanged"] += 1
+                continue
+            else:
+                document = self.changed_fields(document, previous, current)
+            self.counts[document[ACTION_FIELD]] += 1
+            yield document
+        for key in self.previous.keys() - self.fingerprints.keys():
+            self.counts["delete"] += 1
+            yield {ACTION_FIELD: "delete", KEY_FIELD: key}
+
+    def tag(self, document):
+        """
+        returns what IngestManifest.acknowledge records once the document
+        is sent: (file name, document id, fingerprint or None when deleted)
+        """
+        key = document[KEY_FIELD]
+        return self.name, key, self.fingerprints.get(key)
+
+    @staticmethod
+    def changed_fields(document, previous, current):
+        merged = {ACTION_FIELD: "mergeOrUpload", KEY_FIELD: document[KEY_FIELD]}
+        for field, value in current.items():
+            if previous.get(field) != value:
+                merged[field] = document[field]
+        for field in previous.keys() - current.keys():
+            merged[field] = None
+        return merged
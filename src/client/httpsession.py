@@ -0,0 +1,88 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import gzip
+import json
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SearchSession:
+    """
+    This class owns a pooled keep-alive HTTP session used for every request
+    to Azure Search during an ingest run, so the TCP and TLS connections are
+    reused instead of being opened for each upload. It optionally compresses
+    request bodies with gzip and keeps statistics of the requests sent.
+    """
+
+    def __init__(self, headers, pool_size=10, gzip_requests=False):
+        """
+        :param headers: headers sent with every request (e.g. api-key)
+        :param pool_size: maximum number of connections kept open per host
+        :param gzip_requests: compress request bodies (Content-Encoding: gzip)
+        """
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        self.pool_size = pool_size
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.gzip_requests = gzip_requests
+        self.request_count = 0
+        self.request_seconds = 0.0
+        self.max_request_seconds = 0.0
+        self.sent_bytes = 0
+
+    def post(self, url, body=None, json_body=None, headers=None):
+        """
+        posts a body to url through the pooled session
+        :param url:
+        :param body: serialized body (str or bytes)
+        :param json_body: object to serialize as JSON instead of body
+        :param headers: extra headers of this request
+        :return: requests.Response
+        """
+        if json_body is not None:
+            body = json.dumps(json_body)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        headers = dict(headers) if headers else dict()
+        if self.gzip_requests and body:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        started = time.perf_counter()
+        response = self.session.post(url, data=body, headers=headers)
+        elapsed = time.perf_counter() - started
+        self.request_count += 1
+        self.request_seconds += elapsed
+        self.max_request_seconds = max(self.max_request_seconds, elapsed)
+        self.sent_bytes += len(body) if body else 0
+        return response
+
+    def connection_count(self):
+        """
+        returns the number of connections opened by the session so far
+        """
+        pools = self.adapter.poolmanager.pools
+        return sum(getattr(pools[key], "num_connections", 0) for key in pools.keys())
+
+    def stats(self):
+        """
+        returns statistics of the requests sent through the session
+        """
+        return {
+            "requests": self.request_count,
+            "connections": self.connection_count(),
+            "sentBytes": self.sent_bytes,
+            "averageRequestSeconds": (
+                self.request_seconds / self.request_count if self.request_count else 0.0
+            ),
+            "maxRequestSeconds": self.max_request_seconds,
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,137 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """
+    returns the sha256 of the content of a local file
+    :param path:
+    :param chunk_size: size of the chunks read from the file
+    :return: hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+    This class is a persistent (SQLite) record of the files already ingested,
+    with the version they were ingested at: the ETag of a blob or the content
+    hash of a local file. A file whose version did not change since it was
+    ingested can be skipped before it is downloaded.
+    The versions are loaded in memory once, so a lookup does not query the
+    database, and every ingested file is committed right away so that an
+    interrupted run keeps what it did.
+    It also keeps the fingerprints of the interval documents uploaded for
+    each file, so a re-processed file only sends its changes (see DocumentDelta).
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the SQLite database, created when missing
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS ingested ("
+            "name TEXT PRIMARY KEY, version TEXT NOT NULL, ingested_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "name TEXT NOT NULL, id TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+            "PRIMARY KEY (name, id)) WITHOUT ROWID"
+        )
+        self.connection.commit()
+        self.versions = dict(
+            self.connection.execute("SELECT name, version FROM ingested")
+        )
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.versions)
+
+    def is_unchanged(self, name, version):
+        """
+        returns True when the file was ingested at this version
+        :param name: blob name or local file name
+        :param version: ETag or content hash, None is never unchanged
+        """
+        return version is not None and self.versions.get(name) == version
+
+    def document_fingerprints(self, name):
+        """
+        returns the fingerprints of the documents uploaded for a file
+        :param name:
+        :return: dictionary of document id to fingerprint
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, fingerprint FROM documents WHERE name = ?", (name,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def acknowledge(self, documents):
+        """
+        records the fingerprints of documents as soon as they are uploaded,
+        so an interrupted file is resumed without sending them again
+        :param documents: list of (file name, document id, fingerprint),
+        a None fingerprint for a deleted document
+        """
+        with self.lock:
+            self.connection.executemany(
+                "DELETE FROM documents WHERE name = ? AND id = ?",
+                ((name, key) for name, key, value in documents if value is None),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO documents (name, id, fingerprint) "
+                "VALUES (?, ?, ?)",
+                (
+                    (name, key, json.dumps(value, separators=(",", ":")))
+                    for name, key, value in documents
+                    if value is not None
+                ),
+            )
+            self.connection.commit()
+
+    def record(self, name, version, fingerprints=None):
+        """
+        records that the file was ingested at this version
+        :param name:
+        :param version:
+        :param fingerprints: fingerprints of the documents uploaded for the
+        file, replacing the previous ones
+        """
+        with self.lock:
+            if fingerprints is not None:
+                self.connection.execute("DELETE FROM documents WHERE name = ?", (name,))
+                self.connection.executemany(
+                    "INSERT INTO documents (name, id, fingerprint) VALUES (?, ?, ?)",
+                    (
+                        (name, key, json.dumps(value, separators=(",", ":")))
+                        for key, value in fingerprints.items()
+                    ),
+                )
+            if version is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO ingested (name, version, ingested_at) "
+                    "VALUES (?, ?, ?)",
+                    (name, version, time.time()),
+                )
+                self.versions[name] = version
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
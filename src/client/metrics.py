@@ -0,0 +1,492 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds of the buckets of the latency histograms, from the
+# serialization of a document to the download of a large blob
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+)
+PROMETHEUS_PREFIX = "vi_ingest"
+
+
+class Histogram:
+    """
+    latency histogram with fixed buckets, as exported to Prometheus
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # one more bucket for the values above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """
+        returns the upper bound of the bucket of the q quantile (the maximum
+        for the last bucket)
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class NullStage:
+    """
+    the stage of disabled metrics, measures nothing
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def add(self, documents=0, size=0):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage:
+    """
+    times a block of code as a stage of the ingestion. The time of the
+    stages nested in it (in the same thread) is subtracted from it, e.g. the
+    download of the chunks of a blob read by the parser is not parsing time.
+    """
+
+    def __init__(self, metrics, name, documents=0, size=0):
+        self.metrics = metrics
+        self.name = name
+        self.documents = documents
+        self.size = size
+        self.started = 0.0
+        self.nested = 0.0
+
+    def start(self):
+        self.metrics.frames().append(self)
+        self.nested = 0.0
+        self.started = self.metrics.clock()
+
+    def stop(self):
+        """
+        :return: seconds since start, without the nested stages
+        """
+        elapsed = self.metrics.clock() - self.started
+        frames = self.metrics.frames()
+        frames.pop()
+        if frames:
+            frames[-1].nested += elapsed
+        return elapsed - self.nested
+
+    def add(self, documents=0, size=0):
+        """
+        adds to the documents and bytes processed, e.g. once downloaded
+        """
+        self.documents += documents
+        self.size += size
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.observe(self.name, self.stop(), self.documents, self.size)
+        return False
+
+
+class IngestMetrics:
+    """
+    This class collects the metrics of an ingest run: a latency histogram,
+    documents and bytes of every stage (download, parse, serialize, upload),
+    the depth of the queues between stages, and counters (files ingested and
+    failed, retried and throttled requests...).
+    They are logged as JSON lines (logger client.metrics) every
+    export_seconds and at the end of the run, and can be exported in the
+    Prometheus text format to a file (for the textfile collector of the node
+    exporter) or served on a port.
+    When disabled, stage() returns a shared no-op context manager and the
+    other methods return at once, so the instrumented code runs as before.
+    """
+
+    def __init__(
+        self,
+        enabled=False,
+        prometheus_file=None,
+        export_seconds=10,
+        clock=time.perf_counter,
+    ):
+        """
+        :param enabled:
+        :param prometheus_file: path of the Prometheus text file, rewritten
+        every export_seconds, not written when None
+        :param export_seconds: interval of the progress logs and of the file
+        :param clock: function returning seconds
+        """
+        self.enabled = enabled
+        self.prometheus_file = prometheus_file
+        self.export_seconds = export_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = clock()
+        self.last_export = self.started
+        self.histograms = dict()
+        self.documents = dict()
+        self.sizes = dict()
+        self.counters = dict()
+        self.queues = dict()
+        self.queue_max = dict()
+        # functions returning counters kept by other objects, e.g. the retries
+        # of an AdaptiveRateController, read when exported
+        self.collectors = []
+        self.server = None
+
+    def frames(self):
+        """
+        returns the stack of the stages running in the current thread
+        """
+        frames = getattr(self.local, "frames", None)
+        if frames is None:
+            frames = self.local.frames = []
+        return frames
+
+    def stage(self, name, documents=0, size=0):
+        """
+        returns a context manager timing a stage
+        :param name: e.g. "download"
+        :param documents: number of documents processed by the stage
+        :param size: number of bytes processed by the stage
+        """
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, documents, size)
+
+    def observe(self, name, seconds, documents=0, size=0):
+        """
+        records one execution of a stage, e.g. timed with perf_counter in a
+        coroutine where stages cannot be nested
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+                self.documents[name] = 0
+                self.sizes[name] = 0
+            histogram.observe(seconds)
+            self.documents[name] += documents
+            self.sizes[name] += size
+        self.export_periodically()
+
+    def timed_iter(self, name, iterable, size=None):
+        """
+        times the production of the items of an iterable as one execution of
+        a stage, e.g. the documents of a file yielded by the parser; the time
+        spent by the consumer between items is not counted
+        :param size: function returning the number of bytes of an item,
+        the items are counted as documents without it
+        """
+        if not self.enabled:
+            return iterable
+        return self.timed_items(name, iter(iterable), size)
+
+    def timed_items(self, name, iterator, size):
+        stage = Stage(self, name)
+        seconds, documents, total_size = 0.0, 0, 0
+        try:
+            while True:
+                stage.start()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += stage.stop()
+                if size is None:
+                    documents += 1
+                else:
+                    total_size += size(item)
+                yield item
+        finally:
+            self.observe(name, seconds, documents, total_size)
+
+    def increment(self, name, value=1):
+        """
+        increments a counter, e.g. "filesFailed"
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge_queue(self, name, depth):
+        """
+        records the number of items waiting in a queue
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.queues[name] = depth
+            self.queue_max[name] = max(self.queue_max.get(name, 0), depth)
+
+    def file_event(self, name, status, **fields):
+        """
+        logs the outcome of a file and counts it, e.g. status "ingested"
+        """
+        if not self.enabled:
+            return
+        self.increment("files" + status.capitalize())
+        self.log("file", name=name, status=status, **fields)
+
+    def log(self, event, **fields):
+        logger.info(json.dumps(dict(event=event, **fields), default=str))
+
+    def collected_counters(self):
+        counters = dict(self.counters)
+        for collector in self.collectors:
+            for name, value in collector().items():
+                counters[name] = counters.get(name, 0) + value
+        return counters
+
+    def summary(self):
+        """
+        returns the metrics of the run so far as a dictionary
+        """
+        seconds = self.clock() - self.started
+        with self.lock:
+            stages = {
+                name: {
+                    "count": histogram.count,
+                    "seconds": round(histogram.total, 6),
+                    "mean": (
+                        round(histogram.total / histogram.count, 6)
+                        if histogram.count
+                        else 0.0
+                    ),
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "max": round(histogram.max, 6),
+                    "documents": self.documents[name],
+                    "bytes": self.sizes[name],
+                    "documentsPerSecond": (
+                        round(self.documents[name] / histogram.total, 1)
+                        if histogram.total
+                        else 0.0
+                    ),
+                    "bytesPerSecond": (
+                        round(self.sizes[name] / histogram.total)
+                        if histogram.total
+                        else 0
+                    ),
+                }
+                for name, histogram in self.histograms.items()
+            }
+            queues = {
+                name: {"depth": depth, "maxDepth": self.queue_max[name]}
+                for name, depth in self.queues.items()
+            }
+        return {
+            "seconds": round(seconds, 3),
+            "stages": stages,
+            "queues": queues,
+            "counters": self.collected_counters(),
+        }
+
+    def prometheus_text(self):
+        """
+        returns the metrics in the Prometheus text exposition format
+        """
+        name = PROMETHEUS_PREFIX
+        lines = []
+        with self.lock:
+            lines.append("# TYPE {}_stage_seconds histogram".format(name))
+            for stage, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(
+                    histogram.buckets + ("+Inf",), histogram.counts
+                ):
+                    cumulative += count
+                    lines.append(
+                        '{}_stage_seconds_bucket{{stage="{}",le="{}"}} {}'.format(
+                            name, stage, bound, cumulative
+                        )
+                    )
+                lines.append(
+                    '{}_stage_seconds_sum{{stage="{}"}} {}'.format(
+                        name, stage, histogram.total
+                    )
+                )
+                lines.append(
+                    '{}_stage_seconds_count{{stage="{}"}} {}'.format(
+                        name, stage, histogram.count
+                    )
+                )
+            for metric, values in [
+                ("documents", self.documents),
+                ("bytes", self.sizes),
+            ]:
+                lines.append("# TYPE {}_{}_total counter".format(name, metric))
+                for stage, value in values.items():
+                    lines.append(
+                        '{}_{}_total{{stage="{}"}} {}'.format(
+                            name, metric, stage, value
+                        )
+                    )
+            for metric, values in [
+                ("queue_depth", self.queues),
+                ("queue_max_depth", self.queue_max),
+            ]:
+                lines.append("# TYPE {}_{} gauge".format(name, metric))
+                for queue, value in values.items():
+                    lines.append(
+                        '{}_{}{{queue="{}"}} {}'.format(name, metric, queue, value)
+                    )
+        for counter, value in sorted(self.collected_counters().items()):
+            metric = "{}_{}_total".format(name, snake_case(counter))
+            lines.append("# TYPE {} counter".format(metric))
+            lines.append("{} {}".format(metric, value))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self):
+        """
+        replaces the Prometheus text file, atomically so that a collector
+        never reads it half written
+        """
+        directory = os.path.dirname(os.path.abspath(self.prometheus_file))
+        descriptor, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(path, self.prometheus_file)
+
+    def export_periodically(self):
+        now = self.clock()
+        if now - self.last_export < self.export_seconds:
+            return
+        with self.lock:
+            if now - self.last_export < self.export_seconds:
+                return
+            self.last_export = now
+        self.export("progress")
+
+    def export(self, event):
+        """
+        logs the summary and writes the Prometheus file
+        :param event: name of the log event, e.g. "progress"
+        """
+        self.log(event, **self.summary())
+        if self.prometheus_file:
+            self.write_prometheus_file()
+
+    def finish(self):
+        """
+        exports the metrics at the end of the run
+        :return: summary of the run, None when disabled
+        """
+        if not self.enabled:
+            return None
+        self.export("summary")
+        return self.summary()
+
+    def serve_prometheus(self, port, host=""):
+        """
+        serves the metrics on http://host:port/metrics from a daemon thread
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                content = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+
+def format_summary(summary):
+    """
+    returns the summary of a run as lines of text, one per stage, queue and
+    counter
+    """
+    lines = ["ingest run: {:.1f} s".format(summary["seconds"])]
+    for name, stage in summary["stages"].items():
+        lines.append(
+            "  {:<10} {:>7} runs {:>10.3f} s  p95 {:>8.4f} s  "
+            "{:>9.1f} docs/s  {:>12} bytes/s".format(
+                name,
+                stage["count"],
+                stage["seconds"],
+                stage["p95"],
+                stage["documentsPerSecond"],
+                stage["bytesPerSecond"],
+            )
+        )
+    for name, queue in summary["queues"].items():
+        lines.append("  queue {:<14} max depth {}".format(name, queue["maxDepth"]))
+    for name, value in sorted(summary["counters"].items()):
+        lines.append("  {:<20} {}".format(name, value))
+    return lines
+
+
+def snake_case(name):
+    """
+    returns the snake case of a camel case name, e.g. files_ingested
+    """
+    return "".join("_" + c.lower() if c.isupper() else c for c in name).lstrip("_")
+
+
+DISABLED = IngestMetrics()
@@ -0,0 +1,227 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue
+
+from client.batcher import DocumentBatcher
+from client.delta import DocumentDelta
+from client.metrics import DISABLED
+from parser.parser import Parser
+from parser.vijsonreader import VIJsonReader
+
+_DONE = object()
+_parser = None
+
+
+def get_parser():
+    """
+    returns the parser of the current (worker) process
+    """
+    global _parser
+    if _parser is None:
+        _parser = Parser()
+    return _parser
+
+
+def parse_vi_file_to_batches(path, max_documents, max_bytes, delta=None):
+    """
+    parses a local VI JSON file in a worker process and returns its intervals
+    as serialized request bodies: they are sent back to the parent process
+    as a few bytes objects instead of pickled nested dictionaries,
+    and the parent only has to post them
+    :param path: path of the VI JSON file
+    :param max_documents: maximum number of documents per request body
+    :param max_bytes: maximum size of a request body
+    :param delta: DocumentDelta with the fingerprints of the previous upload
+    of the file, only its changes are sent (every document by default)
+    :return: list of request bodies (bytes) and fingerprints of the documents,
+    None when the file is not processed
+    """
+    with open(path, "rb") as f:
+        return read_to_batches(VIJsonReader(f), max_documents, max_bytes, delta)
+
+
+def parse_vi_content_to_batches(content, max_documents, max_bytes, delta=None):
+    """
+    same as parse_vi_file_to_batches for the downloaded content of a file
+    :param content: the file as bytes
+    """
+    return read_to_batches(VIJsonReader([content]), max_documents, max_bytes, delta)
+
+
+def read_to_batches(reader, max_documents, max_bytes, delta=None):
+    header = reader.read_header()
+    if header["state"] != "Processed":
+        return None
+    parser = get_parser()
+    delta = delta or DocumentDelta()
+    bodies = []
+    batcher = DocumentBatcher(bodies.append, max_documents, max_bytes)
+    for document in delta.documents(
+        parser.iter_stream_documents(
+            header["name"], reader.videos(parser.specs_by_insight)
+        )
+    ):
+        batcher.add(document)
+    batcher.flush()
+    return bodies, delta.fingerprints
+
+
+def parse_vi_content(content):
+    """
+    parses the content of a VI JSON file in a worker process
+    :param content: the file as str, or as bytes (or bytearray) as downloaded,
+    json detects their encoding and drops a UTF-8 BOM
+    :return: list of intervals, None when the file is not processed by VI yet
+    """
+    if isinstance(content, str):
+        content = content.lstrip("\ufeff")
+    json_object = json.loads(content)
+    if json_object["state"] != "Processed":
+        return None
+    return get_parser().parse_vi_json(json_object)
+
+
+class IngestPipeline:
+    """
+    This class runs the ingestion of many files as three concurrent stages
+    connected by bounded queues:
+    - download_workers threads downloading the files
+    - parse_workers processes parsing them (parsing is CPU bound)
+    - upload_workers threads uploading the intervals
+    When a stage is slower, the queue before it fills up and blocks the
+    previous stage, so at most a few files per stage are kept in memory.
+    """
+
+    def __init__(
+        self,
+        download,
+        upload,
+        on_ingested,
+        on_failed,
+        parse=parse_vi_content,
+        download_workers=4,
+        parse_workers=None,
+        upload_workers=4,
+        queue_size=8,
+        metrics=DISABLED,
+    ):
+        """
+        :param download: function(name) returning the content of a file
+        :param upload: function(name, intervals) uploading the intervals of a file
+        :param on_ingested: function(name) called when a file is uploaded
+        :param on_failed: function(name, exception) called when a file failed
+        :param parse: picklable function(content) returning the intervals
+        (or None to skip the file), executed in the process pool
+        :param download_workers:
+        :param parse_workers: number of processes, defaults to the number of CPUs
+        :param upload_workers:
+        :param queue_size: maximum number of files waiting between two stages
+        :param metrics: IngestMetrics recording the parse time and the depth
+        of the queue before every stage
+        """
+        self.download = download
+        self.upload = upload
+        self.on_ingested = on_ingested
+        self.on_failed = on_failed
+        self.parse = parse
+        self.download_workers = download_workers
+        self.parse_workers = parse_workers or os.cpu_count()
+        self.upload_workers = upload_workers
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self.lock = threading.Lock()
+
+    def run(self, names):
+        """
+        ingests every file, returns when all of them are uploaded or failed
+        :param names: iterable of file names (e.g. the blob listing)
+        """
+        download_queue = Queue(self.queue_size)
+        parse_queue = Queue(self.queue_size)
+        upload_queue = Queue(self.queue_size)
+        with ProcessPoolExecutor(self.parse_workers) as pool:
+            stages = [
+                self.start_stage(
+                    "download",
+                    self.download_workers,
+                    download_queue,
+                    parse_queue,
+                    lambda name, _: self.download(name),
+                ),
+                self.start_stage(
+                    "parse",
+                    self.parse_workers,
+                    parse_queue,
+                    upload_queue,
+                    self.parse_stage(pool),
+                ),
+                self.start_stage(
+                    "upload",
+                    self.upload_workers,
+                    upload_queue,
+                    None,
+                    self.upload_stage,
+                ),
+            ]
+            for name in names:
+                download_queue.put((name, None))
+            for stage, inbox in zip(
+                stages, [download_queue, parse_queue, upload_queue]
+            ):
+                for _ in stage:
+                    inbox.put(_DONE)
+                for thread in stage:
+                    thread.join()
+
+    def parse_stage(self, pool):
+        def parse(name, content):
+            # the time until the result of the pool, waiting for a process included
+            with self.metrics.stage("parse"):
+                return pool.submit(self.parse, content).result()
+
+        return parse
+
+    def upload_stage(self, name, intervals):
+        if intervals is not None:
+            self.upload(name, intervals)
+            with self.lock:
+                self.on_ingested(name)
+
+    def start_stage(self, stage, workers, inbox, outbox, function):
+        """
+        starts the threads of a stage, each one applies function to the
+        files of inbox and puts the result to outbox
+        :param stage: name of the stage, e.g. "parse"
+        """
+        threads = [
+            threading.Thread(
+                target=self.work, args=(stage, inbox, outbox, function), daemon=True
+            )
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def work(self, stage, inbox, outbox, function):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                return
+            self.metrics.gauge_queue(stage, inbox.qsize())
+            name, payload = item
+            try:
+                result = function(name, payload)
+            except Exception as ex:
+                with self.lock:
+                    self.on_failed(name, ex)
+                continue
+            if outbox is not None:
+                outbox.put((name, result))
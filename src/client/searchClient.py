@@ -3,18 +3,40 @@ __email__ = "mamokari@microsoft.com"
 __license__ = "MIT"
 __version__ = "February 2022"
 
+import asyncio
 import json
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-import requests
-
+from client.asyncingest import AsyncIngest, AsyncSearchUploader, AsyncStorageClient
+from client.batcher import (
+    DocumentBatcher,
+    MAX_DOCUMENTS_PER_REQUEST,
+    MAX_BYTES_PER_REQUEST,
+)
+from client.checkpoint import FAILED, STARTED, UPLOADED, IngestCheckpoint
 from client.clientabstract import ClientAbstract
+from client.delta import DocumentDelta
+from client.httpsession import SearchSession
+from client.manifest import IngestManifest, file_content_hash
+from client.metrics import IngestMetrics
+from client.pipeline import IngestPipeline, parse_vi_file_to_batches
+from client.sharding import Shard
+from client.throttling import AdaptiveRateController, post_with_retry
 from parser.parser import Parser
+from parser.vijsonreader import VIJsonReader
 from client.storageClient import StorageClient
 
 
 class SearchClient(ClientAbstract):
-    def __init__(self):
+    def __init__(self, skip_unchanged=True, resume=False, shard=None):
+        """
+        :param skip_unchanged: skip the files whose version (blob ETag or
+        local file content hash) is already in the ingest manifest
+        :param resume: continue the previous run if it was interrupted
+        :param shard: Shard of the files to ingest, all of them by default
+        """
         search_service_name = (
             self.config["search"]["service-name"]
             if self.config
@@ -65,78 +87,554 @@ class SearchClient(ClientAbstract):
             if self.config
             else os.getenv("VI_OUTPUT_DIRECTORY")
         )
+        self.session = SearchSession(
+            self.headers,
+            pool_size=int(
+                self.config["search"].get("pool-size", 10)
+                if self.config
+                else os.getenv("SEARCH_POOL_SIZE", 10)
+            ),
+            gzip_requests=str(
+                self.config["search"].get("gzip-requests", False)
+                if self.config
+                else os.getenv("SEARCH_GZIP_REQUESTS", False)
+            ).lower()
+            == "true",
+        )
+        self.shard = shard or Shard()
+        manifest_filename = (
+            self.config["files"].get("manifest-file", "ingest-manifest.sqlite")
+            if self.config
+            else os.getenv("INGEST_MANIFEST_FILENAME", "ingest-manifest.sqlite")
+        )
+        if not self.shard.is_whole:
+            # every shard has its own manifest and checkpoint, no shared state
+            root, extension = os.path.splitext(manifest_filename)
+            manifest_filename = root + "-" + str(self.shard) + extension
+        self.manifest = IngestManifest(self.status_file_path(manifest_filename))
+        self.checkpoint = IngestCheckpoint(self.manifest.path)
+        self.skip_unchanged = skip_unchanged
+        self.resume = resume
+        self.pending_versions = dict()
+        self.pending_fingerprints = dict()
+        self.skipped_count = 0
+        self.failed_files = set()
+        # a file is ingested again when the parser settings change
+        self.parser_fingerprint = Parser().settings_fingerprint()
+        self.metrics = self.create_metrics()
+        self.batcher = DocumentBatcher(
+            self.post_documents,
+            max_documents=int(
+                self.config["search"].get(
+                    "batch-max-documents", MAX_DOCUMENTS_PER_REQUEST
+                )
+                if self.config
+                else os.getenv("SEARCH_BATCH_MAX_DOCUMENTS", MAX_DOCUMENTS_PER_REQUEST)
+            ),
+            max_bytes=int(
+                self.config["search"].get("batch-max-bytes", MAX_BYTES_PER_REQUEST)
+                if self.config
+                else os.getenv("SEARCH_BATCH_MAX_BYTES", MAX_BYTES_PER_REQUEST)
+            ),
+            on_sent=self.manifest.acknowledge,
+            on_failed=self.log_failed_batch,
+            metrics=self.metrics,
+        )
+        self.max_attempts = int(
+            self.config["search"].get("max-attempts", 8)
+            if self.config
+            else os.getenv("SEARCH_MAX_ATTEMPTS", 8)
+        )
+        self.rate_controller = AdaptiveRateController(
+            max_concurrency=self.session.pool_size,
+            max_batch_documents=self.batcher.max_documents,
+        )
+        self.metrics.collectors.append(
+            lambda: {
+                "requests": self.session.request_count,
+                "retries": self.rate_controller.retried_count,
+                "throttled": self.rate_controller.throttled_count,
+                "filesSkipped": self.skipped_count,
+            }
+        )
+
+    def create_metrics(self):
+        """
+        returns the IngestMetrics of the run, enabled by metrics.enabled
+        (METRICS_ENABLED), serving them to Prometheus on metrics.prometheus-port
+        and writing them to metrics.prometheus-file when set
+        """
+        metrics = self.config.get("metrics", dict()) if self.config else dict()
+        enabled = str(
+            metrics.get("enabled", False)
+            if self.config
+            else os.getenv("METRICS_ENABLED", False)
+        ).lower()
+        prometheus_file = (
+            metrics.get("prometheus-file")
+            if self.config
+            else os.getenv("METRICS_PROMETHEUS_FILE")
+        )
+        prometheus_port = (
+            metrics.get("prometheus-port")
+            if self.config
+            else os.getenv("METRICS_PROMETHEUS_PORT")
+        )
+        export_seconds = (
+            metrics.get("export-seconds", 10)
+            if self.config
+            else os.getenv("METRICS_EXPORT_SECONDS", 10)
+        )
+        ingest_metrics = IngestMetrics(
+            enabled=enabled == "true",
+            prometheus_file=prometheus_file or None,
+            export_seconds=float(export_seconds),
+        )
+        if ingest_metrics.enabled and prometheus_port:
+            ingest_metrics.serve_prometheus(int(prometheus_port))
+        return ingest_metrics
 
     def upload_to_search(self, docs):
-        url = (
+        self.post_documents(json.dumps(docs))
+
+    def documents_url(self):
+        return (
             self.endpoint
             + "indexes/"
             + self.index_name
             + "/docs/index"
             + self.api_version
         )
-        response = requests.post(url, headers=self.headers, json=docs)
-        index_content = response.json()
+
+    def post_documents(self, body):
+        """
+        posts a serialized request body to the docs/index endpoint, sending
+        the failed documents again (see BatchRetry), and adapts the size of
+        the next batches to the throttling of the service
+        :param body: JSON of {"value": [documents]} as str or bytes
+        """
+        with self.metrics.stage("upload", size=len(body)):
+            index_content = post_with_retry(
+                self.session,
+                self.documents_url(),
+                body,
+                self.rate_controller,
+                self.max_attempts,
+            )
         print(index_content)
+        self.batcher.max_documents = self.rate_controller.batch_documents
+
+    def upload_documents(self, documents, flush=True, tag=None):
+        """
+        uploads documents to search while they are being generated,
+        packing them in requests within the batcher limits
+        :param documents: iterable of documents e.g. Parser.iter_documents,
+        uploaded unless they already have an indexing action
+        :param flush: send the last batch, otherwise it is kept so that the
+        documents of the next file can be packed in the same request
+        :param tag: function(document) returning its tag for DocumentBatcher.add
+        :return: number of documents
+        """
+        count = 0
+        for document in documents:
+            document.setdefault("@search.action", "upload")
+            self.batcher.add(document, tag(document) if tag else None)
+            count += 1
+        if flush:
+            self.batcher.flush()
+        return count
 
     def create_index(self):
         url = self.endpoint + "indexes" + self.api_version
         index_schema = self.read_file_from_directory(self.index_schema_path)
         index_schema["name"] = self.index_name
-        response = requests.post(url, headers=self.headers, json=index_schema)
+        response = self.session.post(url, json_body=index_schema)
         response = response.json()
         print(response)
 
     def upload_files_from_storage_to_search(self):
         print("uploading files from storage account to search")
-        vi_output_files = self.storage_client.list_files_in_container(
-            self.insights_container
-        )
+        continuation_token = self.checkpoint.start(self.resume)
+        pages = self.shard.list_blobs(
+            self.storage_client, self.insights_container
+        ).by_page(continuation_token=continuation_token)
         i = 0
-        for file in vi_output_files:
-            i += 1
-            try:
-                json_object = json.loads(
-                    self.storage_client.get_blob_string(
-                        self.insights_container, file.name
-                    ).encode()  # Encode as UTF-8 in case UTF-8 BOM
+        for page in pages:
+            for file in page:
+                if not self.is_changed(file.name, file.etag):
+                    continue
+                i += 1
+                try:
+                    reader = VIJsonReader(
+                        self.metrics.timed_iter(
+                            "download",
+                            self.storage_client.get_blob_chunks(
+                                self.insights_container, file.name, file.etag
+                            ),
+                            size=len,
+                        )
+                    )
+                    header = reader.read_header()
+                    if header["state"] == "Processed":
+                        print(str(i) + f": uploading {str(file.name)} to search index")
+                        delta = self.document_delta(file.name)
+                        self.upload_vi_json(header, reader, delta)
+                        self.log_ingested_when_uploaded(
+                            str(file.name), delta.fingerprints
+                        )
+                except ValueError as ex:
+                    self.log_failure(file.name, ex)
+            # a resumed run starts after this page once all of its blobs are sent
+            self.batcher.flush()
+            self.checkpoint.save_continuation_token(pages.continuation_token)
+        self.checkpoint.finish()
+        self.print_stats()
+
+    def upload_files_from_storage_to_search_concurrently(
+        self, download_workers=4, parse_workers=None, upload_workers=4, queue_size=8
+    ):
+        """
+        uploads the files of the storage account running the download,
+        parse and upload of different files concurrently (see IngestPipeline)
+        :param download_workers: number of threads downloading blobs
+        :param parse_workers: number of processes parsing, defaults to the CPUs
+        :param upload_workers: number of threads uploading to search
+        :param queue_size: maximum number of files waiting between two stages
+        """
+        print("uploading files from storage account to search concurrently")
+        self.checkpoint.start(self.resume)
+        vi_output_files = self.shard.list_blobs(
+            self.storage_client, self.insights_container
+        )
+        pipeline = IngestPipeline(
+            download=self.download_blob,
+            upload=self.upload_intervals,
+            on_ingested=self.mark_ingested,
+            on_failed=self.log_failure,
+            download_workers=download_workers,
+            parse_workers=parse_workers,
+            upload_workers=upload_workers,
+            queue_size=queue_size,
+            metrics=self.metrics,
+        )
+        pipeline.run(
+            file.name
+            for file in vi_output_files
+            if self.is_changed(file.name, file.etag)
+        )
+        self.checkpoint.finish()
+        self.print_stats()
+
+    def upload_files_from_storage_to_search_async(
+        self, concurrency=200, connections_per_host=32, parse_workers=None
+    ):
+        """
+        uploads the files of the storage account with asyncio, keeping up to
+        `concurrency` blobs in flight (see AsyncIngest)
+        :param concurrency: maximum number of blobs in flight
+        :param connections_per_host: maximum connections to storage and to search
+        :param parse_workers: number of parsing processes, defaults to the CPUs
+        """
+        print("uploading files from storage account to search asynchronously")
+        self.checkpoint.start(self.resume)
+        asyncio.run(
+            self.upload_files_async(concurrency, connections_per_host, parse_workers)
+        )
+        self.checkpoint.finish()
+
+    async def upload_files_async(
+        self, concurrency, connections_per_host, parse_workers
+    ):
+        async with AsyncStorageClient(
+            connections_per_host, self.storage_client.cache
+        ) as storage, AsyncSearchUploader(
+            self.documents_url(),
+            self.headers,
+            connections_per_host,
+            AdaptiveRateController(
+                connections_per_host, self.rate_controller.max_batch_documents
+            ),
+            self.max_attempts,
+            self.metrics,
+        ) as uploader:
+            self.metrics.collectors.append(
+                lambda: {
+                    "requests": uploader.request_count,
+                    "retries": uploader.controller.retried_count,
+                    "throttled": uploader.controller.throttled_count,
+                }
+            )
+            ingest = AsyncIngest(
+                storage,
+                uploader,
+                on_ingested=self.mark_ingested,
+                on_failed=self.log_failure,
+                delta=self.document_delta,
+                concurrency=concurrency,
+                parse_workers=parse_workers,
+                max_documents=self.batcher.max_documents,
+                max_bytes=self.batcher.max_bytes,
+                metrics=self.metrics,
+            )
+            await ingest.run(self.changed_blob_names(storage))
+            print(
+                dict(
+                    uploader.controller.stats(),
+                    requests=uploader.request_count,
+                    **(
+                        self.storage_client.cache.stats()
+                        if self.storage_client.cache
+                        else {}
+                    ),
+                    skipped=self.skipped_count,
+                )
+            )
+
+    async def changed_blob_names(self, storage):
+        for prefix in self.shard.listing_prefixes():
+            async for blob in storage.list_files_in_container(prefix):
+                if self.shard.owns(blob.name) and self.is_changed(blob.name, blob.etag):
+                    yield blob.name
+
+    def download_blob(self, name):
+        try:
+            with self.metrics.stage("download") as stage:
+                content = self.storage_client.get_blob_bytes(
+                    self.insights_container, name, self.pending_versions.get(name)
                 )
-                if json_object["state"] == "Processed":
-                    parser = Parser()
-                    intervals = parser.parse_vi_json(json_object)
-                    intervals = list(intervals.values())
-                    for item in intervals:
-                        item["@search.action"] = "upload"
-
-                    documents = {"value": intervals}
-                    print(str(i) + f": uploading {str(file.name)} to search index")
-                    self.upload_to_search(documents)
-                    self.write_status_file(str(file.name), self.ingest_log_filename)
-            except ValueError:
-                print("could not process " + str(file))
-                self.write_status_file(file, self.ingest_failure_log_filename)
-
-    def upload_local_files_to_search(self):
+                stage.add(size=len(content))
+            return content
+        except Exception as ex:
+            raise ValueError("could not download {}: {}".format(name, ex))
+
+    def upload_intervals(self, name, intervals):
+        """
+        uploads the changes of the intervals of a file in batches of its own
+        (DocumentBatcher is not shared between threads)
+        """
+        print(f"uploading {name} to search index")
+        batcher = DocumentBatcher(
+            self.post_documents,
+            self.rate_controller.batch_documents,
+            self.batcher.max_bytes,
+            on_sent=self.manifest.acknowledge,
+            metrics=self.metrics,
+        )
+        delta = self.document_delta(name)
+        for document in delta.documents(intervals):
+            batcher.add(document, delta.tag(document))
+        batcher.flush()
+        self.pending_fingerprints[name] = delta.fingerprints
+
+    def log_failure(self, name, exception):
+        print("could not process " + str(name) + ": " + str(exception))
+        self.failed_files.add(str(name))
+        self.write_status_file(str(name), self.ingest_failure_log_filename)
+        self.checkpoint.set_state(str(name), FAILED)
+        self.metrics.file_event(str(name), "failed", error=str(exception))
+
+    def upload_local_files_to_search(self, workers=1):
+        """
+        uploads the VI files of the local directory to search
+        :param workers: number of processes parsing files in parallel
+        """
+        if workers > 1:
+            self.upload_local_files_to_search_in_parallel(workers)
+            return
         print("uploading local files to search")
-        files = self.read_files_from_directory(self.vi_output_directory)
+        self.checkpoint.start(self.resume)
+        files = filter(
+            self.shard.owns, self.read_files_from_directory(self.vi_output_directory)
+        )
         i = 0
         for file in files:
             path = os.path.join(self.vi_output_directory, file)
+            if not self.is_changed(file, file_content_hash(path)):
+                continue
             i += 1
-            with open(path) as f:
+            with open(path, "rb") as f:
                 try:
-                    json_object = json.load(f)
-                    if json_object["state"] == "Processed":
-                        parser = Parser()
-                        intervals = parser.parse_vi_json(json_object)
-                        intervals = list(intervals.values())
-                        for item in intervals:
-                            item["@search.action"] = "upload"
-
-                        documents = {"value": intervals}
+                    reader = VIJsonReader(f)
+                    header = reader.read_header()
+                    if header["state"] == "Processed":
                         print(str(i) + f": uploading {str(file)} to search index")
-                        self.upload_to_search(documents)
-                        self.write_status_file(file, self.ingest_log_filename)
+                        delta = self.document_delta(file)
+                        self.upload_vi_json(header, reader, delta)
+                        self.log_ingested_when_uploaded(file, delta.fingerprints)
+
+                except ValueError as ex:
+                    self.log_failure(file, ex)
+        self.batcher.flush()
+        self.checkpoint.finish()
+        self.print_stats()
+
+    def upload_local_files_to_search_in_parallel(self, workers):
+        """
+        uploads the VI files of the local directory to search, parsing them
+        in a pool of processes which return ready to send request bodies
+        :param workers: number of processes
+        """
+        print(f"uploading local files to search with {workers} processes")
+        self.checkpoint.start(self.resume)
+        files = filter(
+            self.shard.owns, self.read_files_from_directory(self.vi_output_directory)
+        )
+        pending = deque()
+        with ProcessPoolExecutor(workers) as pool:
+            i = 0
+            for file in files:
+                path = os.path.join(self.vi_output_directory, file)
+                if not self.is_changed(file, file_content_hash(path)):
+                    continue
+                i += 1
+                future = pool.submit(
+                    parse_vi_file_to_batches,
+                    path,
+                    self.rate_controller.batch_documents,
+                    self.batcher.max_bytes,
+                    self.document_delta(file),
+                )
+                pending.append((i, file, future))
+                # keep the pool busy without holding every parsed file in memory
+                if len(pending) >= 2 * workers:
+                    self.upload_parsed_file(*pending.popleft())
+            while pending:
+                self.upload_parsed_file(*pending.popleft())
+        self.checkpoint.finish()
+        self.print_stats()
+
+    def upload_parsed_file(self, i, file, future):
+        try:
+            batches = future.result()
+            if batches is not None:
+                bodies, fingerprints = batches
+                print(str(i) + f": uploading {str(file)} to search index")
+                for body in bodies:
+                    self.post_documents(body)
+                self.mark_ingested(file, fingerprints)
+        except ValueError as ex:
+            self.log_failure(file, ex)
 
-                except ValueError:
-                    print("could not process " + str(file))
-                    self.write_status_file(file, self.ingest_failure_log_filename)
+    def upload_vi_json(self, header, reader, delta=None):
+        """
+        parses the videos of a VI JSON file while it is being read
+        and uploads their intervals
+        :param header: the top level fields returned by reader.read_header()
+        :param reader: VIJsonReader of the file
+        :param delta: DocumentDelta of the file, only its changes are sent
+        :return: number of uploaded documents
+        """
+        parser = Parser()
+        # the documents are yielded while the file is read and parsed
+        documents = self.metrics.timed_iter(
+            "parse",
+            parser.iter_stream_documents(
+                header["name"], reader.videos(parser.specs_by_insight)
+            ),
+        )
+        if delta is None:
+            return self.upload_documents(documents, flush=False)
+        return self.upload_documents(
+            delta.documents(documents), flush=False, tag=delta.tag
+        )
+
+    def log_ingested_when_uploaded(self, file_name, fingerprints=None):
+        """
+        writes the file to the ingest log once its last batch is sent
+        :param file_name:
+        :param fingerprints: fingerprints of the uploaded documents of the file
+        """
+
+        def mark_ingested():
+            # some of its documents may have been rejected in the meantime
+            if file_name not in self.failed_files:
+                self.mark_ingested(file_name, fingerprints)
+
+        self.batcher.on_flushed(mark_ingested)
+
+    def log_failed_batch(self, tags, exception):
+        """
+        logs the files of the documents of a request the service rejected
+        as failed, the run goes on with the other files
+        :param tags: tags of the documents, see DocumentDelta.tag
+        :param exception: SearchUploadError
+        """
+        names = {tag[0] for tag in tags} - self.failed_files
+        if not names:
+            print("could not upload documents: " + str(exception))
+        for name in sorted(names):
+            self.log_failure(name, exception)
+
+    def document_delta(self, name):
+        """
+        returns the DocumentDelta turning the documents of a file into the
+        changes since its last upload (every document with skip_unchanged off,
+        except the ones already sent by the interrupted run being resumed)
+        :param name: blob name or local file name
+        """
+        return DocumentDelta(
+            self.manifest.document_fingerprints(name),
+            resend_unchanged=not self.skip_unchanged
+            and not self.checkpoint.was_interrupted(name),
+            name=name,
+        )
+
+    def is_changed(self, name, version):
+        """
+        tells if a file has to be ingested, i.e. it is not in the manifest
+        at this version with the current parser settings, and keeps its
+        version until it is ingested
+        :param name: blob name or local file name
+        :param version: blob ETag or local file content hash
+        """
+        if self.checkpoint.is_done(name) or (
+            self.skip_unchanged
+            and self.manifest.is_unchanged(name, self.manifest_version(version))
+        ):
+            self.skipped_count += 1
+            return False
+        self.pending_versions[name] = version
+        self.checkpoint.set_state(name, STARTED)
+        return True
+
+    def manifest_version(self, version):
+        """
+        returns the version of a file recorded in the manifest, qualified by
+        the parser settings so that changing them ingests the files again
+        :param version: blob ETag or local file content hash
+        """
+        if version is None:
+            return None
+        return "{}@{}".format(version, self.parser_fingerprint)
+
+    def mark_ingested(self, name, fingerprints=None):
+        """
+        logs an uploaded file and records its version and the fingerprints
+        of its documents in the manifest
+        :param name:
+        :param fingerprints: defaults to the ones kept by upload_intervals
+        """
+        self.write_status_file(name, self.ingest_log_filename)
+        if fingerprints is None:
+            fingerprints = self.pending_fingerprints.pop(name, None)
+        self.manifest.record(
+            name,
+            self.manifest_version(self.pending_versions.pop(name, None)),
+            fingerprints,
+        )
+        self.checkpoint.set_state(name, UPLOADED)
+        self.metrics.file_event(name, "ingested")
+
+    def print_stats(self):
+        print(
+            dict(
+                self.session.stats(),
+                **self.rate_controller.stats(),
+                **(
+                    self.storage_client.cache.stats()
+                    if self.storage_client.cache
+                    else {}
+                ),
+                skipped=self.skipped_count,
+            )
+        )
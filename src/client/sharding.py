@@ -0,0 +1,133 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+import zlib
+
+
+class Shard:
+    """
+    This class is the slice k of N of the blobs of a container, so that N
+    processes (containers, nodes) can ingest one container without
+    coordination. The blobs are partitioned either:
+    - by prefix: the prefixes (e.g. date folders "2022-01/", "2022-02/"...)
+      are dealt round-robin to the shards and each shard lists only its
+      prefixes on the server side (name_starts_with)
+    - by a hash of the blob name when no prefixes are given: every shard
+      lists the container and keeps its own blobs
+    """
+
+    def __init__(self, index=1, count=1, prefixes=None):
+        """
+        :param index: number of the shard, from 1 to count
+        :param count: number of shards
+        :param prefixes: prefixes covering every blob of the container,
+        the same list (in any order) for every shard
+        """
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError("shard must be k/N with 1 <= k <= N")
+        self.index = index
+        self.count = count
+        self.prefixes = sorted(prefixes)[index - 1 :: count] if prefixes else None
+
+    @classmethod
+    def parse(cls, text, prefixes=None):
+        """
+        returns the shard of a "k/N" string
+        :param text: e.g. "2/4"
+        :param prefixes: see Shard
+        """
+        index, _, count = text.partition("/")
+        try:
+            return cls(int(index), int(count), prefixes)
+        except ValueError:
+            raise ValueError("invalid shard '{}', expected k/N e.g. 2/4".format(text))
+
+    @property
+    def is_whole(self):
+        return self.count == 1
+
+    def owns(self, name):
+        """
+        returns True when the blob belongs to this shard
+        """
+        if self.prefixes is not None:
+            return any(name.startswith(prefix) for prefix in self.prefixes)
+        # crc32 is stable across processes and machines, unlike hash()
+        return zlib.crc32(name.encode("utf-8")) % self.count == self.index - 1
+
+    def listing_prefixes(self):
+        """
+        returns the name_starts_with values to list, None lists everything
+        """
+        return self.prefixes if self.prefixes is not None else [None]
+
+    def list_blobs(self, storage_client, container):
+        """
+        lists the blobs of the shard
+        :param storage_client: StorageClient
+        :param container:
+        :return: ShardListing, iterable of blobs
+        """
+        return ShardListing(self, storage_client, container)
+
+    def __str__(self):
+        return "{}of{}".format(self.index, self.count)
+
+
+class ShardListing:
+    """
+    the blobs of a shard, listed prefix after prefix, which can be iterated
+    or resumed page by page like ItemPaged.by_page
+    """
+
+    def __init__(self, shard, storage_client, container):
+        self.shard = shard
+        self.storage_client = storage_client
+        self.container = container
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def by_page(self, continuation_token=None):
+        return ShardPages(self, continuation_token)
+
+
+class ShardPages:
+    """
+    the pages of a ShardListing, its continuation_token (after a page is
+    iterated) is the position of the next page: the prefix and the
+    continuation token of the listing of that prefix
+    """
+
+    def __init__(self, listing, continuation_token=None):
+        self.listing = listing
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        shard = self.listing.shard
+        prefixes = shard.listing_prefixes()
+        position, token = (
+            json.loads(self.continuation_token)
+            if self.continuation_token
+            else (0, None)
+        )
+        for position in range(position, len(prefixes)):
+            pages = self.listing.storage_client.list_files_in_container(
+                self.listing.container, name_starts_with=prefixes[position]
+            ).by_page(continuation_token=token)
+            for page in pages:
+                blobs = [blob for blob in page if shard.owns(blob.name)]
+                if pages.continuation_token:
+                    self.continuation_token = json.dumps(
+                        [position, pages.continuation_token]
+                    )
+                elif position + 1 < len(prefixes):
+                    self.continuation_token = json.dumps([position + 1, None])
+                else:
+                    self.continuation_token = None
+                yield blobs
+            token = None
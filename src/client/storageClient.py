@@ -3,12 +3,51 @@ __email__ = "mamokari@microsoft.com"
 __license__ = "MIT"
 __version__ = "February 2022"
 
+import io
 import os
 
 from azure.storage.blob import BlobServiceClient
 
+from client.blobcache import DEFAULT_MAX_BYTES, BlobCache
 from client.clientabstract import ClientAbstract
 
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class BlobBuffer(io.RawIOBase):
+    """
+    a seekable stream writing into a bytearray of the size of the blob, so
+    the parallel ranged GETs of a download are written in place and the
+    content is not copied again once downloaded
+    """
+
+    def __init__(self, size):
+        self.buffer = bytearray(size)
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.buffer)
+        self.position = offset
+        return offset
+
+    def write(self, data):
+        size = len(data)
+        self.buffer[self.position : self.position + size] = data
+        self.position += size
+        return size
+
 
 class StorageClient(ClientAbstract):
     def __init__(self):
@@ -24,12 +63,53 @@ class StorageClient(ClientAbstract):
             else os.getenv("INSIGHTS_CONTAINER_NAME")
         )
 
+        # blobs larger than chunk_size are downloaded with max_concurrency
+        # parallel ranged GETs of chunk_size bytes
+        self.max_concurrency = int(
+            self.config["storage"].get("max-concurrency", 4)
+            if self.config
+            else os.getenv("STORAGE_MAX_CONCURRENCY", "4")
+        )
+        self.chunk_size = int(
+            self.config["storage"].get("chunk-size", DEFAULT_CHUNK_SIZE)
+            if self.config
+            else os.getenv("STORAGE_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE))
+        )
+
         self.blob_service_client = BlobServiceClient.from_connection_string(
-            connection_string
+            connection_string,
+            max_single_get_size=self.chunk_size,
+            max_chunk_get_size=self.chunk_size,
         )
         self.container_client = self.blob_service_client.get_container_client(
             insights_container_name
         )
+        self.cache = self.create_cache()
+
+    def create_cache(self):
+        """
+        returns the BlobCache of the downloaded blobs, None when no cache
+        directory is configured
+        """
+        files = self.config.get("files", dict()) if self.config else dict()
+        directory = (
+            files.get("blob-cache-directory")
+            if self.config
+            else os.getenv("BLOB_CACHE_DIRECTORY")
+        )
+        if not directory:
+            return None
+        max_bytes = (
+            files.get("blob-cache-max-bytes", DEFAULT_MAX_BYTES)
+            if self.config
+            else os.getenv("BLOB_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))
+        )
+        compression = (
+            files.get("blob-cache-compression")
+            if self.config
+            else os.getenv("BLOB_CACHE_COMPRESSION")
+        )
+        return BlobCache(directory, int(max_bytes), compression or None)
 
     def read_files_from_container_to_local(self):
         # TODO: this function is not used except for manual testing in the main function of this file. Refactor.
@@ -43,12 +123,12 @@ class StorageClient(ClientAbstract):
             if not os.path.exists(download_file_path):
                 print("\nDownloading blob to \n\t" + download_file_path)
 
-                blob_client = self.blob_service_client.get_blob_client(
-                    container=self.config["storage"]["container"], blob=blob.name
-                )
-
                 with open(download_file_path, "wb") as my_blob:
-                    my_blob.writelines([blob_client.download_blob().readall()])
+                    my_blob.write(
+                        self.get_blob_bytes(
+                            self.config["storage"]["container"], blob.name, blob.etag
+                        )
+                    )
 
     def list_files_in_container(self, container, name_starts_with=None):
         """
@@ -59,13 +139,49 @@ class StorageClient(ClientAbstract):
         container_client = self.blob_service_client.get_container_client(container)
         return container_client.list_blobs(name_starts_with=name_starts_with)
 
+    def get_blob_bytes(self, container, blob, etag=None):
+        """
+        this method returns the content of a blob from the cache, or downloads
+        it with parallel ranged GETs, its raw bytes can be given to json.loads
+        as is (json detects and drops a UTF-8 BOM)
+        :param container:
+        :param blob:
+        :param etag: ETag of the blob from its listing, requested when
+        missing and the cache is enabled
+        :return: bytes-like content of the blob
+        """
+        if self.cache is None:
+            return self.download_blob_bytes(container, blob)
+        return self.cache.read_through(
+            container + "/" + blob,
+            etag or self.get_blob_etag(container, blob),
+            lambda: self.download_blob_bytes(container, blob),
+        )
+
+    def download_blob_bytes(self, container, blob):
+        """
+        this method downloads a blob with parallel ranged GETs
+        :param container:
+        :param blob:
+        :return: bytearray of the content of the blob
+        """
+        downloader = self.blob_service_client.get_blob_client(
+            container, blob
+        ).download_blob(max_concurrency=self.max_concurrency)
+        stream = BlobBuffer(downloader.size)
+        downloader.readinto(stream)
+        return stream.buffer
+
+    def get_blob_etag(self, container, blob):
+        return (
+            self.blob_service_client.get_blob_client(container, blob)
+            .get_blob_properties()
+            .etag
+        )
+
     def get_blob_string(self, container, blob):
         try:
-            return (
-                self.blob_service_client.get_blob_client(container, blob)
-                .download_blob()
-                .readall()
-            ).decode("utf-8")
+            return self.get_blob_bytes(container, blob).decode("utf-8-sig")
         except Exception as ex:
             print(
                 "Could not read the content of blob:{} in container:{}\n "
@@ -73,6 +189,32 @@ class StorageClient(ClientAbstract):
                 ", \nerror:{}".format(blob, container, ex)
             )
 
+    def get_blob_chunks(self, container, blob, etag=None):
+        """
+        this method downloads a blob as an iterator of byte chunks,
+        so it can be parsed without keeping the whole blob in memory,
+        the chunks are read from the cache when the blob is cached
+        :param container:
+        :param blob:
+        :param etag: see get_blob_bytes
+        :return: iterator of bytes
+        """
+
+        def download_chunks():
+            return (
+                self.blob_service_client.get_blob_client(container, blob)
+                .download_blob()
+                .chunks()
+            )
+
+        if self.cache is None:
+            return download_chunks()
+        return self.cache.stream_through(
+            container + "/" + blob,
+            etag or self.get_blob_etag(container, blob),
+            download_chunks,
+        )
+
 
 if __name__ == "__main__":
     CLIENT = StorageClient()
@@ -0,0 +1,285 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import asyncio
+import contextlib
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from client.delta import KEY_FIELD
+
+# statuses of a request worth sending again, 429 and 503 mean throttling
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+THROTTLED_STATUS = {429, 503}
+# statuses of a document in a 207 response worth sending again:
+# version conflict, index temporarily unavailable, service too busy
+RETRYABLE_DOCUMENT_STATUS = {409, 422, 503}
+
+
+class SearchUploadError(ValueError):
+    """
+    raised when documents could not be indexed, after the retries
+    when the failure was transient
+    """
+
+    def __init__(self, message, keys=()):
+        super().__init__(message)
+        self.keys = list(keys)
+
+
+class AdaptiveRateController:
+    """
+    This class adapts the number of concurrent requests and the number of
+    documents per request to stay just under the throttling point of the
+    search service (AIMD): every successful request increases them additively,
+    every throttled request (429/503) halves them.
+    Requests take a slot (slot() or async_slot()) so that no more than
+    `limit` of them are sent at the same time.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=8,
+        max_batch_documents=1000,
+        min_batch_documents=10,
+        decrease_factor=0.5,
+    ):
+        """
+        :param max_concurrency: maximum number of concurrent requests
+        :param max_batch_documents: maximum number of documents per request
+        :param min_batch_documents: the batch size is not decreased below it,
+        it is also the step of its additive increase
+        :param decrease_factor: multiplies both on throttling
+        """
+        self.max_concurrency = max_concurrency
+        self.max_batch_documents = max_batch_documents
+        self.min_batch_documents = min(min_batch_documents, max_batch_documents)
+        self.decrease_factor = decrease_factor
+        self.concurrency = float(max_concurrency)
+        self.batch_documents = max_batch_documents
+        self.in_flight = 0
+        self.throttled_count = 0
+        self.retried_count = 0
+        self.condition = threading.Condition()
+        self.async_condition = None
+
+    @property
+    def limit(self):
+        return max(1, int(self.concurrency))
+
+    def record_success(self):
+        with self.condition:
+            # about one more concurrent request once `limit` requests succeeded
+            self.concurrency = min(
+                self.max_concurrency, self.concurrency + 1 / self.limit
+            )
+            self.batch_documents = min(
+                self.max_batch_documents,
+                self.batch_documents + self.min_batch_documents,
+            )
+            self.condition.notify_all()
+
+    def record_throttled(self):
+        with self.condition:
+            self.throttled_count += 1
+            self.concurrency = max(1.0, self.concurrency * self.decrease_factor)
+            self.batch_documents = max(
+                self.min_batch_documents,
+                int(self.batch_documents * self.decrease_factor),
+            )
+
+    @contextlib.contextmanager
+    def slot(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self):
+        if self.async_condition is None:
+            self.async_condition = asyncio.Condition()
+        async with self.async_condition:
+            await self.async_condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self.async_condition:
+                self.in_flight -= 1
+                self.async_condition.notify_all()
+
+    def stats(self):
+        return {
+            "concurrency": self.limit,
+            "batchDocuments": self.batch_documents,
+            "throttled": self.throttled_count,
+            "retried": self.retried_count,
+        }
+
+
+def retry_after_seconds(headers):
+    """
+    returns the delay asked by the service in the headers of a response
+    (retry-after-ms, or Retry-After in seconds or as an HTTP date), None without
+    :param headers: case insensitive headers of the response
+    """
+    if not headers:
+        return None
+    for name in ("retry-after-ms", "x-ms-retry-after-ms"):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) / 1000
+            except ValueError:
+                pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt, retry_after=None, base=0.5, cap=60.0):
+    """
+    returns how long to wait before the next attempt: the delay asked by the
+    service if any, otherwise an exponential backoff with full jitter
+    :param attempt: number of attempts so far (1 after the first failure)
+    :param retry_after: delay from the Retry-After header
+    :param base: backoff of the first retry
+    :param cap: maximum backoff
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class BatchRetry:
+    """
+    This class follows the attempts to index one request body: after each
+    response it tells whether the request is done, or which documents to send
+    again (only the failed keys of a 207 response) and how long to wait.
+    It reports success and throttling to the AdaptiveRateController.
+    """
+
+    def __init__(self, body, controller, max_attempts=8):
+        """
+        :param body: serialized request body {"value": [documents]}
+        :param controller: AdaptiveRateController
+        :param max_attempts: attempts before giving up with SearchUploadError
+        """
+        self.body = body
+        self.controller = controller
+        self.max_attempts = max_attempts
+        self.attempt = 0
+
+    def record(self, status, headers=None, payload=None):
+        """
+        records the response to the last attempt
+        :param status: HTTP status, None when the request failed to be sent
+        :param headers: headers of the response
+        :param payload: JSON of the response, None when it is not JSON
+        :return: seconds to wait before sending self.body, None when done
+        """
+        self.attempt += 1
+        if status in (200, 201):
+            self.controller.record_success()
+            self.body = None
+            return None
+        if status == 207 and payload is not None:
+            failed = [r for r in payload.get("value", []) if not r.get("status")]
+            permanent = [
+                r
+                for r in failed
+                if r.get("statusCode") not in RETRYABLE_DOCUMENT_STATUS
+            ]
+            if permanent:
+                raise SearchUploadError(
+                    "documents could not be indexed: "
+                    + "; ".join(
+                        "{} {}".format(r.get("key"), r.get("errorMessage"))
+                        for r in permanent
+                    ),
+                    [r.get("key") for r in permanent],
+                )
+            if not failed:
+                self.controller.record_success()
+                self.body = None
+                return None
+            if any(r.get("statusCode") == 503 for r in failed):
+                self.controller.record_throttled()
+            self.body = self.documents_of(self.body, {r["key"] for r in failed})
+        elif status is not None and status not in RETRYABLE_STATUS:
+            raise SearchUploadError(
+                "indexing request failed with status {}: {}".format(status, payload)
+            )
+        elif status in THROTTLED_STATUS:
+            self.controller.record_throttled()
+        if self.attempt >= self.max_attempts:
+            raise SearchUploadError(
+                "indexing request failed after {} attempts, status {}".format(
+                    self.attempt, status
+                )
+            )
+        self.controller.retried_count += 1
+        return backoff_seconds(self.attempt, retry_after_seconds(headers))
+
+    @staticmethod
+    def documents_of(body, keys):
+        """
+        returns a request body with only the documents of the keys
+        """
+        documents = json.loads(body)["value"]
+        return json.dumps(
+            {"value": [d for d in documents if d[KEY_FIELD] in keys]},
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+def post_with_retry(session, url, body, controller, max_attempts=8, sleep=time.sleep):
+    """
+    posts a request body to the docs/index endpoint through a SearchSession,
+    sending the failed documents again until they are indexed
+    :param session: SearchSession
+    :param url: docs/index endpoint
+    :param body: serialized request body {"value": [documents]}
+    :param controller: AdaptiveRateController
+    :param max_attempts:
+    :param sleep: function waiting a number of seconds
+    :return: JSON of the last response
+    """
+    retry = BatchRetry(body, controller, max_attempts)
+    payload = None
+    while retry.body is not None:
+        with controller.slot():
+            try:
+                response = session.post(url, retry.body)
+                status, headers = response.status_code, response.headers
+                try:
+                    payload = response.json()
+                except ValueError:
+                    payload = None
+            except requests.RequestException:
+                status, headers, payload = None, None, None
+        delay = retry.record(status, headers, payload)
+        if delay:
+            sleep(delay)
+    return payload
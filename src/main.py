@@ -3,15 +3,135 @@ __email__ = "mamokari@microsoft.com"
 __license__ = "MIT"
 __version__ = "February 2022"
 
-import sys
+import argparse
+import logging
+
+from client.metrics import format_summary
 from client.searchClient import SearchClient
+from client.sharding import Shard
+
+
+def parse_arguments():
+    arguments = argparse.ArgumentParser(
+        description="Uploads Video Indexer insights to an Azure Search index"
+    )
+    arguments.add_argument(
+        "source",
+        nargs="?",
+        choices=["storage", "local"],
+        default="storage",
+        help="read VI files from the storage account (default) or a local directory",
+    )
+    arguments.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of processes parsing local files in parallel",
+    )
+    arguments.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="download, parse and upload storage files concurrently",
+    )
+    arguments.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="ingest storage files with asyncio, many blobs in flight",
+    )
+    arguments.add_argument(
+        "--concurrency",
+        type=int,
+        default=200,
+        help="maximum number of blobs in flight with --async",
+    )
+    arguments.add_argument(
+        "--connections-per-host",
+        type=int,
+        default=32,
+        help="maximum connections to storage and to search with --async",
+    )
+    arguments.add_argument(
+        "--force",
+        action="store_true",
+        help="ingest every file, even the ones unchanged since they were ingested",
+    )
+    arguments.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the previous run where it stopped if it was interrupted",
+    )
+    arguments.add_argument(
+        "--shard",
+        default=None,
+        help="ingest the slice k/N of the files e.g. 2/4, "
+        "N processes can split a container without coordination",
+    )
+    arguments.add_argument(
+        "--shard-prefixes",
+        type=lambda text: text.split(","),
+        default=None,
+        help="comma separated blob name prefixes covering the container "
+        "(e.g. date folders), dealt to the shards and listed on the server side; "
+        "without it the shards split the blobs by a hash of their name",
+    )
+    arguments.add_argument("--download-workers", type=int, default=4)
+    arguments.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="number of parsing processes, defaults to the number of CPUs",
+    )
+    arguments.add_argument("--upload-workers", type=int, default=4)
+    arguments.add_argument(
+        "--queue-size",
+        type=int,
+        default=8,
+        help="maximum number of files waiting between two pipeline stages",
+    )
+    parsed = arguments.parse_args()
+    if parsed.shard_prefixes and not parsed.shard:
+        arguments.error("--shard-prefixes needs --shard")
+    return parsed
+
 
 if __name__ == "__main__":
-    SEARCH_CLIENT = SearchClient()
+    ARGUMENTS = parse_arguments()
+    SHARD = (
+        Shard.parse(ARGUMENTS.shard, ARGUMENTS.shard_prefixes)
+        if ARGUMENTS.shard
+        else None
+    )
+    SEARCH_CLIENT = SearchClient(
+        skip_unchanged=not ARGUMENTS.force, resume=ARGUMENTS.resume, shard=SHARD
+    )
+    if SEARCH_CLIENT.metrics.enabled:
+        # the structured logs of the metrics, one JSON object per line
+        HANDLER = logging.StreamHandler()
+        HANDLER.setFormatter(logging.Formatter("%(message)s"))
+        METRICS_LOGGER = logging.getLogger("client.metrics")
+        METRICS_LOGGER.addHandler(HANDLER)
+        METRICS_LOGGER.setLevel(logging.INFO)
     #  step 1
     SEARCH_CLIENT.create_index()
     #  step 2
-    if sys.argv and sys.argv[0] == "local":
-        SEARCH_CLIENT.upload_local_files_to_search()
+    if ARGUMENTS.source == "local":
+        SEARCH_CLIENT.upload_local_files_to_search(workers=ARGUMENTS.workers)
+    elif ARGUMENTS.use_async:
+        SEARCH_CLIENT.upload_files_from_storage_to_search_async(
+            concurrency=ARGUMENTS.concurrency,
+            connections_per_host=ARGUMENTS.connections_per_host,
+            parse_workers=ARGUMENTS.parse_workers,
+        )
+    elif ARGUMENTS.pipeline:
+        SEARCH_CLIENT.upload_files_from_storage_to_search_concurrently(
+            download_workers=ARGUMENTS.download_workers,
+            parse_workers=ARGUMENTS.parse_workers,
+            upload_workers=ARGUMENTS.upload_workers,
+            queue_size=ARGUMENTS.queue_size,
+        )
     else:
         SEARCH_CLIENT.upload_files_from_storage_to_search()
+    SUMMARY = SEARCH_CLIENT.metrics.finish()
+    if SUMMARY:
+        print("\n".join(format_summary(SUMMARY)))
@@ -0,0 +1,135 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+from array import array
+from os import getenv
+from os.path import isfile
+
+from utils.util import Util
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ENGINES = ("python", "numpy")
+
+
+def read_bucketing():
+    """
+    reads the bucketing engine of the parser (parser.bucketing or
+    PARSER_BUCKETING), numpy when it is installed by default
+    """
+    if isfile("config/config.yml"):
+        engine = Util().config["parser"].get("bucketing")
+    else:
+        engine = getenv("PARSER_BUCKETING")
+    if not engine:
+        return "numpy" if numpy is not None else "python"
+    return check_bucketing(engine)
+
+
+def check_bucketing(engine):
+    """
+    checks that a bucketing engine is known and can be used
+    :param engine: "python" or "numpy"
+    :return: engine
+    """
+    if engine not in ENGINES:
+        raise ValueError(
+            "unknown parser bucketing '{}', expected python or numpy".format(engine)
+        )
+    if engine == "numpy" and numpy is None:
+        raise ValueError("parser bucketing 'numpy' needs the numpy package")
+    return engine
+
+
+def python_buckets(compact, skeleton, time_parser):
+    """
+    distributes the instances of a CompactVideo to the intervals they
+    occurred in, one instance at a time
+    :param compact: CompactVideo
+    :param skeleton: intervals of Parser.create_intervals
+    :param time_parser: TimeParser
+    :return: rows of the instances of every interval (in the order of the
+    rows) and the number of intervals of every row
+    """
+    buckets = {key: array("l") for key in skeleton}
+    remaining = array("l", bytes(len(compact) * array("l").itemsize))
+    related_intervals = (
+        time_parser.get_multi_resolution_intervals
+        if time_parser.is_multi_resolution
+        else time_parser.get_related_intervals
+    )
+    to_milliseconds = time_parser.string_time_to_milliseconds
+    starts, ends = compact.starts, compact.ends
+    for row in range(len(compact)):
+        occurred_intervals = related_intervals(
+            to_milliseconds(starts[row]), to_milliseconds(ends[row])
+        )
+        for key in occurred_intervals:
+            buckets[key].append(row)
+        remaining[row] = len(occurred_intervals)
+    return buckets, remaining
+
+
+def numpy_buckets(compact, skeleton, time_parser):
+    """
+    same result as python_buckets, computed on arrays: the starts and ends
+    of all the instances in milliseconds are divided by the interval size at
+    once, and every instance is repeated once per interval it occurred in
+    (the same intervals as TimeParser.get_related_intervals)
+    """
+    to_milliseconds = time_parser.string_time_to_milliseconds
+    count = len(compact)
+    start = numpy.fromiter(map(to_milliseconds, compact.starts), numpy.float64, count)
+    end = numpy.fromiter(map(to_milliseconds, compact.ends), numpy.float64, count)
+    start_int = start.astype(numpy.int64)
+    end_int = end.astype(numpy.int64)
+    rows = numpy.arange(count)
+    buckets = {key: array("l") for key in skeleton}
+    remaining = numpy.zeros(count, numpy.int64)
+    multi_resolution = time_parser.is_multi_resolution
+    for interval in time_parser.intervals_in_milliseconds:
+        # an appearance shorter than the interval is in the interval of its start
+        short = (end - start < interval).astype(numpy.int64)
+        # then every multiple of the interval in [start, end)
+        first = -(-start_int // interval)
+        ranges = numpy.maximum(-(-end_int // interval) - first, 0)
+        counts = short + ranges
+        remaining += counts
+        total = int(counts.sum())
+        if not total:
+            continue
+        row_of = numpy.repeat(rows, counts)
+        # position of every pair among the intervals of its row
+        offsets = numpy.cumsum(counts) - counts
+        position = numpy.arange(total) - numpy.repeat(offsets, counts)
+        index = first[row_of] + position - short[row_of]
+        in_start = (position == 0) & (short[row_of] == 1)
+        index[in_start] = start_int[row_of[in_start]] // interval
+        # grouped by interval, the rows staying in order
+        order = numpy.argsort(index, kind="stable")
+        index, row_of = index[order], row_of[order]
+        bounds = numpy.flatnonzero(numpy.diff(index)) + 1
+        group_starts = numpy.concatenate(([0], bounds)).tolist()
+        group_ends = bounds.tolist() + [total]
+        row_list = row_of.tolist()
+        for i, group_start, group_end in zip(
+            (index[group_starts] * interval).tolist(), group_starts, group_ends
+        ):
+            key = (interval, i) if multi_resolution else i
+            buckets[key].extend(row_list[group_start:group_end])
+    return buckets, array("l", remaining.tolist())
+
+
+def bucket_instances(engine, compact, skeleton, time_parser):
+    """
+    :param engine: "python" or "numpy"
+    :return: see python_buckets
+    """
+    if engine == "numpy":
+        return numpy_buckets(compact, skeleton, time_parser)
+    return python_buckets(compact, skeleton, time_parser)
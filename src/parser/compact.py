@@ -0,0 +1,171 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+from array import array
+
+# the fields of a video read by Parser.create_intervals
+VIDEO_FIELDS = ("id", "accountId", "externalId", "metadata")
+
+
+class CompactVideo:
+    """
+    This class is the parsed insights of one video before they are
+    distributed to intervals, stored in columns (arrays and lists of
+    references) instead of the dictionaries of the documents, where every
+    instance is a dictionary and a JSON string added to every interval it
+    occurred in. The documents are built from it one interval at a time by
+    Parser.materialize, when they are consumed.
+    """
+
+    def __init__(self, show_name, video=None):
+        """
+        :param show_name:
+        :param video: the video the fields (and duration) are copied from,
+        they can also be set later in self.video
+        """
+        self.show_name = show_name
+        self.video = {"insights": dict()}
+        if video is not None:
+            for field in VIDEO_FIELDS:
+                if field in video:
+                    self.video[field] = video[field]
+            self.video["insights"]["duration"] = video["insights"]["duration"]
+        # the specs of the entries and the names of their static assets
+        self.specs = []
+        self.asset_names = []
+        # one entry per accepted item (or child): index of its spec, its value
+        # and the offset of the values of its static assets
+        self.entry_spec = array("h")
+        self.entry_values = []
+        self.entry_offset = array("i")
+        self.static_values = []
+        # one row per instance: index of its entry, its start and end strings
+        # and the offset of the values of its instance assets
+        self.entry_index = array("i")
+        self.starts = []
+        self.ends = []
+        self.instance_offset = array("i")
+        self.instance_values = []
+        # serialized static assets of the entries, see InsightSpec.assets_prefix
+        self.prefixes = dict()
+
+    def __len__(self):
+        return len(self.entry_index)
+
+    def add(self, spec, items):
+        """
+        adds the instances of the accepted items of an insight
+        :param spec: InsightSpec of the insight
+        :param items: the list of the insight, or a part of it
+        """
+        if spec in self.specs:
+            spec_index = self.specs.index(spec)
+        else:
+            spec_index = len(self.specs)
+            self.specs.append(spec)
+            self.asset_names.append(None)
+        instance_assets = spec.instance_assets
+        for value, static_assets, instances in spec.entries(items):
+            if self.asset_names[spec_index] is None:
+                # the static assets of a spec always have the same names
+                self.asset_names[spec_index] = tuple(static_assets)
+            entry = len(self.entry_values)
+            self.entry_spec.append(spec_index)
+            self.entry_values.append(value)
+            self.entry_offset.append(len(self.static_values))
+            self.static_values.extend(static_assets.values())
+            for instance in instances:
+                self.entry_index.append(entry)
+                self.starts.append(instance["start"])
+                self.ends.append(instance["end"])
+                self.instance_offset.append(len(self.instance_values))
+                for asset in instance_assets:
+                    self.instance_values.append(asset.read(instance))
+
+    def static_assets(self, entry):
+        spec_index = self.entry_spec[entry]
+        names = self.asset_names[spec_index]
+        offset = self.entry_offset[entry]
+        return dict(zip(names, self.static_values[offset : offset + len(names)]))
+
+    def item_object(self, row):
+        """
+        builds the object added to the intervals of an instance,
+        e.g. {"face": "FOO", "assets": "{...}"}, the static assets of an
+        entry are serialized once for all its instances
+        :param row: index of the instance
+        :return: group of the spec, object
+        """
+        entry = self.entry_index[row]
+        spec = self.specs[self.entry_spec[entry]]
+        prefix = self.prefixes.get(entry)
+        if prefix is None:
+            prefix = self.prefixes[entry] = spec.assets_prefix(
+                self.static_assets(entry)
+            )
+        offset = self.instance_offset[row]
+        assets = spec.encode_assets(
+            prefix,
+            # only read when the assets cannot be appended to the prefix
+            self.static_assets(entry) if not spec.spliceable or prefix == "{" else None,
+            self.instance_values[offset : offset + len(spec.instance_assets)],
+            self.starts[row],
+            self.ends[row],
+        )
+        if spec.field is None:
+            return spec.group, {"assets": assets}
+        return spec.group, {spec.field: self.entry_values[entry], "assets": assets}
+
+    def coalesce_rows(self, rows, coalesced):
+        """
+        groups the consecutive rows of the same entry of the coalesced specs,
+        (the instances of an entry have consecutive rows), a row listed twice
+        is kept once and a group of one row is left as a row
+        :param rows: rows of an interval
+        :param coalesced: indexes of the coalesced specs in self.specs
+        :return: list of rows and lists of rows
+        """
+        runs = []
+        entry_index, entry_spec = self.entry_index, self.entry_spec
+        previous_entry = -1
+        for row in rows:
+            entry = entry_index[row]
+            if entry_spec[entry] not in coalesced:
+                runs.append(row)
+                previous_entry = -1
+            elif entry != previous_entry:
+                run = [row]
+                runs.append(run)
+                previous_entry = entry
+            elif run[-1] != row:
+                run.append(row)
+        return [
+            run[0] if run.__class__ is list and len(run) == 1 else run for run in runs
+        ]
+
+    def coalesced_object(self, run):
+        """
+        builds the object of several instances of an entry in an interval
+        (see InsightSpec.coalesce_assets)
+        :param run: rows of the instances
+        :return: group of the spec, object
+        """
+        entry = self.entry_index[run[0]]
+        spec = self.specs[self.entry_spec[entry]]
+        count = len(spec.instance_assets)
+        ranges = [
+            (
+                self.instance_values[
+                    self.instance_offset[row] : self.instance_offset[row] + count
+                ],
+                self.starts[row],
+                self.ends[row],
+            )
+            for row in run
+        ]
+        assets = spec.coalesce_assets(self.static_assets(entry), ranges)
+        if spec.field is None:
+            return spec.group, {"assets": assets}
+        return spec.group, {spec.field: self.entry_values[entry], "assets": assets}
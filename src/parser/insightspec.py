@@ -0,0 +1,430 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+from json.encoder import encode_basestring_ascii
+
+from parser.timeparser import TimeParser
+
+ITEM = "item"
+CHILD = "child"
+INSTANCE = "instance"
+
+
+def encode_value(value):
+    """
+    serializes a value as json.dumps does, strings without its overhead
+    """
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
+class AssetField:
+    """
+    One entry of the assets projection of an insight.
+    It copies `key` of the item (e.g. a face), of its child (e.g. a thumbnail
+    of that face) or of the instance into the assets under `name`.
+    Optional fields default to an empty string when the key is missing.
+    """
+
+    def __init__(self, name, key=None, source=ITEM, optional=False):
+        self.name = name
+        self.key = key if key else name
+        self.source = source
+        self.optional = optional
+
+    def read(self, obj):
+        if self.optional:
+            return obj[self.key] if self.key in obj else ""
+        return obj[self.key]
+
+
+class InsightSpec:
+    """
+    This class declares how one insight of a VI JSON file (e.g. "faces")
+    is distributed to intervals, so that Parser can execute every insight
+    with the same engine:
+    - insight: key of the insight under video["insights"]
+    - group: key of the list the items are added to in each interval
+    - field: key holding the value of the item (None to only keep assets)
+    - value: key of the value in the item (or in the child when children is set)
+    - assets: list of AssetField, "start" and "end" of the instance are always added
+    - non_empty: key of the item which must not be an empty string
+    - confidence: key of the item which must be greater than min_confidence
+    - value_format: optional function applied to the value (e.g. str)
+    - children: key of a list inside the item whose entries carry the instances
+    """
+
+    def __init__(
+        self,
+        insight,
+        group,
+        field,
+        value=None,
+        assets=(),
+        non_empty=None,
+        confidence=None,
+        min_confidence=0.5,
+        value_format=None,
+        children=None,
+    ):
+        self.insight = insight
+        self.group = group
+        self.field = field
+        self.value = value
+        self.assets = tuple(assets)
+        self.non_empty = non_empty
+        self.confidence = confidence
+        self.min_confidence = min_confidence
+        self.value_format = value_format
+        self.children = children
+        self.item_assets = [a for a in self.assets if a.source == ITEM]
+        self.child_assets = [a for a in self.assets if a.source == CHILD]
+        self.instance_assets = [a for a in self.assets if a.source == INSTANCE]
+        static_names = {a.name for a in self.item_assets + self.child_assets}
+        # the instance assets, start and end are appended to the JSON of the
+        # static assets, unless they replace one of them
+        self.instance_keys = [
+            ", " + json.dumps(a.name) + ": " for a in self.instance_assets
+        ]
+        self.spliceable = static_names.isdisjoint(
+            [a.name for a in self.instance_assets] + ["start", "end"]
+        )
+
+    def settings(self):
+        """
+        returns what the documents of the insight depend on, as a JSON
+        serializable list (see Parser.settings_fingerprint)
+        """
+        return [
+            self.insight,
+            self.group,
+            self.field,
+            self.value,
+            [[a.name, a.key, a.source, a.optional] for a in self.assets],
+            self.non_empty,
+            self.confidence,
+            self.min_confidence,
+            getattr(self.value_format, "__name__", self.value_format),
+            self.children,
+        ]
+
+    def accepts(self, item):
+        """
+        applies the non-empty and confidence filters of the spec to an item
+        :param item:
+        :return: True when the item should be parsed
+        """
+        if self.non_empty is not None and item[self.non_empty] == "":
+            return False
+        if self.confidence is not None and not (
+            item[self.confidence] > self.min_confidence
+        ):
+            return False
+        return True
+
+    def entries(self, items):
+        """
+        yields a tuple of (value, static assets, instances) for each accepted item
+        (or for each child of an accepted item), the static assets being the
+        part of the assets that is the same for all the instances
+        :param items: the list of the insight e.g. video["insights"]["faces"]
+        :return:
+        """
+        for item in items:
+            if not self.accepts(item):
+                continue
+            item_assets = {a.name: a.read(item) for a in self.item_assets}
+            if self.children is None:
+                yield self.format_value(item), item_assets, item["instances"]
+                continue
+            for child in item[self.children] if self.children in item else []:
+                child_assets = dict(item_assets)
+                for asset in self.child_assets:
+                    child_assets[asset.name] = asset.read(child)
+                yield self.format_value(child), child_assets, child["instances"]
+
+    def format_value(self, obj):
+        if self.field is None:
+            return None
+        value = obj[self.value]
+        return self.value_format(value) if self.value_format else value
+
+    def project_assets(self, static_assets, instance):
+        """
+        builds the assets of one instance
+        :param static_assets: assets shared by all the instances of the item
+        :param instance:
+        :return: assets dictionary
+        """
+        assets = dict(static_assets)
+        for asset in self.instance_assets:
+            assets[asset.name] = asset.read(instance)
+        assets["start"] = instance["start"]
+        assets["end"] = instance["end"]
+        return assets
+
+    def assets_prefix(self, static_assets):
+        """
+        serializes the static assets of an item once for all its instances
+        (see encode_assets)
+        :param static_assets: assets shared by all the instances of the item
+        :return: JSON of the static assets without its closing brace
+        """
+        return json.dumps(static_assets)[:-1]
+
+    def encode_assets(self, prefix, static_assets, instance_values, start, end):
+        """
+        serializes the assets of one instance, the same JSON as
+        json.dumps(project_assets(...)), appending its fields to the
+        serialized static assets
+        :param prefix: assets_prefix(static_assets)
+        :param static_assets: assets shared by all the instances of the item
+        :param instance_values: values of the instance assets
+        :param start: start of the instance
+        :param end: end of the instance
+        :return: JSON string
+        """
+        if not self.spliceable or prefix == "{":
+            assets = dict(static_assets)
+            for asset, value in zip(self.instance_assets, instance_values):
+                assets[asset.name] = value
+            assets["start"] = start
+            assets["end"] = end
+            return json.dumps(assets)
+        parts = [prefix]
+        for key, value in zip(self.instance_keys, instance_values):
+            parts.append(key)
+            parts.append(encode_value(value))
+        parts.append(', "start": ')
+        parts.append(encode_value(start))
+        parts.append(', "end": ')
+        parts.append(encode_value(end))
+        parts.append("}")
+        return "".join(parts)
+
+    def coalesce_assets(self, static_assets, ranges):
+        """
+        serializes the assets of several instances of an item occurring in
+        the same interval as one entry, e.g. a face appearing many times
+        in 10 seconds: its start and end span all the instances, which are
+        listed in "ranges" with their instance assets
+        :param static_assets: assets shared by all the instances of the item
+        :param ranges: list of (values of the instance assets, start, end)
+        :return: JSON string
+        """
+        assets = dict(static_assets)
+        to_milliseconds = TimeParser.string_time_to_milliseconds
+        assets["start"] = min((start for _, start, _ in ranges), key=to_milliseconds)
+        assets["end"] = max((end for _, _, end in ranges), key=to_milliseconds)
+        assets["ranges"] = []
+        for values, start, end in ranges:
+            sub_range = {
+                a.name: value for a, value in zip(self.instance_assets, values)
+            }
+            sub_range["start"] = start
+            sub_range["end"] = end
+            assets["ranges"].append(sub_range)
+        return json.dumps(assets)
+
+
+INSIGHT_SPECS = (
+    InsightSpec(
+        "transcript",
+        "transcripts",
+        "transcript",
+        value="text",
+        assets=[AssetField("id"), AssetField("speakerId"), AssetField("language")],
+        non_empty="text",
+        confidence="confidence",
+    ),
+    InsightSpec(
+        "ocr",
+        "ocrs",
+        "ocr",
+        value="text",
+        assets=[
+            AssetField("id"),
+            AssetField("left"),
+            AssetField("top"),
+            AssetField("width"),
+            AssetField("height"),
+            AssetField("language"),
+        ],
+        non_empty="text",
+        confidence="confidence",
+    ),
+    InsightSpec(
+        "keywords",
+        "keywords",
+        "keyword",
+        value="text",
+        assets=[AssetField("id"), AssetField("language")],
+        non_empty="text",
+        confidence="confidence",
+    ),
+    InsightSpec(
+        "topics",
+        "topics",
+        "topic",
+        value="name",
+        assets=[
+            AssetField("id"),
+            AssetField("referenceId", optional=True),
+            AssetField("referenceType", optional=True),
+            AssetField("iptcName", optional=True),
+            AssetField("iabName", optional=True),
+            AssetField("language", optional=True),
+        ],
+        non_empty="name",
+        confidence="confidence",
+    ),
+    InsightSpec(
+        "faces",
+        "faces",
+        "face",
+        value="name",
+        assets=[
+            AssetField("id"),
+            AssetField("description", optional=True),
+            AssetField("thumbnailId", optional=True),
+            AssetField("knownPersonId", optional=True),
+            AssetField("title", optional=True),
+            AssetField("imageUrl", optional=True),
+            AssetField("thumbnailsIds", source=INSTANCE, optional=True),
+        ],
+        non_empty="name",
+        confidence="confidence",
+    ),
+    InsightSpec(
+        "faces",
+        "thumbnails",
+        "thumbnail",
+        value="fileName",
+        assets=[
+            AssetField("id"),
+            AssetField("description", optional=True),
+            AssetField("thumbnailId", optional=True),
+            AssetField("knownPersonId", optional=True),
+            AssetField("title", optional=True),
+            AssetField("imageUrl", optional=True),
+            AssetField("thumbnailsIds", key="id", source=CHILD),
+        ],
+        non_empty="name",
+        confidence="confidence",
+        children="thumbnails",
+    ),
+    InsightSpec(
+        "labels",
+        "labels",
+        "label",
+        value="name",
+        assets=[
+            AssetField("id"),
+            AssetField("referenceId", optional=True),
+            AssetField("language", optional=True),
+            AssetField("confidence", source=INSTANCE),
+        ],
+        non_empty="name",
+    ),
+    InsightSpec(
+        "namedLocations",
+        "namedLocations",
+        "namedLocation",
+        value="name",
+        assets=[
+            AssetField("id"),
+            AssetField("referenceId", optional=True),
+            AssetField("referenceUrl", optional=True),
+            AssetField("description", optional=True),
+            AssetField("confidence", optional=True),
+            AssetField("instanceSource", source=INSTANCE),
+        ],
+        non_empty="name",
+        confidence="confidence",
+    ),
+    InsightSpec(
+        "namedPeople",
+        "namedPeople",
+        "namedPerson",
+        value="name",
+        assets=[
+            AssetField("id"),
+            AssetField("referenceId", optional=True),
+            AssetField("referenceUrl", optional=True),
+            AssetField("description", optional=True),
+            AssetField("confidence", optional=True),
+            AssetField("instanceSource", source=INSTANCE),
+        ],
+        non_empty="name",
+        confidence="confidence",
+    ),
+    InsightSpec(
+        "audioEffects",
+        "audioEffects",
+        "audioEffect",
+        value="type",
+        assets=[AssetField("id")],
+        non_empty="type",
+    ),
+    InsightSpec(
+        "sentiments",
+        "sentiments",
+        "sentimentType",
+        value="sentimentType",
+        assets=[AssetField("id"), AssetField("averageScore", optional=True)],
+        non_empty="sentimentType",
+        confidence="averageScore",
+    ),
+    InsightSpec(
+        "emotions",
+        "emotions",
+        "emotion",
+        value="type",
+        assets=[AssetField("id"), AssetField("confidence", source=INSTANCE)],
+        non_empty="type",
+    ),
+    InsightSpec(
+        "visualContentModeration",
+        "adultScores",
+        "adultScore",
+        value="adultScore",
+        assets=[AssetField("id")],
+        value_format=str,
+    ),
+    InsightSpec(
+        "visualContentModeration",
+        "racyScores",
+        "racyScore",
+        value="racyScore",
+        assets=[AssetField("id")],
+        value_format=str,
+    ),
+    InsightSpec(
+        "framePatterns",
+        "framePatterns",
+        "framePattern",
+        value="patternType",
+        assets=[AssetField("id"), AssetField("confidence")],
+        confidence="confidence",
+    ),
+    InsightSpec(
+        "brands",
+        "brands",
+        "brand",
+        value="name",
+        assets=[
+            AssetField("id"),
+            AssetField("confidence"),
+            AssetField("referenceId"),
+            AssetField("referenceType"),
+            AssetField("description"),
+            AssetField("brandType", source=INSTANCE),
+        ],
+        non_empty="name",
+        confidence="confidence",
+    ),
+)
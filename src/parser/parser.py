@@ -3,9 +3,16 @@ __email__ = "mamokari@microsoft.com"
 __license__ = "MIT"
 __version__ = "February 2022"
 
+import hashlib
 import json
+from os import getenv
+from os.path import isfile
 
+from parser.bucketing import bucket_instances, check_bucketing, read_bucketing
+from parser.compact import CompactVideo
+from parser.insightspec import INSIGHT_SPECS
 from parser.timeparser import TimeParser
+from utils.util import Util
 
 
 class Parser:
@@ -13,64 +20,210 @@ class Parser:
     This class in responsible to Parse VI JSON file into
     intervals of occurrence based on the defined interval in TimeParser
     the result will be used to upload to Azure search index
+    each insight is parsed according to its InsightSpec (see insightspec.py)
     """
 
-    def __init__(self):
-        self.time_parser = TimeParser()
+    def __init__(
+        self,
+        insight_specs=INSIGHT_SPECS,
+        time_parser=None,
+        bucketing=None,
+        coalesced_insights=None,
+    ):
+        """
+        :param insight_specs:
+        :param time_parser: TimeParser, created from the config when None
+        :param bucketing: engine distributing the instances to the intervals
+        in materialize, "python" or "numpy" (see bucketing.py), read from the
+        config when None
+        :param coalesced_insights: insights (e.g. ["faces", "labels"]) whose
+        instances of the same item in an interval are merged into one object
+        (see InsightSpec.coalesce_assets), read from the config when None
+        """
+        self.time_parser = time_parser or TimeParser()
+        self.bucketing = check_bucketing(bucketing) if bucketing else read_bucketing()
+        if coalesced_insights is None:
+            coalesced_insights = self.read_coalesced_insights()
+        self.coalesced_insights = set(coalesced_insights)
+        # with several interval sizes the intervals are keyed by (size, start)
+        # and every instance goes to its intervals of every size at once
+        self.related_intervals = (
+            self.time_parser.get_multi_resolution_intervals
+            if self.time_parser.is_multi_resolution
+            else self.time_parser.get_related_intervals
+        )
+        self.insight_specs = insight_specs
+        self.specs_by_insight = dict()
+        for spec in insight_specs:
+            self.specs_by_insight.setdefault(spec.insight, []).append(spec)
+
+    @staticmethod
+    def read_coalesced_insights():
+        if isfile("config/config.yml"):
+            return Util().config["parser"].get("coalesce-insights") or []
+        return [i for i in getenv("COALESCE_INSIGHTS", "").split(",") if i]
+
+    def settings_fingerprint(self):
+        """
+        returns a digest of the settings the documents depend on: the
+        interval sizes, the coalesced insights and the insight specs
+        (not the bucketing engine, which gives the same documents), so that
+        a file is ingested again when they change
+        :return: hexadecimal digest
+        """
+        settings = json.dumps(
+            [
+                self.time_parser.intervals_in_milliseconds,
+                sorted(self.coalesced_insights),
+                [spec.settings() for spec in self.insight_specs],
+            ],
+            sort_keys=True,
+        )
+        return hashlib.sha256(settings.encode()).hexdigest()[:16]
 
     def parse_vi_json(self, vi_json):
         """
         This method parses JSON file (created by VI) and distribute each Item
-        under videos[0]["insights"] to different intervals having
+        under videos[*]["insights"] to different intervals having
         fixed duration (e.g. 10000 milliseconds interval)
         :param vi_json:
-        :return: list of intervals
+        :return: list of intervals of all the videos
+        """
+        return list(self.iter_documents(vi_json))
+
+    def iter_documents(self, vi_json):
+        """
+        This method yields the intervals of every video of the JSON file
+        (created by VI) one video at a time, so only the intervals of the
+        video being parsed are kept in memory and the caller can start
+        uploading before the whole file is parsed
+        :param vi_json:
+        :return: generator of intervals
         """
         show_name = vi_json["name"]
         for video in vi_json["videos"]:
-            insights = video["insights"]
-            intervals = self.create_intervals(video, show_name)
-            if "transcript" in insights:
-                intervals = self.parse_transcript(insights["transcript"], intervals)
-            if "ocr" in insights:
-                intervals = self.parse_ocr(insights["ocr"], intervals)
-            if "keywords" in insights:
-                intervals = self.parse_keywords(insights["keywords"], intervals)
-            if "topics" in insights:
-                intervals = self.parse_topics(insights["topics"], intervals)
-            if "faces" in insights:
-                intervals = self.parse_faces(insights["faces"], intervals)
-            if "labels" in insights:
-                intervals = self.parse_labels(insights["labels"], intervals)
-            if "namedLocations" in insights:
-                intervals = self.parse_named_locations(
-                    insights["namedLocations"], intervals
-                )
-            if "namedPeople" in insights:
-                intervals = self.parse_named_people(insights["namedPeople"], intervals)
-            if "audioEffects" in insights:
-                intervals = self.parse_audio_effects(
-                    insights["audioEffects"], intervals
-                )
-            if "sentiments" in insights:
-                intervals = self.parse_sentiments(insights["sentiments"], intervals)
-            if "emotions" in insights:
-                intervals = self.parse_emotions(insights["emotions"], intervals)
-            if "visualContentModeration" in insights:
-                intervals = self.parse_visual_content_moderation(
-                    insights["visualContentModeration"], intervals
-                )
-            if "framePatterns" in insights:
-                intervals = self.parse_frame_patterns(
-                    insights["framePatterns"], intervals
-                )
-            if "brands" in insights:
-                intervals = self.parse_brands(insights["brands"], intervals)
-            return intervals
+            yield from self.materialize(self.compact_video(video, show_name))
+
+    def iter_stream_documents(self, show_name, video_events):
+        """
+        This method yields the intervals of every video from the events of a
+        VIJsonReader, each insight item is parsed as soon as it is read so the
+        memory used does not depend on the size of the file.
+        The instances are kept in a CompactVideo until the end of the video,
+        as the duration and the fields of the video can come after the insights
+        :param show_name:
+        :param video_events: VIJsonReader.videos(parser.specs_by_insight)
+        :return: generator of intervals
+        """
+        for event, key, value in video_events:
+            if event == "insight_item":
+                for spec in self.specs_by_insight.get(key, ()):
+                    compact.add(spec, (value,))
+            elif event == "video_start":
+                compact = CompactVideo(show_name)
+            elif event == "video":
+                compact.video[key] = value
+            elif event == "insight":
+                compact.video["insights"][key] = value
+            elif event == "video_end":
+                yield from self.materialize(compact)
+
+    def compact_video(self, video, show_name):
+        """
+        This method parses the insights of one video into a CompactVideo
+        :param video: an item of vi_json["videos"]
+        :param show_name:
+        :return: CompactVideo
+        """
+        compact = CompactVideo(show_name, video)
+        insights = video["insights"]
+        for spec in self.insight_specs:
+            if spec.insight in insights:
+                compact.add(spec, insights[spec.insight])
+        return compact
+
+    def materialize(self, compact, intervals=None):
+        """
+        This method yields the intervals of a CompactVideo one at a time,
+        building the object of an instance once for all the intervals it
+        occurred in (the instances of an item of a coalesced insight are
+        merged per interval instead)
+        :param compact: CompactVideo
+        :param intervals: intervals the instances are added to, kept in the
+        dictionary; created from compact.video and released once yielded
+        when None
+        :return: generator of intervals
+        """
+        release = intervals is None
+        skeleton = (
+            self.create_intervals(compact.video, compact.show_name)
+            if release
+            else intervals
+        )
+        # remaining: number of intervals of each instance not materialized yet
+        buckets, remaining = bucket_instances(
+            self.bucketing, compact, skeleton, self.time_parser
+        )
+        coalesced = {
+            i
+            for i, spec in enumerate(compact.specs)
+            if spec.insight in self.coalesced_insights
+        }
+        objects = dict()
+        for key in list(skeleton):
+            interval = skeleton.pop(key) if release else skeleton[key]
+            rows = buckets.pop(key)
+            if coalesced:
+                rows = compact.coalesce_rows(rows, coalesced)
+            for row in rows:
+                if row.__class__ is list:
+                    group, item_object = compact.coalesced_object(row)
+                    if group in interval:
+                        interval[group].append(item_object)
+                    else:
+                        interval[group] = [item_object]
+                    continue
+                group_object = objects.get(row)
+                if group_object is None:
+                    group_object = objects[row] = compact.item_object(row)
+                group, item_object = group_object
+                if group in interval:
+                    interval[group].append(item_object)
+                else:
+                    interval[group] = [item_object]
+                remaining[row] -= 1
+                if not remaining[row]:
+                    del objects[row]
+            yield interval
+
+    def parse_video(self, video, show_name):
+        """
+        This method distributes the insights of one video to its intervals
+        :param video: an item of vi_json["videos"]
+        :param show_name:
+        :return: dictionary of intervals
+        """
+        intervals = self.create_intervals(video, show_name)
+        return self.fill_intervals(self.compact_video(video, show_name), intervals)
+
+    def fill_intervals(self, compact, intervals):
+        """
+        This method adds the instances of a CompactVideo to intervals
+        (see materialize)
+        :param compact: CompactVideo
+        :param intervals: dictionary of intervals
+        :return: intervals
+        """
+        for _ in self.materialize(compact, intervals):
+            pass
+        return intervals
 
     def create_intervals(self, video, show_name):
         """
         This method creates a dictionary of intervals
+        with several interval sizes, it creates the intervals of every size,
+        keyed by (size, start), their ids are qualified by the size
+        (e.g. "<video id>-60s-2") and they have an intervalMilliseconds field
         :param video:
         :param show_name:
         :return:
@@ -83,28 +236,37 @@ class Parser:
         duration_in_milliseconds = int(
             self.time_parser.string_time_to_milliseconds(video["insights"]["duration"])
         )
-        for i in range(0, duration_in_milliseconds):
-            if i % self.time_parser.interval_in_milliseconds == 0:
-                start_time = self.time_parser.seconds_to_time_string(i / 1000)
-                end_time = (
-                    self.time_parser.seconds_to_time_string(duration_in_milliseconds)
-                    if i + self.time_parser.interval_in_milliseconds
-                    >= duration_in_milliseconds
-                    else self.time_parser.seconds_to_time_string(
-                        (i + self.time_parser.interval_in_milliseconds) / 1000
-                    )
-                )
-                dictionary_of_intervals[i] = {
-                    "id": video_id
-                    + "-"
-                    + str(int(i / self.time_parser.interval_in_milliseconds)),
+        to_time_string = self.time_parser.seconds_to_time_string
+        last_end_time = to_time_string(duration_in_milliseconds)
+        multi_resolution = self.time_parser.is_multi_resolution
+        intervals = (
+            self.time_parser.intervals_in_milliseconds
+            if multi_resolution
+            else [self.time_parser.interval_in_milliseconds]
+        )
+        for interval in intervals:
+            id_prefix = video_id + "-"
+            if multi_resolution:
+                id_prefix += self.time_parser.resolution_label(interval) + "-"
+            for i in range(0, duration_in_milliseconds, interval):
+                document = {
+                    "id": id_prefix + str(i // interval),
                     "accountId": account_id,
                     "externalId": external_id,
                     "name": show_name,
                     "metaData": meta_data,
-                    "startTime": start_time,
-                    "endTime": end_time,
+                    "startTime": to_time_string(i / 1000),
+                    "endTime": (
+                        last_end_time
+                        if i + interval >= duration_in_milliseconds
+                        else to_time_string((i + interval) / 1000)
+                    ),
                 }
+                if multi_resolution:
+                    document["intervalMilliseconds"] = interval
+                    dictionary_of_intervals[interval, i] = document
+                else:
+                    dictionary_of_intervals[i] = document
         return dictionary_of_intervals
 
     @staticmethod
@@ -125,81 +287,50 @@ class Parser:
                 intervals[i][item_tuple[0]] = [item_tuple[1]]
         return intervals
 
+    def parse_insight_spec(self, spec, items, intervals):
+        """
+        This method adds the accepted items of an insight to every interval
+        their instances occurred in
+        :param spec: InsightSpec of the insight
+        :param items: the list of the insight e.g. video["insights"]["faces"]
+        :param intervals:
+        :return: intervals
+        """
+        compact = CompactVideo(None)
+        compact.add(spec, items)
+        return self.fill_intervals(compact, intervals)
+
+    def parse_insight(self, insight, items, intervals):
+        """
+        this method parses an insight (e.g. "faces") with all of its specs
+        :param insight: key of the insight under video["insights"]
+        :param items: the list of the insight
+        :param intervals:
+        :return: intervals
+        """
+        for spec in self.specs_by_insight.get(insight, ()):
+            intervals = self.parse_insight_spec(spec, items, intervals)
+        return intervals
+
     def parse_transcript(self, transcripts, intervals):
         """
-        this  method parses transcript and add
-         data to dictionary of intervals
+        this  method parses transcript and add related
+        data to dictionary of intervals
         :param transcripts:
         :param intervals:
         :return:
         """
-        for transcript in transcripts:
-            if transcript["text"] != "" and transcript["confidence"] > 0.5:
-                for instance in transcript["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-
-                    assets = {
-                        "id": transcript["id"],
-                        "speakerId": transcript["speakerId"],
-                        "language": transcript["language"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    transcript_object = {
-                        "transcript": transcript["text"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("transcripts", transcript_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("transcript", transcripts, intervals)
 
     def parse_ocr(self, ocrs, intervals):
         """
-        this  method parses ocrs and add related data
-        to dictionary of intervals
+        this  method parses ocrs and add related
+        data to dictionary of intervals
         :param ocrs:
         :param intervals:
         :return:
         """
-        for ocr in ocrs:
-            if ocr["text"] != "" and ocr["confidence"] > 0.5:
-                for instance in ocr["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": ocr["id"],
-                        "left": ocr["left"],
-                        "top": ocr["top"],
-                        "width": ocr["width"],
-                        "height": ocr["height"],
-                        "language": ocr["language"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    ocr_object = {
-                        "ocr": ocr["text"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("ocrs", ocr_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("ocr", ocrs, intervals)
 
     def parse_keywords(self, keywords, intervals):
         """
@@ -209,33 +340,7 @@ class Parser:
         :param intervals:
         :return:
         """
-        for keyword in keywords:
-            if keyword["text"] != "" and keyword["confidence"] > 0.5:
-                for instance in keyword["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": keyword["id"],
-                        "language": keyword["language"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    ocr_object = {
-                        "keyword": keyword["text"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("keywords", ocr_object)
-
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("keywords", keywords, intervals)
 
     def parse_topics(self, topics, intervals):
         """
@@ -245,130 +350,17 @@ class Parser:
         :param intervals:
         :return:
         """
-        for topic in topics:
-            if topic["name"] != "" and topic["confidence"] > 0.5:
-                for instance in topic["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": topic["id"],
-                        "referenceId": topic["referenceId"]
-                        if "referenceId" in topic
-                        else "",
-                        "referenceType": topic["referenceType"]
-                        if "referenceType" in topic
-                        else "",
-                        "iptcName": topic["iptcName"] if "iptcName" in topic else "",
-                        "iabName": topic["iabName"] if "iabName" in topic else "",
-                        "language": topic["language"] if "language" in topic else "",
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    ocr_object = {
-                        "topic": topic["name"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("topics", ocr_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("topics", topics, intervals)
 
     def parse_faces(self, faces, intervals):
         """
-        this  method parses faces and add related
+        this  method parses faces and their thumbnails and add related
         data to dictionary of intervals
-        it extracts faces from insights and thumbnails
         :param faces:
         :param intervals:
         :return:
         """
-        for face in faces:
-            if face["name"] != "" and face["confidence"] > 0.5:
-                for instance in face["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": face["id"],
-                        "description": face["description"]
-                        if "description" in face
-                        else "",
-                        "thumbnailId": face["thumbnailId"]
-                        if "thumbnailId" in face
-                        else "",
-                        "knownPersonId": face["knownPersonId"]
-                        if "knownPersonId" in face
-                        else "",
-                        "title": face["title"] if "title" in face else "",
-                        "imageUrl": face["imageUrl"] if "imageUrl" in face else "",
-                        "thumbnailsIds": instance["thumbnailsIds"]
-                        if "thumbnailsIds" in instance
-                        else "",
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    face_object = {
-                        "face": face["name"],
-                        "assets": json.dumps(assets),
-                    }
-                    tuples = ("faces", face_object)
-
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-                if "thumbnails" in face:
-                    for thumbnail in face["thumbnails"]:
-                        thumbnail_url = thumbnail["fileName"]
-                        for instance in thumbnail["instances"]:
-                            start = self.time_parser.string_time_to_milliseconds(
-                                instance["start"]
-                            )
-                            end = self.time_parser.string_time_to_milliseconds(
-                                instance["end"]
-                            )
-                            occurred_intervals = self.time_parser.get_related_intervals(
-                                start, end
-                            )
-                            assets = {
-                                "id": face["id"],
-                                "description": face["description"]
-                                if "description" in face
-                                else "",
-                                "thumbnailId": face["thumbnailId"]
-                                if "thumbnailId" in face
-                                else "",
-                                "knownPersonId": face["knownPersonId"]
-                                if "knownPersonId" in face
-                                else "",
-                                "title": face["title"] if "title" in face else "",
-                                "imageUrl": face["imageUrl"]
-                                if "imageUrl" in face
-                                else "",
-                                "thumbnailsIds": thumbnail["id"],
-                                "start": instance["start"],
-                                "end": instance["end"],
-                            }
-                            thumbnail_object = {
-                                "thumbnail": thumbnail_url,
-                                "assets": json.dumps(assets),
-                            }
-                            tuples = ("thumbnails", thumbnail_object)
-                            intervals = self.insert_items_to_intervals(
-                                occurred_intervals, tuples, intervals
-                            )
-
-        return intervals
+        return self.parse_insight("faces", faces, intervals)
 
     def parse_labels(self, labels, intervals):
         """
@@ -378,313 +370,77 @@ class Parser:
         :param intervals:
         :return:
         """
-        for label in labels:
-            if label["name"] != "":
-                for instance in label["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": label["id"],
-                        "referenceId": label["referenceId"]
-                        if "referenceId" in label
-                        else "",
-                        "language": label["language"] if "language" in label else "",
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    label_object = {
-                        "label": label["name"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("labels", label_object)
-
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("labels", labels, intervals)
 
     def parse_named_locations(self, named_locations, intervals):
         """
-        this  method parses namedLocations and add
-        related data to dictionary of intervals
+        this  method parses namedLocations and add related
+        data to dictionary of intervals
         :param named_locations:
         :param intervals:
         :return:
         """
-        for namedLocation in named_locations:
-            if namedLocation["name"] != "" and namedLocation["confidence"] > 0.5:
-                for instance in namedLocation["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": namedLocation["id"],
-                        "referenceId": namedLocation["referenceId"]
-                        if "referenceId" in namedLocation
-                        else "",
-                        "referenceUrl": namedLocation["referenceUrl"]
-                        if "referenceUrl" in namedLocation
-                        else "",
-                        "description": namedLocation["description"]
-                        if "description" in namedLocation
-                        else "",
-                        "confidence": namedLocation["confidence"]
-                        if "confidence" in namedLocation
-                        else "",
-                        "instanceSource": instance["instanceSource"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    label_object = {
-                        "namedLocation": namedLocation["name"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("namedLocations", label_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("namedLocations", named_locations, intervals)
 
     def parse_named_people(self, named_people, intervals):
         """
-        this  method parses namedPeople and add
-        related data to dictionary of intervals
+        this  method parses namedPeople and add related
+        data to dictionary of intervals
         :param named_people:
         :param intervals:
         :return:
         """
-        for name in named_people:
-            if name["name"] != "" and name["confidence"] > 0.5:
-                for instance in name["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": name["id"],
-                        "referenceId": name["referenceId"]
-                        if "referenceId" in name
-                        else "",
-                        "referenceUrl": name["referenceUrl"]
-                        if "referenceUrl" in name
-                        else "",
-                        "description": name["description"]
-                        if "description" in name
-                        else "",
-                        "confidence": name["confidence"]
-                        if "confidence" in name
-                        else "",
-                        "instanceSource": instance["instanceSource"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    label_object = {
-                        "namedPerson": name["name"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("namedPeople", label_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("namedPeople", named_people, intervals)
 
     def parse_audio_effects(self, audio_effects, intervals):
         """
-        this  method parses audioEffects and add
-        related data to dictionary of intervals
+        this  method parses audioEffects and add related
+        data to dictionary of intervals
         :param audio_effects:
         :param intervals:
         :return:
         """
-        for audioEffect in audio_effects:
-            if audioEffect["type"] != "":
-                for instance in audioEffect["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": audioEffect["id"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    label_object = {
-                        "audioEffect": audioEffect["type"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("audioEffects", label_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("audioEffects", audio_effects, intervals)
 
     def parse_sentiments(self, sentiments, intervals):
         """
-        this  method parses sentiments and add
-        related data to dictionary of intervals
+        this  method parses sentiments and add related
+        data to dictionary of intervals
         :param sentiments:
         :param intervals:
         :return:
         """
-        for sentiment in sentiments:
-            if sentiment["sentimentType"] != "" and sentiment["averageScore"] > 0.5:
-                for instance in sentiment["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": sentiment["id"],
-                        "averageScore": sentiment["averageScore"]
-                        if "averageScore" in sentiment
-                        else "",
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    label_object = {
-                        "sentimentType": sentiment["sentimentType"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("sentiments", label_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("sentiments", sentiments, intervals)
 
     def parse_emotions(self, emotions, intervals):
         """
-        this  method parses emotions and add
-        related data to dictionary of intervals
+        this  method parses emotions and add related
+        data to dictionary of intervals
         :param emotions:
         :param intervals:
         :return:
         """
-        for emotion in emotions:
-            if emotion["type"] != "":
-                for instance in emotion["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": emotion["id"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    label_object = {
-                        "emotion": emotion["type"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("emotions", label_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("emotions", emotions, intervals)
 
     def parse_visual_content_moderation(self, visual_contents, intervals):
         """
-        this  method parses visual_contents and
-        add related data to dictionary of intervals
+        this  method parses adult and racy scores of visual_contents and add related
+        data to dictionary of intervals
         :param visual_contents:
         :param intervals:
         :return:
         """
-        for content in visual_contents:
-            for instance in content["instances"]:
-                start = self.time_parser.string_time_to_milliseconds(instance["start"])
-                end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                occurred_intervals = self.time_parser.get_related_intervals(start, end)
-                assets = {
-                    "id": content["id"],
-                    "start": instance["start"],
-                    "end": instance["end"],
-                }
-                label_object = {
-                    "adultScore": str(content["adultScore"]),
-                    "assets": json.dumps(assets),
-                }
-
-                tuples = ("adultScores", label_object)
-                intervals = self.insert_items_to_intervals(
-                    occurred_intervals, tuples, intervals
-                )
-            for instance in content["instances"]:
-                start = self.time_parser.string_time_to_milliseconds(instance["start"])
-                end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                occurred_intervals = self.time_parser.get_related_intervals(start, end)
-                assets = {
-                    "id": content["id"],
-                    "start": instance["start"],
-                    "end": instance["end"],
-                }
-                label_object = {
-                    "racyScore": str(content["racyScore"]),
-                    "assets": json.dumps(assets),
-                }
-
-                tuples = ("racyScores", label_object)
-                intervals = self.insert_items_to_intervals(
-                    occurred_intervals, tuples, intervals
-                )
-        return intervals
+        return self.parse_insight("visualContentModeration", visual_contents, intervals)
 
     def parse_frame_patterns(self, frame_patterns, intervals):
         """
-        this  method parses framePatterns and add
-        related data to dictionary of intervals
+        this  method parses framePatterns and add related
+        data to dictionary of intervals
         :param frame_patterns:
         :param intervals:
         :return:
         """
-        for pattern in frame_patterns:
-            if pattern["confidence"] > 0.5:
-                for instance in pattern["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": pattern["id"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    frame_patterns_object = {"assets": json.dumps(assets)}
-
-                    tuples = ("framePatterns", frame_patterns_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("framePatterns", frame_patterns, intervals)
 
     def parse_brands(self, brands, intervals):
         """
@@ -694,36 +450,7 @@ class Parser:
         :param intervals:
         :return:
         """
-        for brand in brands:
-            if brand["name"] != "" and brand["confidence"] > 0.5:
-                for instance in brand["instances"]:
-                    start = self.time_parser.string_time_to_milliseconds(
-                        instance["start"]
-                    )
-                    end = self.time_parser.string_time_to_milliseconds(instance["end"])
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
-                    assets = {
-                        "id": brand["id"],
-                        "confidence": brand["confidence"],
-                        "referenceId": brand["referenceId"],
-                        "referenceType": brand["referenceType"],
-                        "description": brand["description"],
-                        "brandType": instance["brandType"],
-                        "start": instance["start"],
-                        "end": instance["end"],
-                    }
-                    frame_patterns_object = {
-                        "brand": brand["name"],
-                        "assets": json.dumps(assets),
-                    }
-
-                    tuples = ("brands", frame_patterns_object)
-                    intervals = self.insert_items_to_intervals(
-                        occurred_intervals, tuples, intervals
-                    )
-        return intervals
+        return self.parse_insight("brands", brands, intervals)
 
     def parse_custom_model(self, custom_model_json, intervals, model_property):
         for item in custom_model_json:
@@ -740,9 +467,7 @@ class Parser:
                         end = self.time_parser.string_time_to_milliseconds(
                             item["thumbnailMetadata"]["starttime"]
                         )
-                    occurred_intervals = self.time_parser.get_related_intervals(
-                        start, end
-                    )
+                    occurred_intervals = self.related_intervals(start, end)
                     assets = item["thumbnailMetadata"]
                     assets["probability"] = prediction["probability"]
                     custom_item_object = {
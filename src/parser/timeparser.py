@@ -3,31 +3,72 @@ __email__ = "mamokari@microsoft.com"
 __license__ = "MIT"
 __version__ = "February 2022"
 
-import time
+from functools import lru_cache
 from os.path import isfile
 from os import getenv
 
-from datetime import datetime
-import re
-
 from utils.util import Util
 
 
+class TimeFormatError(ValueError):
+    """
+    Raised when a time string is not in %H:%M:%S or %H:%M:%S.%f format
+    """
+
+
+def _is_digits(text, max_length=None):
+    """
+    checks that text is a non-empty run of ASCII digits, at most max_length long
+    """
+    return (
+        text.isascii()
+        and text.isdigit()
+        and (max_length is None or len(text) <= max_length)
+    )
+
+
 class TimeParser:
-    def __init__(self):
+    def __init__(self, intervals_in_milliseconds=None):
         """
         This is a constructor for the Time parser.
         It initiates a TimeParser with desired intervals
         e.g. interval_in__milliseconds=10000 creates intervals of 10 seconds in that video
+        several interval sizes (parser.milliseconds-intervals, e.g. [10000, 60000])
+        create the intervals of every size in the same parse
+        :param intervals_in_milliseconds: list of interval sizes, read from the
+        config or the environment when None
         """
+        if intervals_in_milliseconds is None:
+            intervals_in_milliseconds = self.read_intervals_in_milliseconds()
+        self.intervals_in_milliseconds = [int(i) for i in intervals_in_milliseconds]
+
+    @staticmethod
+    def read_intervals_in_milliseconds():
+        if isfile("config/config.yml"):
+            config = Util().config["parser"]
+            if config.get("milliseconds-intervals"):
+                return config["milliseconds-intervals"]
+            return [config["milliseconds-interval"]]
+        if getenv("MILLISECONDS_INTERVALS"):
+            return getenv("MILLISECONDS_INTERVALS").split(",")
+        return [getenv("MILLISECONDS_INTERVAL")]
+
+    @property
+    def interval_in_milliseconds(self):
+        """
+        the first interval size, the one the single resolution parse uses
+        """
+        return self.intervals_in_milliseconds[0]
+
+    @interval_in_milliseconds.setter
+    def interval_in_milliseconds(self, interval):
+        self.intervals_in_milliseconds[0] = int(interval)
 
-        self.interval_in_milliseconds = int(
-            Util().config["parser"]["milliseconds-interval"]
-            if isfile("config/config.yml")
-            else getenv("MILLISECONDS_INTERVAL")
-        )
+    @property
+    def is_multi_resolution(self):
+        return len(self.intervals_in_milliseconds) > 1
 
-    def get_related_intervals(self, start, end):
+    def get_related_intervals(self, start, end, interval=None):
         """
         This method returns a list of intervals based on start  and end time passed
         e.g.
@@ -40,44 +81,81 @@ class TimeParser:
         30 to 40 seconds
         :param start: start time in milliseconds
         :param end: end time in milliseconds
+        :param interval: size of the intervals, interval_in_milliseconds by default
         :return: list of intervals based on start  and end time passed
         """
+        interval = interval or self.interval_in_milliseconds
         intervals = []
-        if (
-            end - start < self.interval_in_milliseconds
-        ):  # CASE: when appearance is within time interval
-            intervals.append(int(start) - int(start) % self.interval_in_milliseconds)
-        for i in range(int(start), int(end)):
-            if i % self.interval_in_milliseconds == 0:
-                intervals.append(i)
+        if end - start < interval:  # CASE: when appearance is within time interval
+            intervals.append(int(start) - int(start) % interval)
+        # every multiple of the interval in [start, end), computed arithmetically
+        # instead of visiting each millisecond of the appearance
+        first_interval = -(-int(start) // interval) * interval
+        intervals.extend(range(first_interval, int(end), interval))
         return intervals
 
+    def get_multi_resolution_intervals(self, start, end):
+        """
+        This method returns the intervals of every size the appearance occurred in
+        :param start: start time in milliseconds
+        :param end: end time in milliseconds
+        :return: list of (interval size, interval) e.g. [(10000, 0), (60000, 0)]
+        """
+        return [
+            (interval, i)
+            for interval in self.intervals_in_milliseconds
+            for i in self.get_related_intervals(start, end, interval)
+        ]
+
     @staticmethod
+    def resolution_label(interval):
+        """
+        This method returns the label of an interval size used in the
+        document ids, e.g. "10s" for 10000 and "1500ms" for 1500
+        """
+        if interval % 1000 == 0:
+            return "{}s".format(interval // 1000)
+        return "{}ms".format(interval)
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
     def string_time_to_milliseconds(string_time):
         """
         This method converts string time to milliseconds
-        it uses regex to handle both of the following  cases formats:
+        it handles both of the following formats:
         - %H:%M:%S
-        - %H:%M:%S.%f
+        - %H:%M:%S.%f (any number of fractional digits, e.g. the 7 digits VI emits)
+        the same timestamps repeat across insights, so results are cached
         :param string_time:
         :return: passed time converted to milliseconds
         """
-        if re.search("^([0-1]?[0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]$", string_time):
-            date_time = datetime.strptime(string_time, "%H:%M:%S")
-        elif re.search("^([0-1]?[0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]\.\d", string_time):
-            date_time = datetime.strptime(string_time, "%H:%M:%S.%f")
-        else:
-            raise ("time format  error")
-        date_time = date_time - datetime(1900, 1, 1)
-        milliseconds = date_time.total_seconds() * 1000
-        return milliseconds
+        hours, _, rest = string_time.partition(":")
+        minutes, _, seconds = rest.partition(":")
+        seconds, separator, fraction = seconds.partition(".")
+        if not (
+            _is_digits(hours, 2)
+            and len(minutes) == 2
+            and _is_digits(minutes)
+            and len(seconds) == 2
+            and _is_digits(seconds)
+            and (not separator or _is_digits(fraction))
+        ):
+            raise TimeFormatError("time format error: '{}'".format(string_time))
+        hours, minutes, seconds = int(hours), int(minutes), int(seconds)
+        if hours > 23 or minutes > 59 or seconds > 59:
+            raise TimeFormatError("time format error: '{}'".format(string_time))
+        microseconds = int(fraction[:6].ljust(6, "0")) if separator else 0
+        return (hours * 3600 + minutes * 60 + seconds) * 1000 + microseconds / 1000
 
     @staticmethod
+    @lru_cache(maxsize=65536)
     def seconds_to_time_string(seconds):
         """
         This method converts seconds to %H:%M:%S format
+        (same result as time.strftime("%H:%M:%S", time.gmtime(seconds)))
+        the result is cached as every video repeats the same interval boundaries
         :param seconds:
         :return:
         """
-
-        return str(time.strftime("%H:%M:%S", time.gmtime(seconds)))
+        seconds = int(seconds) % 86400
+        return "%02d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
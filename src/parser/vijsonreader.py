@@ -0,0 +1,285 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_TAIL = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+_DECODER = json.JSONDecoder()
+
+
+def _read_chunks(stream, chunk_size):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _missing_fields(header, required):
+    fields = list(required)
+    if "state" in required and header.get("state") == "Processed":
+        fields.append("name")
+    return [field for field in fields if field not in header]
+
+
+def _video_events(videos, wanted):
+    """
+    yields the events of VIJsonReader.videos for decoded videos
+    """
+    for index, video in enumerate(videos):
+        yield "video_start", index, None
+        for key, value in video.items():
+            if key != "insights":
+                yield "video", key, value
+                continue
+            for name, insight in value.items():
+                needed = wanted is None or name in wanted
+                if isinstance(insight, list) and needed:
+                    for item in insight:
+                        yield "insight_item", name, item
+                elif needed or name == "duration":
+                    yield "insight", name, insight
+        yield "video_end", index, None
+
+
+class VIJsonReader:
+    """
+    This class reads a JSON file created by VI incrementally, so that files
+    of hundreds of MB can be parsed without loading them in memory.
+    read_header returns the top level fields written before "videos" (the
+    whole file is decoded when a required field is written after them),
+    then videos yields events for every video:
+    - ("video_start", index, None)
+    - ("video", key, value) for the fields of the video
+    - ("insight", name, value) for the insights which are not lists e.g. duration
+    - ("insight_item", name, item) for every item of the list insights e.g. faces
+    - ("video_end", index, None)
+    Only one item is decoded at a time, the values which are not needed
+    (e.g. summarizedInsights) are skipped without being decoded.
+    """
+
+    def __init__(self, source, chunk_size=65536):
+        """
+        :param source: a file object (text or binary) or an iterable of chunks
+        (str or bytes) e.g. the chunks of a blob download
+        :param chunk_size: size of the reads when source is a file object
+        """
+        self._chunks = iter(
+            _read_chunks(source, chunk_size) if hasattr(source, "read") else source
+        )
+        # utf-8-sig drops the BOM VI files may start with
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._eof = False
+        self._keys = None
+        self._at_videos = False
+        self._decoded_videos = None
+
+    def read_header(self, required=("state",)):
+        """
+        reads the top level fields until "videos",
+        fields which are objects or arrays are skipped.
+        JSON objects are unordered: when a required field is not found
+        before "videos", the videos are decoded to read the fields after them
+        :param required: fields the file must have, and the name of the
+        processed files when state is required
+        :return: dictionary of the top level fields e.g. name, state
+        """
+        self._keys = self._iter_object()
+        header = dict()
+        for key in self._keys:
+            if key == "videos":
+                if not _missing_fields(header, required):
+                    self._at_videos = True
+                    return header
+                self._decoded_videos = self._read_value()
+            elif self._peek() in ("{", "["):
+                self._skip_value()
+            else:
+                header[key] = self._read_value()
+        missing = _missing_fields(header, required)
+        if missing:
+            raise ValueError("invalid VI JSON, missing {}".format(", ".join(missing)))
+        return header
+
+    def videos(self, insights=None):
+        """
+        yields the events of every video of the file
+        :param insights: names of the insights to read, the others are skipped
+        (duration is always read); None reads every insight
+        :return: generator of (event, key, value)
+        """
+        if self._keys is None:
+            self.read_header(required=())
+        if self._decoded_videos is not None:
+            yield from _video_events(self._decoded_videos, insights)
+            return
+        if not self._at_videos:
+            return
+        self._at_videos = False
+        for index in self._iter_array():
+            yield "video_start", index, None
+            for key in self._iter_object():
+                if key == "insights":
+                    yield from self._insights(insights)
+                else:
+                    yield "video", key, self._read_value()
+            yield "video_end", index, None
+        for _ in self._keys:
+            self._skip_value()
+
+    def _insights(self, wanted):
+        for name in self._iter_object():
+            needed = wanted is None or name in wanted
+            if self._peek() == "[" and needed:
+                for _ in self._iter_array():
+                    yield "insight_item", name, self._read_value()
+            elif needed or name == "duration":
+                yield "insight", name, self._read_value()
+            else:
+                self._skip_value()
+
+    def _iter_object(self):
+        """
+        yields the keys of an object, the caller reads or skips each value
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._read_value()
+            self._expect(":")
+            yield key
+            if self._next_separator("}"):
+                return
+
+    def _iter_array(self):
+        """
+        yields the indexes of an array, the caller reads or skips each value
+        """
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            if self._next_separator("]"):
+                return
+            index += 1
+
+    def _next_separator(self, closing):
+        char = self._peek()
+        self._pos += 1
+        if char == closing:
+            return True
+        if char != ",":
+            raise ValueError("invalid JSON, unexpected '{}'".format(char))
+        return False
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(
+                "invalid JSON, expected '{}' but found '{}'".format(char, found)
+            )
+        self._pos += 1
+
+    def _peek(self):
+        """
+        skips whitespaces and returns the next character ("" at the end)
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _read_value(self):
+        """
+        decodes the next value, reading more chunks until it is complete
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill(grow=True)
+
+    def _skip_value(self):
+        """
+        moves after the next value without decoding it
+        """
+        if self._peek() not in ("{", "["):
+            self._read_value()
+            return
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                if not self._fill():
+                    raise ValueError("invalid JSON, unexpected end of file")
+                continue
+            char = match.group()
+            if char == '"':
+                tail = _STRING_TAIL.match(self._buffer, match.end())
+                if tail is None:
+                    # the string continues in the next chunk
+                    self._pos = match.start()
+                    if not self._fill():
+                        raise ValueError("invalid JSON, unterminated string")
+                    continue
+                self._pos = tail.end()
+            elif char in "{[":
+                self._pos = match.end()
+                depth += 1
+            else:
+                self._pos = match.end()
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _fill(self, grow=False):
+        """
+        appends the next chunk(s) to the buffer, dropping what was consumed
+        :param grow: read until the buffer doubles, so that retrying to decode
+        a value spanning many chunks stays linear
+        :return: False when there is nothing left to read
+        """
+        if self._pos:
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
+        target = 2 * len(self._buffer) if grow else len(self._buffer) + 1
+        appended = False
+        for chunk in self._chunks:
+            text = chunk if isinstance(chunk, str) else self._decoder.decode(chunk)
+            if not self._started and text:
+                self._started = True
+                text = text.lstrip("\ufeff")
+            self._buffer += text
+            appended = appended or bool(text)
+            if len(self._buffer) >= target:
+                return True
+        if not self._eof:
+            self._eof = True
+            tail = self._decoder.decode(b"", final=True)
+            self._buffer += tail
+            appended = appended or bool(tail)
+        return appended
@@ -0,0 +1,18 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import os
+import sys
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the modules under src import each other from the top level (e.g. utils.util),
+# so src goes first on the path, ahead of tests/utils.py
+for path in [ROOT_DIRECTORY, os.path.join(ROOT_DIRECTORY, "src")]:
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+
+os.environ.setdefault("MILLISECONDS_INTERVAL", "10000")
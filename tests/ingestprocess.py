@@ -0,0 +1,71 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+# Runs SearchClient.upload_files_from_storage_to_search in its own process
+# against local stand-ins: the VI files of a directory as the container
+# and a StubSearchServer as the search service, so a test can kill it.
+# arguments (with src in PYTHONPATH): SEARCH_URL DIRECTORY [--resume]
+
+import os
+import sys
+from types import SimpleNamespace
+
+from client.searchClient import SearchClient
+
+PAGE_SIZE = 3
+
+
+class DirectoryPages:
+    """
+    the pages of a blob listing (ItemPaged.by_page), the continuation token
+    being the index of the next blob
+    """
+
+    def __init__(self, blobs, continuation_token):
+        self.blobs = blobs
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        start = int(self.continuation_token or 0)
+        while start < len(self.blobs):
+            page = self.blobs[start : start + PAGE_SIZE]
+            start += PAGE_SIZE
+            self.continuation_token = str(start) if start < len(self.blobs) else None
+            yield page
+
+
+class DirectoryStorageClient:
+    """
+    stand-in of StorageClient listing and reading the files of a directory
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.cache = None
+
+    def list_files_in_container(self, container, name_starts_with=None):
+        blobs = [
+            SimpleNamespace(name=name, etag=str(os.stat(self.path(name)).st_mtime_ns))
+            for name in sorted(os.listdir(self.directory))
+        ]
+        return SimpleNamespace(
+            by_page=lambda continuation_token=None: DirectoryPages(
+                blobs, continuation_token
+            )
+        )
+
+    def get_blob_chunks(self, container, blob, etag=None):
+        with open(self.path(blob), "rb") as f:
+            return [f.read()]
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+
+if __name__ == "__main__":
+    CLIENT = SearchClient(resume="--resume" in sys.argv)
+    CLIENT.endpoint = sys.argv[1]
+    CLIENT.storage_client = DirectoryStorageClient(sys.argv[2])
+    CLIENT.upload_files_from_storage_to_search()
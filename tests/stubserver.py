@@ -0,0 +1,166 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import gzip
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubSearchServer:
+    """
+    A local stand-in for the docs/index endpoint of Azure Search.
+    It records the (decompressed) body of every request and the client
+    port it came from, and answers with a 200 status
+    for every document, unless a response is queued with respond().
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                with stub.lock:
+                    stub.requests.append(
+                        {
+                            "path": self.path,
+                            "headers": dict(self.headers),
+                            "body": body,
+                            "port": self.client_address[1],
+                        }
+                    )
+                    queued = stub.responses.pop(0) if stub.responses else None
+                status, headers, payload = queued or stub.default_response(body)
+                content = json.dumps(payload).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @staticmethod
+    def default_response(body):
+        try:
+            documents = json.loads(body)["value"]
+        except (ValueError, KeyError, TypeError):
+            return 200, {}, {}
+        return (
+            200,
+            {},
+            {
+                "value": [
+                    {"key": d.get("id"), "status": True, "statusCode": 200}
+                    for d in documents
+                ]
+            },
+        )
+
+    def respond(self, status, payload, headers=None):
+        """
+        queues the response of the next request
+        """
+        self.responses.append((status, headers or {}, payload))
+
+    def documents(self):
+        """
+        returns the documents of every request received
+        """
+        return [d for r in self.requests for d in json.loads(r["body"])["value"]]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubBlobServer:
+    """
+    A local stand-in for the blob endpoint of Azure Storage serving the
+    ranged GETs of blob downloads and the HEAD of their properties.
+    It records the range of every GET.
+    Use connection_string with StorageClient.
+    """
+
+    def __init__(self, blobs):
+        """
+        :param blobs: dictionary of "container/blob" to its bytes
+        """
+        self.blobs = blobs
+        self.ranges = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                content = stub.blobs[self.path.split("?")[0].split("/", 2)[2]]
+                match = re.match(
+                    r"bytes=(\d+)-(\d*)", self.headers.get("x-ms-range", "")
+                )
+                start, end = 0, len(content) - 1
+                if match:
+                    start = int(match.group(1))
+                    end = min(end, int(match.group(2) or end))
+                with stub.lock:
+                    stub.ranges.append((start, end))
+                self.send_response(206 if match else 200)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header(
+                    "Content-Range", "bytes {}-{}/{}".format(start, end, len(content))
+                )
+                self.send_header("ETag", '"0x8D9"')
+                self.send_header("Last-Modified", "Mon, 07 Feb 2022 10:00:00 GMT")
+                self.send_header("x-ms-blob-type", "BlockBlob")
+                self.end_headers()
+                self.wfile.write(content[start : end + 1])
+
+            def do_HEAD(self):
+                content = stub.blobs[self.path.split("?")[0].split("/", 2)[2]]
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(content)))
+                self.send_header("ETag", '"0x8D9"')
+                self.send_header("Last-Modified", "Mon, 07 Feb 2022 10:00:00 GMT")
+                self.send_header("x-ms-blob-type", "BlockBlob")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.connection_string = (
+            "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+            "AccountKey=a2V5;BlobEndpoint=http://127.0.0.1:{}/devstoreaccount1"
+        ).format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
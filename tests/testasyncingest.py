@@ -0,0 +1,156 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import asyncio
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+from src.client.asyncingest import AsyncIngest, AsyncSearchUploader, AsyncStorageClient
+from src.client.blobcache import BlobCache
+from tests.stubserver import StubSearchServer
+from tests.testbase import TestBase
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+
+
+class InMemoryBlobs:
+    """
+    async stand-in for AsyncStorageClient, keeps track of the downloads in flight
+    """
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def list_files_in_container(self):
+        for name in sorted(self.blobs):
+            yield name
+
+    async def get_blob_bytes(self, name):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self.blobs[name]
+
+
+class TestAsyncIngest(TestBase):
+    """
+    This class contains unit tests for AsyncIngest class
+    """
+
+    with open(os.path.join(RESOURCES, "vi-output.json"), "rb") as f:
+        vi_output = f.read()
+
+    def ingest(self, storage, concurrency, responses=(), max_documents=100):
+        ingested, failed = [], []
+
+        async def run(url):
+            async with AsyncSearchUploader(url, {}, 4) as uploader:
+                ingest = AsyncIngest(
+                    storage,
+                    uploader,
+                    on_ingested=lambda name, fingerprints: ingested.append(name),
+                    on_failed=lambda name, ex: failed.append(name),
+                    concurrency=concurrency,
+                    parse_workers=1,
+                    max_documents=max_documents,
+                )
+                await ingest.run(storage.list_files_in_container())
+
+        with StubSearchServer() as server:
+            for response in responses:
+                server.respond(*response)
+            asyncio.run(run(server.url))
+        return server, sorted(ingested), failed
+
+    def test_run(self):
+        # GIVEN
+        storage = InMemoryBlobs(
+            {
+                "a.json": self.vi_output,
+                "b.json": b"{ not json",
+                "c.json": json.dumps({"state": "Processing"}).encode(),
+                "d.json": self.vi_output,
+            }
+        )
+        # WHEN
+        server, ingested, failed = self.ingest(storage, concurrency=4)
+        # THEN
+        self.assert_equals(ingested, ["a.json", "d.json"])
+        self.assert_equals(failed, ["b.json"])
+        self.assert_equals(len(server.requests), 4)
+        self.assert_equals(len(server.documents()), 2 * 156)
+
+    def test_concurrency(self):
+        # GIVEN
+        storage = InMemoryBlobs(
+            {
+                str(i): json.dumps(
+                    {"state": "Processed", "name": str(i), "videos": []}
+                ).encode()
+                for i in range(20)
+            }
+        )
+        # WHEN
+        server, ingested, failed = self.ingest(storage, concurrency=5)
+        # THEN
+        self.assert_equals(len(ingested), 20)
+        self.assert_equals(storage.max_in_flight, 5)
+
+    def test_failed_documents_are_retried(self):
+        # GIVEN
+        storage = InMemoryBlobs({"a.json": self.vi_output})
+        partial_failure = {
+            "value": [
+                {"key": "33a24ef09f-0", "status": True, "statusCode": 200},
+                {"key": "33a24ef09f-1", "status": False, "statusCode": 422},
+            ]
+        }
+        # WHEN
+        server, ingested, failed = self.ingest(
+            storage,
+            concurrency=1,
+            responses=[(207, partial_failure)],
+            max_documents=1000,
+        )
+        # THEN
+        self.assert_equals(ingested, ["a.json"])
+        self.assert_equals(len(server.requests), 2)
+        self.assert_equals(len(server.documents()), 156 + 1)
+
+    def test_storage_reads_through_cache(self):
+        # GIVEN
+        downloads = []
+
+        async def download_blob_bytes(name):
+            downloads.append(name)
+            return self.vi_output
+
+        async def list_blobs(name_starts_with=None):
+            for name in ["a.json", "a.json"]:
+                yield SimpleNamespace(name=name, etag="ETAG")
+
+        async def run(storage):
+            contents = []
+            async for blob in storage.list_files_in_container():
+                contents.append(await storage.get_blob_bytes(blob.name))
+            return contents
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = BlobCache(directory)
+            storage = AsyncStorageClient(cache=cache)
+            storage.container_name = "FOO"
+            storage.container_client = SimpleNamespace(list_blobs=list_blobs)
+            storage.download_blob_bytes = download_blob_bytes
+            # WHEN
+            contents = asyncio.run(run(storage))
+        # THEN
+        self.assert_equals(contents, [self.vi_output, self.vi_output])
+        self.assert_equals(downloads, ["a.json"])
+        self.assert_equals([cache.hits, cache.misses], [1, 1])
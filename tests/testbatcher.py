@@ -0,0 +1,153 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+
+import pytest
+import requests
+
+from src.client.batcher import DocumentBatcher
+from tests.stubserver import StubSearchServer
+from tests.testbase import TestBase
+
+
+class TestDocumentBatcher(TestBase):
+    """
+    This class contains unit tests for DocumentBatcher class
+    """
+
+    @staticmethod
+    def documents(count, text="FOO"):
+        return [
+            {"id": str(i), "transcripts": [{"transcript": text}]} for i in range(count)
+        ]
+
+    def test_batches_by_document_count(self):
+        # GIVEN
+        bodies = []
+        batcher = DocumentBatcher(bodies.append, max_documents=2)
+        # WHEN
+        for document in self.documents(5):
+            batcher.add(document)
+        batcher.flush()
+        # THEN
+        self.assert_equals(
+            [[d["id"] for d in json.loads(b)["value"]] for b in bodies],
+            [["0", "1"], ["2", "3"], ["4"]],
+        )
+
+    def test_batches_by_bytes(self):
+        # GIVEN
+        bodies = []
+        max_bytes = 200
+        batcher = DocumentBatcher(bodies.append, max_bytes=max_bytes)
+        # WHEN
+        for document in self.documents(10, "X" * 30):
+            batcher.add(document)
+        batcher.flush()
+        # THEN
+        self.assert_equals(all(len(b) <= max_bytes for b in bodies), True)
+        self.assert_equals(len(bodies) > 1, True)
+        self.assert_equals(
+            sum(len(json.loads(b)["value"]) for b in bodies), batcher.sent_documents
+        )
+        self.assert_equals(sum(len(b) for b in bodies), batcher.sent_bytes)
+
+    def test_oversized_document_is_sent_alone(self):
+        # GIVEN
+        bodies = []
+        batcher = DocumentBatcher(bodies.append, max_bytes=50)
+        # WHEN
+        for document in self.documents(2, "X" * 100):
+            batcher.add(document)
+        batcher.flush()
+        # THEN
+        self.assert_equals(len(bodies), 2)
+
+    def test_on_flushed_waits_for_the_batch(self):
+        # GIVEN
+        logged = []
+        batcher = DocumentBatcher(lambda body: None, max_documents=10)
+        batcher.add({"id": "0"})
+        # WHEN
+        batcher.on_flushed(lambda: logged.append("first.json"))
+        # THEN
+        self.assert_equals(logged, [])
+        batcher.flush()
+        self.assert_equals(logged, ["first.json"])
+
+    def test_on_sent_gets_the_tags_of_the_batch(self):
+        # GIVEN
+        sent = []
+        batcher = DocumentBatcher(
+            lambda body: None, max_documents=2, on_sent=sent.append
+        )
+        # WHEN
+        for document in self.documents(3):
+            batcher.add(document, document["id"])
+        batcher.flush()
+        # THEN
+        self.assert_equals(sent, [["0", "1"], ["2"]])
+
+    def test_failed_batch_is_not_reported(self):
+        # GIVEN
+        logged, sent = [], []
+
+        def send(body):
+            raise ValueError("FOO")
+
+        batcher = DocumentBatcher(send, on_sent=sent.append)
+        batcher.add({"id": "0"}, "0")
+        batcher.on_flushed(lambda: logged.append("first.json"))
+        # WHEN
+        with pytest.raises(ValueError):
+            batcher.flush()
+        batcher.flush()
+        # THEN
+        self.assert_equals(logged, [])
+        self.assert_equals(sent, [])
+
+    def test_on_failed_gets_the_tags_of_the_failed_batch(self):
+        # GIVEN
+        failed, sent, logged = [], [], []
+
+        def send(body):
+            if b'"id":"1"' in body:
+                raise ValueError("FOO")
+
+        batcher = DocumentBatcher(
+            send,
+            max_documents=2,
+            on_sent=sent.append,
+            on_failed=lambda tags, ex: failed.append(tags),
+        )
+        # WHEN
+        for document in self.documents(3):
+            batcher.add(document, document["id"])
+        batcher.on_flushed(lambda: logged.append("first.json"))
+        batcher.flush()
+        # THEN
+        self.assert_equals(failed, [["0", "1"]])
+        self.assert_equals(sent, [["2"]])
+        self.assert_equals(logged, ["first.json"])
+
+    def test_upload_to_stub_server(self):
+        # GIVEN
+        with StubSearchServer() as server:
+            batcher = DocumentBatcher(
+                lambda body: requests.post(
+                    server.url + "indexes/foo/docs/index", data=body
+                ),
+                max_documents=3,
+            )
+            # WHEN
+            for document in self.documents(7):
+                batcher.add(document)
+            batcher.flush()
+        # THEN
+        self.assert_equals(len(server.requests), 3)
+        self.assert_equals(
+            [d["id"] for d in server.documents()], [str(i) for i in range(7)]
+        )
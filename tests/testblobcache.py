@@ -0,0 +1,96 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from src.client.blobcache import BlobCache, zstandard
+from tests.testbase import TestBase
+
+
+class TestBlobCache(TestBase):
+    """
+    This class contains unit tests for BlobCache class
+    """
+
+    def test_read_through(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN
+            cache = BlobCache(directory, compression="gzip")
+            downloads = []
+
+            def download():
+                downloads.append(1)
+                return b'{"name": "FOO"}'
+
+            # WHEN
+            first = cache.read_through("FOO.json", '"0x1"', download)
+            second = cache.read_through("FOO.json", '"0x1"', download)
+            modified = cache.read_through("FOO.json", '"0x2"', download)
+            reopened = BlobCache(directory, compression="gzip")
+            # THEN
+            self.assert_equals([first, second, modified], [b'{"name": "FOO"}'] * 3)
+            self.assert_equals(len(downloads), 2)
+            self.assert_equals(
+                cache.stats(),
+                {
+                    "cacheHits": 1,
+                    "cacheMisses": 2,
+                    "cacheEvictions": 0,
+                    "cachedBlobs": 2,
+                    "cachedBytes": reopened.size,
+                },
+            )
+            self.assert_equals(reopened.get("FOO.json", '"0x2"'), b'{"name": "FOO"}')
+
+    def test_least_recently_used_blobs_are_evicted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN
+            cache = BlobCache(directory, max_bytes=250)
+            for name in ["A", "B"]:
+                cache.put(name, "1", b"x" * 100)
+            cache.get("A", "1")
+            # WHEN
+            cache.put("C", "1", b"x" * 100)
+            # THEN
+            self.assert_equals(cache.get("B", "1"), None)
+            self.assert_equals(cache.get("A", "1"), b"x" * 100)
+            self.assert_equals(cache.get("C", "1"), b"x" * 100)
+            self.assert_equals(cache.stats()["cacheEvictions"], 1)
+            self.assert_equals(len(os.listdir(directory)), 2)
+
+    def test_stream_through(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # GIVEN
+            cache = BlobCache(directory)
+            chunks = [b"FOO", b"BAR", b"BAZ"]
+
+            def failing_download():
+                yield b"FOO"
+                raise ValueError("connection reset")
+
+            # WHEN
+            with pytest.raises(ValueError):
+                list(cache.stream_through("FOO", "1", failing_download))
+            downloaded = list(cache.stream_through("FOO", "1", lambda: iter(chunks)))
+            cached = list(cache.stream_through("FOO", "1", None, chunk_size=4))
+            # THEN
+            self.assert_equals(downloaded, chunks)
+            self.assert_equals(cached, [b"FOOB", b"ARBA", b"Z"])
+            self.assert_equals(len(os.listdir(directory)), 1)
+
+    def test_unknown_compression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with pytest.raises(ValueError):
+                BlobCache(directory, compression="lz4")
+
+    @unittest.skipIf(zstandard is not None, "zstandard is installed")
+    def test_zstd_compression_without_zstandard(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with pytest.raises(ValueError):
+                BlobCache(directory, compression="zstd")
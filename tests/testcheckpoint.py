@@ -0,0 +1,237 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import collections
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.client.checkpoint import FAILED, STARTED, UPLOADED, IngestCheckpoint
+from tests.stubserver import StubSearchServer
+from tests.testbase import TestBase
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestIngestCheckpoint(TestBase):
+    """
+    This class contains unit tests for IngestCheckpoint class
+    """
+
+    def test_resume_interrupted_run(self):
+        # GIVEN
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "manifest.sqlite")
+            checkpoint = IngestCheckpoint(path)
+            checkpoint.start()
+            checkpoint.set_state("a.json", UPLOADED)
+            checkpoint.set_state("b.json", FAILED)
+            checkpoint.set_state("c.json", STARTED)
+            checkpoint.save_continuation_token("TOKEN")
+            checkpoint.close()
+            # WHEN
+            checkpoint = IngestCheckpoint(path)
+            continuation_token = checkpoint.start(resume=True)
+            # THEN
+            self.assert_equals(continuation_token, "TOKEN")
+            self.assert_equals(
+                [checkpoint.is_done(name) for name in ["a.json", "b.json", "c.json"]],
+                [True, True, False],
+            )
+            self.assert_equals(checkpoint.was_interrupted("c.json"), True)
+            checkpoint.close()
+
+    def test_finished_run_is_not_resumed(self):
+        # GIVEN
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "manifest.sqlite")
+            checkpoint = IngestCheckpoint(path)
+            checkpoint.start()
+            checkpoint.set_state("a.json", UPLOADED)
+            checkpoint.save_continuation_token("TOKEN")
+            checkpoint.finish()
+            checkpoint.close()
+            # WHEN
+            checkpoint = IngestCheckpoint(path)
+            continuation_token = checkpoint.start(resume=True)
+            # THEN
+            self.assert_equals(continuation_token, None)
+            self.assert_equals(checkpoint.is_done("a.json"), False)
+            checkpoint.close()
+
+    @staticmethod
+    def write_blobs(directory, count):
+        """
+        writes count copies of vi-output.json with different video ids
+        :return: directory of the files
+        """
+        with open(os.path.join(TESTS_DIRECTORY, "resources", "vi-output.json")) as f:
+            vi_output = json.load(f)
+        blobs = os.path.join(directory, "blobs")
+        os.mkdir(blobs)
+        for i in range(count):
+            vi_output["videos"][0]["id"] = "video{}".format(i)
+            with open(os.path.join(blobs, "{}.json".format(i)), "w") as f:
+                json.dump(vi_output, f)
+        return blobs
+
+    @staticmethod
+    def run_ingest(
+        server, directory, logs, *arguments, batch_size=40, timeout=None, **environment
+    ):
+        """
+        runs an ingest of directory/blobs in its own process,
+        logging the files to directory/logs
+        :return: its exit code or None when killed
+        """
+        os.makedirs(os.path.join(directory, logs), exist_ok=True)
+        environment.setdefault("MILLISECONDS_INTERVAL", "10000")
+        environment = dict(
+            os.environ,
+            **environment,
+            PYTHONPATH=os.path.join(TESTS_DIRECTORY, "..", "src"),
+            SEARCH_SERVICE_NAME="FOO",
+            SEARCH_API_VERSION="2020-06-30",
+            SEARCH_API_KEY="FOO",
+            SEARCH_INDEX_NAME="FOO",
+            SEARCH_BATCH_MAX_DOCUMENTS=str(batch_size),
+            INSIGHTS_CONTAINER_NAME="FOO",
+            STORAGE_CONNECTION_STRING="DefaultEndpointsProtocol=https;"
+            "AccountName=foo;AccountKey=Rk9P;EndpointSuffix=core.windows.net",
+            INGEST_LOG_FILENAME="ingested.txt",
+            INGEST_FAILURE_LOG_FILENAME="failed-to-ingest.txt",
+            FILE_PROCESSING_LOGS_DIR=os.path.join(directory, logs),
+        )
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                # not run as a script, tests/utils.py would shadow src/utils
+                "-c",
+                "import runpy; runpy.run_path({!r}, run_name='__main__')".format(
+                    os.path.join(TESTS_DIRECTORY, "ingestprocess.py")
+                ),
+                server.url,
+                os.path.join(directory, "blobs"),
+            ]
+            + list(arguments),
+            cwd=directory,
+            env=environment,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            return process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            return None
+
+    def test_rejected_document_fails_its_file(self):
+        # GIVEN
+        with tempfile.TemporaryDirectory() as directory:
+            self.write_blobs(directory, 3)
+            with StubSearchServer() as server:
+                # the first request has 40 documents of 0.json, one is rejected
+                results = [
+                    {"key": "video0-{}".format(i), "status": True, "statusCode": 200}
+                    for i in range(40)
+                ]
+                results[3] = {
+                    "key": "video0-3",
+                    "status": False,
+                    "statusCode": 400,
+                    "errorMessage": "FOO",
+                }
+                server.respond(207, {"value": results})
+                # WHEN
+                result = self.run_ingest(server, directory, "logs")
+            # THEN
+            with open(os.path.join(directory, "logs", "failed-to-ingest.txt")) as f:
+                failed = f.read().split()
+            with open(os.path.join(directory, "logs", "ingested.txt")) as f:
+                ingested = f.read().split()
+            checkpoint = IngestCheckpoint(
+                os.path.join(directory, "logs", "ingest-manifest.sqlite")
+            )
+            continuation_token = checkpoint.start(resume=True)
+            checkpoint.close()
+        self.assert_equals(result, 0)
+        self.assert_equals(failed, ["0.json"])
+        self.assert_equals(sorted(ingested), ["1.json", "2.json"])
+        self.assert_equals(continuation_token, None)
+
+    def test_changed_parser_settings_ingest_again(self):
+        # GIVEN
+        with tempfile.TemporaryDirectory() as directory:
+            self.write_blobs(directory, 2)
+            with StubSearchServer() as server:
+                self.run_ingest(server, directory, "logs")
+                self.run_ingest(server, directory, "logs")
+                unchanged_requests = len(server.requests)
+                # WHEN
+                self.run_ingest(
+                    server, directory, "logs", MILLISECONDS_INTERVAL="60000"
+                )
+            # THEN
+            documents = [
+                json.loads(r["body"])["value"]
+                for r in server.requests[unchanged_requests:]
+            ]
+        # the documents of the 60s intervals replace the 10s ones
+        self.assert_equals(
+            {
+                d["id"]
+                for body in documents
+                for d in body
+                if d["@search.action"] != "delete"
+            },
+            {"video{}-{}".format(i, j) for i in range(2) for j in range(26)},
+        )
+        self.assert_equals(
+            sum(d["@search.action"] == "delete" for body in documents for d in body),
+            2 * (156 - 26),
+        )
+
+    def test_killed_run_is_resumed(self):
+        # GIVEN
+        batch_size = 40
+        with tempfile.TemporaryDirectory() as directory:
+            self.write_blobs(directory, 8)
+            with StubSearchServer() as server:
+
+                def run(logs, *arguments, timeout=None):
+                    return self.run_ingest(
+                        server,
+                        directory,
+                        logs,
+                        *arguments,
+                        batch_size=batch_size,
+                        timeout=timeout,
+                    )
+
+                started = time.perf_counter()
+                self.assert_equals(run("complete"), 0)
+                seconds = time.perf_counter() - started
+                server.requests.clear()
+                # WHEN
+                kills = 0
+                result = run("killed", timeout=random.uniform(0.3, 0.9) * seconds)
+                while result is None:
+                    kills += 1
+                    result = run(
+                        "killed", "--resume", timeout=random.uniform(0.5, 2) * seconds
+                    )
+            # THEN
+            expected = {"video{}-{}".format(i, j) for i in range(8) for j in range(156)}
+            received = collections.Counter(d["id"] for d in server.documents())
+            self.assert_equals(result, 0)
+            self.assert_equals(set(received), expected)
+            # a request sent right before a kill may be sent again, no more
+            self.assert_equals(
+                sum(received.values()) <= len(expected) + kills * batch_size, True
+            )
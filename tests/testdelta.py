@@ -0,0 +1,81 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import copy
+
+from src.client.delta import DocumentDelta, fingerprint
+from tests.testbase import TestBase
+
+
+class TestDocumentDelta(TestBase):
+    """
+    This class contains unit tests for DocumentDelta class
+    """
+
+    documents = [
+        {
+            "id": "v-0",
+            "startTime": "00:00:00",
+            "transcripts": [{"transcript": "FOO"}],
+            "labels": [{"label": "BAR"}],
+        },
+        {"id": "v-1", "startTime": "00:00:10", "transcripts": [{"transcript": "BAZ"}]},
+        {"id": "v-2", "startTime": "00:00:20"},
+    ]
+
+    def previous(self):
+        return {d["id"]: fingerprint(d) for d in self.documents}
+
+    def test_new_file_is_uploaded(self):
+        # GIVEN
+        delta = DocumentDelta()
+        # WHEN
+        actual = list(delta.documents(copy.deepcopy(self.documents)))
+        # THEN
+        self.assert_equals([d["@search.action"] for d in actual], ["upload"] * 3)
+        self.assert_equals(delta.fingerprints, self.previous())
+
+    def test_unchanged_file_sends_nothing(self):
+        # GIVEN
+        delta = DocumentDelta(self.previous())
+        # WHEN
+        actual = list(delta.documents(copy.deepcopy(self.documents)))
+        # THEN
+        self.assert_equals(actual, [])
+        self.assert_equals(delta.counts["unchanged"], 3)
+
+    def test_changes_are_merged_and_vanished_documents_deleted(self):
+        # GIVEN
+        delta = DocumentDelta(self.previous())
+        documents = copy.deepcopy(self.documents[:2])
+        documents[0]["transcripts"] = [{"transcript": "QUX"}]
+        del documents[0]["labels"]
+        # WHEN
+        actual = list(delta.documents(documents))
+        # THEN
+        self.assert_equals(
+            actual,
+            [
+                {
+                    "@search.action": "mergeOrUpload",
+                    "id": "v-0",
+                    "transcripts": [{"transcript": "QUX"}],
+                    "labels": None,
+                },
+                {"@search.action": "delete", "id": "v-2"},
+            ],
+        )
+        self.assert_equals(sorted(delta.fingerprints), ["v-0", "v-1"])
+
+    def test_resend_unchanged(self):
+        # GIVEN
+        delta = DocumentDelta(self.previous(), resend_unchanged=True)
+        # WHEN
+        actual = list(delta.documents(copy.deepcopy(self.documents[1:])))
+        # THEN
+        self.assert_equals(
+            [(d["@search.action"], d["id"]) for d in actual],
+            [("upload", "v-1"), ("upload", "v-2"), ("delete", "v-0")],
+        )
@@ -0,0 +1,41 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+from src.client.httpsession import SearchSession
+from tests.stubserver import StubSearchServer
+from tests.testbase import TestBase
+
+
+class TestSearchSession(TestBase):
+    """
+    This class contains unit tests for SearchSession class
+    """
+
+    def test_connection_is_reused(self):
+        # GIVEN
+        session = SearchSession({"api-key": "FOO"})
+        with StubSearchServer() as server:
+            # WHEN
+            for i in range(5):
+                session.post(
+                    server.url + "indexes", json_body={"value": [{"id": str(i)}]}
+                )
+        # THEN
+        self.assert_equals(len(server.requests), 5)
+        self.assert_equals(len({r["port"] for r in server.requests}), 1)
+        self.assert_equals(session.connection_count(), 1)
+        self.assert_equals(session.stats()["requests"], 5)
+        self.assert_equals(server.requests[0]["headers"]["api-key"], "FOO")
+
+    def test_gzip_requests(self):
+        # GIVEN
+        session = SearchSession({}, gzip_requests=True)
+        body = '{"value": [{"id": "BAR"}]}'
+        with StubSearchServer() as server:
+            # WHEN
+            session.post(server.url + "indexes", body)
+        # THEN
+        self.assert_equals(server.requests[0]["headers"]["Content-Encoding"], "gzip")
+        self.assert_equals(server.requests[0]["body"], body.encode())
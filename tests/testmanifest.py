@@ -0,0 +1,78 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import hashlib
+import os
+import tempfile
+
+from src.client.manifest import IngestManifest, file_content_hash
+from tests.testbase import TestBase
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+
+
+class TestIngestManifest(TestBase):
+    """
+    This class contains unit tests for IngestManifest class
+    """
+
+    def test_is_unchanged(self):
+        # GIVEN
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = IngestManifest(os.path.join(directory, "manifest.sqlite"))
+            # WHEN
+            manifest.record("a.json", "0x1")
+            # THEN
+            self.assert_equals(manifest.is_unchanged("a.json", "0x1"), True)
+            self.assert_equals(manifest.is_unchanged("a.json", "0x2"), False)
+            self.assert_equals(manifest.is_unchanged("b.json", "0x1"), False)
+            self.assert_equals(manifest.is_unchanged("a.json", None), False)
+            manifest.close()
+
+    def test_persists_between_runs(self):
+        # GIVEN
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "manifest.sqlite")
+            manifest = IngestManifest(path)
+            manifest.record("a.json", "0x1")
+            manifest.record("b.json", "0x1")
+            manifest.record("a.json", "0x2")
+            manifest.record("c.json", None)
+            manifest.close()
+            # WHEN
+            manifest = IngestManifest(path)
+            # THEN
+            self.assert_equals(len(manifest), 2)
+            self.assert_equals(manifest.is_unchanged("a.json", "0x2"), True)
+            self.assert_equals(manifest.is_unchanged("b.json", "0x1"), True)
+            manifest.close()
+
+    def test_document_fingerprints(self):
+        # GIVEN
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "manifest.sqlite")
+            manifest = IngestManifest(path)
+            manifest.record("a.json", "0x1", {"v-0": {"name": "1"}, "v-1": {}})
+            manifest.record("a.json", "0x2", {"v-0": {"name": "2"}})
+            manifest.record("b.json", "0x1", {"w-0": {"name": "3"}})
+            manifest.close()
+            # WHEN
+            manifest = IngestManifest(path)
+            # THEN
+            self.assert_equals(
+                manifest.document_fingerprints("a.json"), {"v-0": {"name": "2"}}
+            )
+            self.assert_equals(manifest.document_fingerprints("c.json"), {})
+            manifest.close()
+
+    def test_file_content_hash(self):
+        # GIVEN
+        path = os.path.join(RESOURCES, "vi-output.json")
+        with open(path, "rb") as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+        # WHEN
+        actual = file_content_hash(path, chunk_size=4096)
+        # THEN
+        self.assert_equals(actual, expected)
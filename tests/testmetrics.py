@@ -0,0 +1,128 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import os
+import tempfile
+
+from src.client.batcher import DocumentBatcher
+from src.client.metrics import DISABLED, NULL_STAGE, IngestMetrics
+from tests.testbase import TestBase
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestIngestMetrics(TestBase):
+    """
+    This class contains unit tests for IngestMetrics class
+    """
+
+    def test_nested_stages_self_time(self):
+        # GIVEN
+        clock = FakeClock()
+        metrics = IngestMetrics(enabled=True, clock=clock)
+        # WHEN
+        with metrics.stage("parse", documents=3):
+            clock.now += 1
+            with metrics.stage("download") as stage:
+                clock.now += 2
+                stage.add(size=100)
+            clock.now += 4
+        # THEN
+        stages = metrics.summary()["stages"]
+        self.assert_equals(stages["parse"]["seconds"], 5.0)
+        self.assert_equals(stages["parse"]["documents"], 3)
+        self.assert_equals(stages["download"]["seconds"], 2.0)
+        self.assert_equals(stages["download"]["bytesPerSecond"], 50)
+
+    def test_timed_iter(self):
+        # GIVEN
+        clock = FakeClock()
+        metrics = IngestMetrics(enabled=True, clock=clock)
+
+        def produce():
+            for item in [b"ab", b"cde"]:
+                clock.now += 1
+                yield item
+
+        # WHEN
+        for _ in metrics.timed_iter("download", produce(), size=len):
+            clock.now += 10
+        for _ in metrics.timed_iter("parse", produce()):
+            pass
+        # THEN
+        stages = metrics.summary()["stages"]
+        self.assert_equals(
+            [stages["download"][k] for k in ["count", "seconds", "bytes"]],
+            [1, 2.0, 5],
+        )
+        self.assert_equals(stages["parse"]["documents"], 2)
+
+    def test_disabled(self):
+        # GIVEN
+        metrics = IngestMetrics()
+        items = [1, 2]
+        # WHEN
+        stage = metrics.stage("parse")
+        metrics.observe("upload", 1.0, 10)
+        metrics.increment("retries")
+        metrics.gauge_queue("parsed", 3)
+        # THEN
+        self.assert_equals(stage is NULL_STAGE, True)
+        self.assert_equals(metrics.timed_iter("parse", items) is items, True)
+        self.assert_equals(
+            metrics.summary()["stages"],
+            dict(),
+        )
+        self.assert_equals(metrics.finish(), None)
+
+    def test_prometheus_file(self):
+        # GIVEN
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ingest.prom")
+            metrics = IngestMetrics(enabled=True, prometheus_file=path)
+            metrics.observe("upload", 0.2, documents=10, size=1000)
+            metrics.gauge_queue("parsed", 2)
+            metrics.file_event("a.json", "ingested")
+            metrics.collectors.append(lambda: {"retries": 4})
+            # WHEN
+            metrics.finish()
+            # THEN
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assert_equals(
+            'vi_ingest_stage_seconds_bucket{stage="upload",le="0.25"} 1' in lines,
+            True,
+        )
+        self.assert_equals(
+            'vi_ingest_stage_seconds_bucket{stage="upload",le="0.1"} 0' in lines,
+            True,
+        )
+        self.assert_equals(
+            'vi_ingest_documents_total{stage="upload"} 10' in lines, True
+        )
+        self.assert_equals('vi_ingest_queue_max_depth{queue="parsed"} 2' in lines, True)
+        self.assert_equals("vi_ingest_files_ingested_total 1" in lines, True)
+        self.assert_equals("vi_ingest_retries_total 4" in lines, True)
+
+    def test_batcher_serialize_stage(self):
+        # GIVEN
+        metrics = IngestMetrics(enabled=True)
+        bodies = []
+        batcher = DocumentBatcher(bodies.append, max_documents=2, metrics=metrics)
+        # WHEN
+        for i in range(3):
+            batcher.add({"id": str(i)})
+        batcher.flush()
+        # THEN
+        serialize = metrics.summary()["stages"]["serialize"]
+        self.assert_equals([serialize["count"], serialize["documents"]], [3, 3])
+        self.assert_equals(len(bodies), 2)
+        self.assert_equals(DISABLED.summary()["stages"], dict())
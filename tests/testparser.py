@@ -3,7 +3,15 @@ __email__ = "mamokari@microsoft.com"
 __license__ = "MIT"
 __version__ = "February 2022"
 
-from src.parser import Parser
+import json
+import unittest
+
+import pytest
+
+from src.parser.parser import Parser
+from src.parser.bucketing import numpy
+from src.parser.insightspec import InsightSpec, AssetField, INSTANCE
+from src.parser.timeparser import TimeParser
 from tests.testbase import TestBase
 from tests.utils import Utils
 
@@ -235,3 +243,305 @@ class TestParser(TestBase):
                 "intervals-with-frame-patterns.json", True
             ),
         )
+
+    def test_parse_brands(self):
+        # GIVEN
+        brands = [
+            {
+                "id": 1,
+                "name": "Microsoft",
+                "confidence": 0.9,
+                "referenceId": "Microsoft",
+                "referenceType": "Wiki",
+                "description": "",
+                "instances": [
+                    {"brandType": "Transcript", "start": "0:00:05", "end": "0:00:12"}
+                ],
+            },
+            {"id": 2, "name": "FOO", "confidence": 0.2, "instances": []},
+        ]
+        intervals = {0: {}, 10000: {}}
+        expected_brand = {
+            "brand": "Microsoft",
+            "assets": '{"id": 1, "confidence": 0.9, "referenceId": "Microsoft", '
+            '"referenceType": "Wiki", "description": "", '
+            '"brandType": "Transcript", "start": "0:00:05", "end": "0:00:12"}',
+        }
+        # WHEN
+        actual = self.parser.parse_brands(brands, intervals)
+        # THEN
+        self.assert_equals(
+            actual,
+            {0: {"brands": [expected_brand]}, 10000: {"brands": [expected_brand]}},
+        )
+
+    def test_parse_vi_json_with_custom_insight_spec(self):
+        # GIVEN
+        spec = InsightSpec(
+            "customTags",
+            "customItems",
+            "item",
+            value="tag",
+            assets=[AssetField("id"), AssetField("score", source=INSTANCE)],
+            non_empty="tag",
+        )
+        parser = Parser(insight_specs=[spec])
+        vi_json = {
+            "name": "FOO",
+            "videos": [
+                {
+                    "id": "BAR",
+                    "insights": {
+                        "duration": "0:00:15",
+                        "customTags": [
+                            {
+                                "id": 7,
+                                "tag": "BAZ",
+                                "instances": [
+                                    {"score": 1, "start": "0:00:11", "end": "0:00:12"}
+                                ],
+                            }
+                        ],
+                    },
+                }
+            ],
+        }
+        # WHEN
+        actual = parser.parse_vi_json(vi_json)
+        # THEN
+        self.assert_equals("customItems" in actual[0], False)
+        self.assert_equals(
+            actual[1]["customItems"],
+            [
+                {
+                    "item": "BAZ",
+                    "assets": '{"id": 7, "score": 1, "start": "0:00:11", "end": "0:00:12"}',
+                }
+            ],
+        )
+
+    def test_iter_documents_yields_all_videos(self):
+        # GIVEN
+        vi_output = self.utils.read_json_from_resources("vi-output.json")
+        second_video = dict(vi_output["videos"][0], id="BAR")
+        vi_output["videos"].append(second_video)
+        # WHEN
+        actual = [d["id"] for d in self.parser.iter_documents(vi_output)]
+        # THEN
+        self.assert_equals(len(actual), 2 * 156)
+        self.assert_equals(actual[155], "33a24ef09f-155")
+        self.assert_equals(actual[156], "BAR-0")
+
+    def test_multi_resolution_intervals(self):
+        # GIVEN
+        vi_output = self.utils.read_json_from_resources("vi-output.json")
+        single = {
+            interval: Parser(time_parser=TimeParser([interval])).parse_vi_json(
+                vi_output
+            )
+            for interval in [10000, 60000]
+        }
+        parser = Parser(time_parser=TimeParser([10000, 60000]))
+        # WHEN
+        actual = parser.parse_vi_json(vi_output)
+        # THEN
+        expected = []
+        for interval, label in [(10000, "10s"), (60000, "60s")]:
+            for document in single[interval]:
+                video_id, _, i = document["id"].rpartition("-")
+                expected.append(
+                    dict(
+                        document,
+                        id="{}-{}-{}".format(video_id, label, i),
+                        intervalMilliseconds=interval,
+                    )
+                )
+        self.assert_equals(actual, expected)
+        self.assert_equals(len(actual), 156 + 26)
+
+    def test_materialize_compact_video(self):
+        # GIVEN
+        vi_output = self.utils.read_json_from_resources("vi-output.json")
+        video = vi_output["videos"][0]
+        for parser in [
+            self.parser,
+            Parser(time_parser=TimeParser([10000, 60000])),
+            Parser(coalesced_insights=["faces", "labels"]),
+        ]:
+            compact = parser.compact_video(video, "FOO")
+            # WHEN
+            actual = list(parser.materialize(compact))
+            # THEN
+            self.assert_equals(len(compact), 4058)
+            self.assert_equals(actual, list(parser.parse_video(video, "FOO").values()))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_bucketing(self):
+        # GIVEN
+        vi_output = self.utils.read_json_from_resources("vi-output.json")
+        video = vi_output["videos"][0]
+        overridden = TimeParser([10000])
+        overridden.interval_in_milliseconds = 15000
+        for time_parser in [
+            TimeParser([10000]),
+            TimeParser([1500, 10000, 60000]),
+            overridden,
+        ]:
+            python = Parser(time_parser=time_parser, bucketing="python")
+            vectorized = Parser(time_parser=time_parser, bucketing="numpy")
+            compact = python.compact_video(video, "FOO")
+            # WHEN
+            actual = list(vectorized.materialize(compact))
+            # THEN
+            self.assert_equals(actual, list(python.materialize(compact)))
+
+    def test_invalid_bucketing(self):
+        # GIVEN
+        engines = ["FOO"] if numpy is not None else ["FOO", "numpy"]
+        for engine in engines:
+            # WHEN/THEN
+            with pytest.raises(ValueError):
+                Parser(bucketing=engine)
+
+    def test_encode_assets_equals_json_dumps(self):
+        # GIVEN
+        instance = {"score": 0.5, "text": 'é"', "start": "0:00:01", "end": "0:00:02"}
+        static_assets = {"id": 7, "name": "BAZ"}
+        specs = [
+            InsightSpec(
+                "customTags",
+                "customItems",
+                "item",
+                assets=[
+                    AssetField("id"),
+                    AssetField("name"),
+                    AssetField("score", source=INSTANCE),
+                    AssetField("text", source=INSTANCE),
+                ],
+            ),
+            # no static assets
+            InsightSpec(
+                "customTags",
+                "customItems",
+                "item",
+                assets=[AssetField("score", source=INSTANCE)],
+            ),
+            # an instance asset replacing a static asset is not appended
+            InsightSpec(
+                "customTags",
+                "customItems",
+                "item",
+                assets=[
+                    AssetField("id"),
+                    AssetField("name"),
+                    AssetField("name", key="text", source=INSTANCE),
+                ],
+            ),
+        ]
+        for spec in specs:
+            static = {a.name: static_assets[a.name] for a in spec.item_assets}
+            values = [asset.read(instance) for asset in spec.instance_assets]
+            # WHEN
+            actual = spec.encode_assets(
+                spec.assets_prefix(static),
+                static,
+                values,
+                instance["start"],
+                instance["end"],
+            )
+            # THEN
+            self.assert_equals(
+                actual, json.dumps(spec.project_assets(static, instance))
+            )
+
+    def test_settings_fingerprint(self):
+        # GIVEN
+        parser = Parser(time_parser=TimeParser([10000]), coalesced_insights=[])
+        # WHEN
+        fingerprints = [
+            p.settings_fingerprint()
+            for p in [
+                Parser(
+                    time_parser=TimeParser([10000]),
+                    coalesced_insights=[],
+                    bucketing="python",
+                ),
+                Parser(time_parser=TimeParser([60000]), coalesced_insights=[]),
+                Parser(time_parser=TimeParser([10000]), coalesced_insights=["faces"]),
+                Parser(
+                    insight_specs=parser.insight_specs[1:],
+                    time_parser=TimeParser([10000]),
+                    coalesced_insights=[],
+                ),
+            ]
+        ]
+        # THEN
+        self.assert_equals(
+            [f == parser.settings_fingerprint() for f in fingerprints],
+            [True, False, False, False],
+        )
+
+    def test_coalesced_insight(self):
+        # GIVEN
+        spec = InsightSpec(
+            "customTags",
+            "customItems",
+            "item",
+            value="tag",
+            assets=[AssetField("id"), AssetField("score", source=INSTANCE)],
+        )
+        parser = Parser(
+            insight_specs=[spec],
+            time_parser=TimeParser([10000]),
+            coalesced_insights=["customTags"],
+        )
+        vi_json = {
+            "name": "FOO",
+            "videos": [
+                {
+                    "id": "BAR",
+                    "insights": {
+                        "duration": "0:00:20",
+                        "customTags": [
+                            {
+                                "id": 7,
+                                "tag": "BAZ",
+                                "instances": [
+                                    {"score": 1, "start": "0:00:01", "end": "0:00:02"},
+                                    {"score": 2, "start": "0:00:03", "end": "0:00:04"},
+                                    {"score": 3, "start": "0:00:11", "end": "0:00:12"},
+                                ],
+                            }
+                        ],
+                    },
+                }
+            ],
+        }
+        video = vi_json["videos"][0]
+        # WHEN
+        actual = parser.parse_vi_json(vi_json)
+        # THEN
+        self.assert_equals(
+            [json.loads(item["assets"]) for item in actual[0]["customItems"]],
+            [
+                {
+                    "id": 7,
+                    "start": "0:00:01",
+                    "end": "0:00:04",
+                    "ranges": [
+                        {"score": 1, "start": "0:00:01", "end": "0:00:02"},
+                        {"score": 2, "start": "0:00:03", "end": "0:00:04"},
+                    ],
+                }
+            ],
+        )
+        self.assert_equals(
+            actual[1]["customItems"],
+            [
+                {
+                    "item": "BAZ",
+                    "assets": '{"id": 7, "score": 3, "start": "0:00:11", "end": "0:00:12"}',
+                }
+            ],
+        )
+        self.assert_equals(actual, list(parser.parse_video(video, "FOO").values()))
@@ -0,0 +1,98 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+import os
+import threading
+import time
+
+from src.client.pipeline import IngestPipeline, parse_vi_file_to_batches
+from src.parser.parser import Parser
+from tests.testbase import TestBase
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+
+
+class TestIngestPipeline(TestBase):
+    """
+    This class contains unit tests for IngestPipeline class
+    """
+
+    with open(os.path.join(RESOURCES, "vi-output.json"), "rb") as f:
+        vi_output = f.read()
+
+    def test_run(self):
+        # GIVEN
+        files = {
+            "a.json": self.vi_output,
+            "b.json": b"{ not json",
+            "c.json": json.dumps({"state": "Processing"}).encode(),
+            "d.json": self.vi_output,
+        }
+        uploaded, ingested, failed = {}, [], []
+        pipeline = IngestPipeline(
+            download=lambda name: files[name],
+            upload=lambda name, intervals: uploaded.update({name: len(intervals)}),
+            on_ingested=ingested.append,
+            on_failed=lambda name, ex: failed.append(name),
+            download_workers=2,
+            parse_workers=2,
+            upload_workers=2,
+            queue_size=1,
+        )
+        # WHEN
+        pipeline.run(sorted(files))
+        # THEN
+        self.assert_equals(uploaded, {"a.json": 156, "d.json": 156})
+        self.assert_equals(sorted(ingested), ["a.json", "d.json"])
+        self.assert_equals(failed, ["b.json"])
+
+    def test_backpressure(self):
+        # GIVEN
+        lock = threading.Lock()
+        state = {"in_flight": 0, "max_in_flight": 0}
+
+        def download(name):
+            with lock:
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            return json.dumps({"state": "Processed", "name": name, "videos": []})
+
+        def upload(name, intervals):
+            time.sleep(0.01)
+            with lock:
+                state["in_flight"] -= 1
+
+        pipeline = IngestPipeline(
+            download=download,
+            upload=upload,
+            on_ingested=lambda name: None,
+            on_failed=lambda name, ex: None,
+            download_workers=2,
+            parse_workers=1,
+            upload_workers=1,
+            queue_size=1,
+        )
+        # WHEN
+        pipeline.run(str(i) for i in range(30))
+        # THEN
+        # files held by the workers and queues of each stage, nothing more
+        self.assert_equals(state["in_flight"], 0)
+        self.assert_equals(state["max_in_flight"] <= 2 + 1 + 1 + 1 + 1 + 1, True)
+
+    def test_parse_vi_file_to_batches(self):
+        # GIVEN
+        path = os.path.join(RESOURCES, "vi-output.json")
+        expected = Parser().parse_vi_json(json.loads(self.vi_output))
+        for document in expected:
+            document["@search.action"] = "upload"
+        # WHEN
+        actual, fingerprints = parse_vi_file_to_batches(path, 100, 16 * 1024 * 1024)
+        # THEN
+        self.assert_equals(len(actual), 2)
+        self.assert_equals(
+            [d for body in actual for d in json.loads(body)["value"]], expected
+        )
+        self.assert_equals(sorted(fingerprints), sorted(d["id"] for d in expected))
@@ -0,0 +1,118 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.client.sharding import Shard
+from tests.testbase import TestBase
+
+
+class PagedContainer:
+    """
+    stand-in of StorageClient listing blobs two by two, recording the
+    name_starts_with of each listing
+    """
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.listed_prefixes = []
+
+    def list_files_in_container(self, container, name_starts_with=None):
+        self.listed_prefixes.append(name_starts_with)
+        blobs = [
+            SimpleNamespace(name=name)
+            for name in self.names
+            if name.startswith(name_starts_with or "")
+        ]
+        return SimpleNamespace(
+            by_page=lambda continuation_token=None: Pages(blobs, continuation_token)
+        )
+
+
+class Pages:
+    def __init__(self, blobs, continuation_token):
+        self.blobs = blobs
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        start = int(self.continuation_token or 0)
+        while start < len(self.blobs):
+            page = self.blobs[start : start + 2]
+            start += 2
+            self.continuation_token = str(start) if start < len(self.blobs) else None
+            yield page
+
+
+class TestShard(TestBase):
+    """
+    This class contains unit tests for Shard class
+    """
+
+    names = [
+        "2022-0{}/video-{}.json".format(month, i)
+        for month in range(1, 6)
+        for i in range(3)
+    ]
+    prefixes = ["2022-0{}/".format(month) for month in range(1, 6)]
+
+    def test_hash_shards_partition_the_names(self):
+        # GIVEN
+        shards = [Shard.parse("{}/3".format(k)) for k in range(1, 4)]
+        names = ["video-{}.json".format(i) for i in range(3000)]
+        # WHEN
+        owners = [[shard.owns(name) for shard in shards].count(True) for name in names]
+        sizes = [sum(shard.owns(name) for name in names) for shard in shards]
+        # THEN
+        self.assert_equals(set(owners), {1})
+        self.assert_equals(all(900 < size < 1100 for size in sizes), True)
+
+    def test_prefix_shards_list_only_their_prefixes(self):
+        # GIVEN
+        container = PagedContainer(self.names)
+        shard = Shard.parse("2/2", list(reversed(self.prefixes)))
+        # WHEN
+        actual = [blob.name for blob in shard.list_blobs(container, "FOO")]
+        # THEN
+        self.assert_equals(container.listed_prefixes, ["2022-02/", "2022-04/"])
+        self.assert_equals(
+            actual,
+            [n for n in self.names if n.startswith(("2022-02/", "2022-04/"))],
+        )
+
+    def test_listing_resumes_from_continuation_token(self):
+        # GIVEN
+        shard = Shard.parse("1/2", self.prefixes)
+        pages = shard.list_blobs(PagedContainer(self.names), "FOO").by_page()
+        iterator = iter(pages)
+        first_pages = [next(iterator), next(iterator), next(iterator)]
+        # WHEN
+        resumed = shard.list_blobs(PagedContainer(self.names), "FOO").by_page(
+            pages.continuation_token
+        )
+        # THEN
+        self.assert_equals(
+            [blob.name for page in first_pages + list(resumed) for blob in page],
+            [
+                n
+                for n in self.names
+                if n.startswith(("2022-01/", "2022-03/", "2022-05/"))
+            ],
+        )
+
+    def test_whole_container(self):
+        # GIVEN
+        container = PagedContainer(self.names)
+        # WHEN
+        actual = [blob.name for blob in Shard().list_blobs(container, "FOO")]
+        # THEN
+        self.assert_equals(actual, self.names)
+        self.assert_equals(container.listed_prefixes, [None])
+
+    def test_invalid_shard(self):
+        for text in ["0/2", "3/2", "2", "a/b"]:
+            with pytest.raises(ValueError):
+                Shard.parse(text)
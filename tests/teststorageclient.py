@@ -0,0 +1,82 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+import os
+import tempfile
+from unittest import mock
+
+from src.client.pipeline import parse_vi_content
+from src.client.storageClient import StorageClient
+from tests.stubserver import StubBlobServer
+from tests.testbase import TestBase
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+
+
+class TestStorageClient(TestBase):
+    """
+    This class contains unit tests for StorageClient class
+    """
+
+    def storage_client(self, server, chunk_size, cache_directory=""):
+        with mock.patch.dict(
+            os.environ,
+            {
+                "STORAGE_CONNECTION_STRING": server.connection_string,
+                "INSIGHTS_CONTAINER_NAME": "FOO",
+                "STORAGE_MAX_CONCURRENCY": "4",
+                "STORAGE_CHUNK_SIZE": str(chunk_size),
+                "BLOB_CACHE_DIRECTORY": cache_directory,
+                "BLOB_CACHE_COMPRESSION": "gzip",
+            },
+        ):
+            return StorageClient()
+
+    def test_get_blob_bytes_with_ranged_gets(self):
+        # GIVEN
+        with open(os.path.join(RESOURCES, "vi-output.json"), "rb") as f:
+            content = b"\xef\xbb\xbf" + f.read()
+        with StubBlobServer({"FOO/BAR.json": content}) as server:
+            client = self.storage_client(server, chunk_size=64 * 1024)
+            # WHEN
+            actual = client.get_blob_bytes("FOO", "BAR.json")
+        # THEN
+        self.assert_equals(bytes(actual), content)
+        self.assert_equals(len(server.ranges), -(-len(content) // (64 * 1024)))
+        self.assert_equals(sorted(server.ranges)[-1][1], len(content) - 1)
+        self.assert_equals(json.loads(actual)["name"], json.loads(content)["name"])
+        self.assert_equals(
+            parse_vi_content(actual), parse_vi_content(content.decode("utf-8-sig"))
+        )
+
+    def test_get_small_blob_with_one_get(self):
+        # GIVEN
+        content = b'{"state": "Processing"}'
+        with StubBlobServer({"FOO/BAR.json": content}) as server:
+            client = self.storage_client(server, chunk_size=64 * 1024)
+            # WHEN
+            actual = client.get_blob_bytes("FOO", "BAR.json")
+            string = client.get_blob_string("FOO", "BAR.json")
+        # THEN
+        self.assert_equals(bytes(actual), content)
+        self.assert_equals(string, content.decode())
+        self.assert_equals(server.ranges, [(0, len(content) - 1)] * 2)
+
+    def test_blobs_are_read_through_the_cache(self):
+        # GIVEN
+        content = b'{"state": "Processed"}'
+        with tempfile.TemporaryDirectory() as directory:
+            with StubBlobServer({"FOO/BAR.json": content}) as server:
+                client = self.storage_client(server, 1024, directory)
+                # WHEN
+                first = client.get_blob_string("FOO", "BAR.json")
+                second = client.get_blob_string("FOO", "BAR.json")
+                chunks = list(client.get_blob_chunks("FOO", "BAR.json", '"0x8D9"'))
+            # THEN
+            self.assert_equals([first, second], [content.decode()] * 2)
+            self.assert_equals(chunks, [content])
+            self.assert_equals(len(server.ranges), 1)
+            self.assert_equals(client.cache.stats()["cacheHits"], 2)
@@ -0,0 +1,150 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import json
+
+import pytest
+
+from src.client.httpsession import SearchSession
+from src.client.throttling import (
+    AdaptiveRateController,
+    SearchUploadError,
+    backoff_seconds,
+    post_with_retry,
+    retry_after_seconds,
+)
+from tests.stubserver import StubSearchServer
+from tests.testbase import TestBase
+
+
+class TestThrottling(TestBase):
+    """
+    This class contains unit tests for the retries and the rate control
+    of the uploads to search
+    """
+
+    body = json.dumps(
+        {"value": [{"@search.action": "upload", "id": str(i)} for i in range(3)]}
+    )
+
+    def post(self, server, controller, max_attempts=8):
+        delays = []
+        payload = post_with_retry(
+            SearchSession({}),
+            server.url + "indexes/FOO/docs/index",
+            self.body,
+            controller,
+            max_attempts,
+            sleep=delays.append,
+        )
+        return payload, delays
+
+    def test_only_failed_documents_are_retried(self):
+        # GIVEN
+        controller = AdaptiveRateController(max_concurrency=4)
+        with StubSearchServer() as server:
+            server.respond(
+                207,
+                {
+                    "value": [
+                        {"key": "0", "status": True, "statusCode": 200},
+                        {"key": "1", "status": False, "statusCode": 503},
+                        {"key": "2", "status": True, "statusCode": 201},
+                    ]
+                },
+            )
+            # WHEN
+            self.post(server, controller)
+        # THEN
+        self.assert_equals(len(server.requests), 2)
+        self.assert_equals(
+            [d["id"] for d in json.loads(server.requests[1]["body"])["value"]], ["1"]
+        )
+        self.assert_equals(controller.throttled_count, 1)
+
+    def test_retry_after_is_honoured(self):
+        # GIVEN
+        controller = AdaptiveRateController(max_concurrency=4, max_batch_documents=100)
+        with StubSearchServer() as server:
+            server.respond(429, {}, {"Retry-After": "7"})
+            # WHEN
+            payload, delays = self.post(server, controller)
+        # THEN
+        self.assert_equals(delays, [7.0])
+        self.assert_equals(len(server.documents()), 6)
+        self.assert_equals(payload["value"][0]["statusCode"], 200)
+        self.assert_equals(controller.limit, 2)
+        self.assert_equals(controller.batch_documents, 60)
+
+    def test_permanent_failure_is_raised(self):
+        # GIVEN
+        controller = AdaptiveRateController()
+        with StubSearchServer() as server:
+            server.respond(
+                207,
+                {
+                    "value": [
+                        {"key": "0", "status": True, "statusCode": 200},
+                        {
+                            "key": "1",
+                            "status": False,
+                            "statusCode": 400,
+                            "errorMessage": "FOO",
+                        },
+                        {"key": "2", "status": True, "statusCode": 200},
+                    ]
+                },
+            )
+            # WHEN
+            with pytest.raises(SearchUploadError) as error:
+                self.post(server, controller)
+        # THEN
+        self.assert_equals(error.value.keys, ["1"])
+        self.assert_equals(len(server.requests), 1)
+
+    def test_attempts_are_limited(self):
+        # GIVEN
+        controller = AdaptiveRateController()
+        with StubSearchServer() as server:
+            for _ in range(3):
+                server.respond(503, {})
+            # WHEN
+            with pytest.raises(SearchUploadError):
+                self.post(server, controller, max_attempts=3)
+        # THEN
+        self.assert_equals(len(server.requests), 3)
+        self.assert_equals(controller.limit, 1)
+
+    def test_additive_increase(self):
+        # GIVEN
+        controller = AdaptiveRateController(
+            max_concurrency=8, max_batch_documents=1000, min_batch_documents=10
+        )
+        controller.record_throttled()
+        controller.record_throttled()
+        # WHEN
+        for _ in range(2):
+            controller.record_success()
+        # THEN
+        self.assert_equals(controller.limit, 3)
+        self.assert_equals(controller.batch_documents, 270)
+        for _ in range(1000):
+            controller.record_success()
+        self.assert_equals(controller.limit, 8)
+        self.assert_equals(controller.batch_documents, 1000)
+
+    def test_retry_after_seconds(self):
+        self.assert_equals(retry_after_seconds({"Retry-After": "3"}), 3.0)
+        self.assert_equals(retry_after_seconds({"retry-after-ms": "250"}), 0.25)
+        self.assert_equals(
+            retry_after_seconds({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0.0
+        )
+        self.assert_equals(retry_after_seconds({}), None)
+
+    def test_backoff_seconds(self):
+        for attempt in range(1, 12):
+            delay = backoff_seconds(attempt, base=0.5, cap=60)
+            self.assert_equals(0 <= delay <= min(60, 0.5 * 2 ** (attempt - 1)), True)
+        self.assert_equals(backoff_seconds(5, retry_after=2.0), 2.0)
@@ -5,7 +5,7 @@ __version__ = "February 2022"
 
 import pytest
 
-from src.parser.timeparser import TimeParser
+from src.parser.timeparser import TimeParser, TimeFormatError
 from tests.testbase import TestBase
 from tests.utils import Utils
 
@@ -60,3 +60,78 @@ class TestTimeParser(TestBase):
         # WHEN/THEN
         with pytest.raises(Exception) as info:
             self.time_parser.string_time_to_milliseconds("FOO")
+
+    def test_string_time_to_milliseconds_seven_fractional_digits(self):
+        # WHEN
+        actual = self.time_parser.string_time_to_milliseconds("0:00:30.7810000")
+        # THEN
+        self.assert_equals(actual, 30781)
+
+    def test_string_time_to_milliseconds_hours_out_of_range(self):
+        # WHEN/THEN
+        with pytest.raises(TimeFormatError):
+            self.time_parser.string_time_to_milliseconds("24:00:00")
+
+    def test_string_time_to_milliseconds_empty_fraction(self):
+        # WHEN/THEN
+        with pytest.raises(TimeFormatError):
+            self.time_parser.string_time_to_milliseconds("00:23:00.")
+
+    def test_get_related_intervals_long_appearance(self):
+        # GIVEN
+        self.time_parser.interval_in_milliseconds = 10000
+        # WHEN
+        actual = self.time_parser.get_related_intervals(3500, 1203500)
+        # THEN
+        self.assert_equals(actual, list(range(10000, 1203500, 10000)))
+
+    def test_get_related_intervals_end_is_exclusive(self):
+        # GIVEN
+        self.time_parser.interval_in_milliseconds = 10000
+        # WHEN
+        actual = self.time_parser.get_related_intervals(12000, 30000)
+        # THEN
+        self.assert_equals(actual, [20000])
+
+    def test_get_related_intervals_short_appearance_on_boundary(self):
+        # GIVEN
+        self.time_parser.interval_in_milliseconds = 10000
+        # WHEN
+        actual = self.time_parser.get_related_intervals(20000, 25000.5)
+        # THEN
+        self.assert_equals(actual, [20000, 20000])
+
+    def test_set_interval_in_milliseconds(self):
+        # GIVEN
+        time_parser = TimeParser([10000, 60000])
+        # WHEN
+        time_parser.interval_in_milliseconds = 15000
+        # THEN
+        self.assert_equals(time_parser.intervals_in_milliseconds, [15000, 60000])
+        self.assert_equals(time_parser.get_related_intervals(0, 20000), [0, 15000])
+
+    def test_get_multi_resolution_intervals(self):
+        # GIVEN
+        time_parser = TimeParser([10000, 60000])
+        # WHEN
+        actual = time_parser.get_multi_resolution_intervals(55000, 72000)
+        # THEN
+        self.assert_equals(
+            actual, [(10000, 60000), (10000, 70000), (60000, 0), (60000, 60000)]
+        )
+        self.assert_equals(time_parser.is_multi_resolution, True)
+        self.assert_equals(
+            [time_parser.resolution_label(i) for i in [60000, 1500]], ["60s", "1500ms"]
+        )
+
+    def test_seconds_to_time_string(self):
+        # WHEN
+        actual = self.time_parser.seconds_to_time_string(3725.9)
+        # THEN
+        self.assert_equals(actual, "01:02:05")
+
+    def test_seconds_to_time_string_wraps_after_a_day(self):
+        # WHEN
+        actual = self.time_parser.seconds_to_time_string(1553387)
+        # THEN
+        self.assert_equals(actual, "23:29:47")
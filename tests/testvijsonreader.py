@@ -0,0 +1,107 @@
+__author__ = "Maysam Mokarian"
+__email__ = "mamokari@microsoft.com"
+__license__ = "MIT"
+__version__ = "February 2022"
+
+import io
+import json
+
+import pytest
+
+from src.parser.parser import Parser
+from src.parser.vijsonreader import VIJsonReader
+from tests.testbase import TestBase
+from tests.utils import Utils
+
+
+class TestVIJsonReader(TestBase):
+    """
+    This class contains unit tests for VIJsonReader class
+    """
+
+    parser = Parser()
+    utils = Utils()
+
+    def test_read_header(self):
+        # GIVEN
+        content = '{"state": "Processed", "summarizedInsights": {"a": ["}"]}, "name": "FOO", "videos": []}'
+        reader = VIJsonReader(io.StringIO(content))
+        # WHEN
+        actual = reader.read_header()
+        # THEN
+        self.assert_equals(actual, {"state": "Processed", "name": "FOO"})
+
+    def test_fields_after_videos(self):
+        # GIVEN
+        content = (
+            '{"videos": [{"id": "BAR", "insights": {"duration": "0:00:10", '
+            '"faces": [{"id": 1}]}}], "name": "FOO", "state": "Processed"}'
+        )
+        reader = VIJsonReader(io.StringIO(content))
+        # WHEN
+        header = reader.read_header()
+        events = list(reader.videos(insights={"faces"}))
+        # THEN
+        self.assert_equals(header, {"name": "FOO", "state": "Processed"})
+        self.assert_equals(
+            events,
+            [
+                ("video_start", 0, None),
+                ("video", "id", "BAR"),
+                ("insight", "duration", "0:00:10"),
+                ("insight_item", "faces", {"id": 1}),
+                ("video_end", 0, None),
+            ],
+        )
+
+    def test_missing_name(self):
+        # GIVEN
+        reader = VIJsonReader(io.StringIO('{"videos": [], "state": "Processed"}'))
+        # WHEN/THEN
+        with pytest.raises(ValueError):
+            reader.read_header()
+
+    def test_videos_events(self):
+        # GIVEN
+        content = (
+            b'\xef\xbb\xbf{"name": "FOO", "videos": [{"id": "BAR", "insights": '
+            b'{"duration": "0:00:10", "faces": [{"id": 1}, {"id": 2}], "shots": [1]}}]}'
+        )
+        chunks = [content[i : i + 3] for i in range(0, len(content), 3)]
+        reader = VIJsonReader(chunks)
+        # WHEN
+        actual = list(reader.videos(insights={"faces"}))
+        # THEN
+        self.assert_equals(
+            actual,
+            [
+                ("video_start", 0, None),
+                ("video", "id", "BAR"),
+                ("insight", "duration", "0:00:10"),
+                ("insight_item", "faces", {"id": 1}),
+                ("insight_item", "faces", {"id": 2}),
+                ("video_end", 0, None),
+            ],
+        )
+
+    def test_invalid_json(self):
+        # GIVEN
+        reader = VIJsonReader(io.StringIO('{"name": "FOO", "videos": [{"id" "BAR"}]}'))
+        # WHEN/THEN
+        with pytest.raises(ValueError):
+            list(reader.videos())
+
+    def test_iter_stream_documents(self):
+        # GIVEN
+        vi_output = self.utils.read_json_from_resources("vi-output.json")
+        content = json.dumps(vi_output).encode()
+        reader = VIJsonReader(io.BytesIO(content), chunk_size=4096)
+        header = reader.read_header()
+        # WHEN
+        actual = list(
+            self.parser.iter_stream_documents(
+                header["name"], reader.videos(self.parser.specs_by_insight)
+            )
+        )
+        # THEN
+        self.assert_equals(actual, self.parser.parse_vi_json(vi_output))
@@ -6,11 +6,13 @@ __version__ = "February 2022"
 import json
 import os
 
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+
 
 class Utils:
     def read_json_from_resources(self, path, change_key_to_number=False):
         try:
-            path = os.path.join("resources", path)
+            path = os.path.join(RESOURCES, path)
             with open(path) as f:
 
                 json_file = json.load(f)